@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+from utils.benchmark import generate_dataset
+from utils.occupancy import load_schedule_snapshot
+from utils.time_slots import parse_time_range
+
+
+# test_app.py 是 PyQt5 的界面演示程序，不是测试
+collect_ignore = ['test_app.py']
+
+# 测试使用的考试窗口：2026-06-01 为周一，窗口包含一个周末
+START_DATE = '2026-06-01'
+END_DATE = '2026-06-12'
+EXAM_DATES = ['2026-06-%02d' % day for day in range(1, 13)]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    """
+    生成的小规模排考数据集（课程、教室、教师约束），返回数据库路径
+    """
+    return generate_dataset(str(tmp_path / 'exam.db'), n_courses=300, n_rooms=60, n_teachers=80, n_classes=100)
+
+
+@pytest.fixture
+def snapshot(dataset):
+    """
+    数据集的排考数据快照（load_schedule_snapshot）
+    """
+    conn = sqlite3.connect(dataset)
+    try:
+        return load_schedule_snapshot(conn.cursor())
+    finally:
+        conn.close()
+
+
+def overlapping_pairs(placements, courses, column):
+    """
+    按教室、教师或班级统计时间重叠的考试安排对数；
+    同一课程在同一时间使用多间教室（同时分场）不算重叠
+
+    :param placements: 考试安排记录（ScheduleResult.placements）
+    :param courses: 课程列表，用于查找教师
+    :param column: 'room_id'、'teacher' 或 'class_name'
+    """
+    teachers = {str(course[0]): course[11] for course in courses}
+    groups = {}
+    for p in placements:
+        key = teachers[str(p['course_id'])] if column == 'teacher' else p[column]
+        groups.setdefault((key, p['exam_date']), []).append(
+            (parse_time_range(p['exam_time']), str(p['course_id'])))
+    pairs = 0
+    for exams in groups.values():
+        exams.sort()
+        for i, (time_range, course_id) in enumerate(exams):
+            for other_range, other_id in exams[i + 1:]:
+                if other_range[0] >= time_range[1]:
+                    break
+                if not (column != 'room_id' and course_id == other_id and other_range == time_range):
+                    pairs += 1
+    return pairs
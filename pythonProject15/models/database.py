@@ -1,9 +1,16 @@
 import sqlite3
 import hashlib
-import random
 import os
 import pandas as pd
 from datetime import datetime
+from utils.room_index import RoomIndex
+from utils.time_slots import TimeSlot, format_minutes
+
+
+MARK_MANUAL_SQL = '''
+    INSERT INTO exam_arrangement_meta (arrangement_id, source) VALUES (?, 'manual')
+    ON CONFLICT(arrangement_id) DO UPDATE SET source = 'manual'
+'''
 
 
 class DatabaseManager:
@@ -29,10 +36,16 @@ class DatabaseManager:
             学院班级 TEXT NOT NULL,
             考试人数 INTEGER NOT NULL,
             考试地点 TEXT,
-            教师 TEXT NOT NULL
+            教师 TEXT NOT NULL,
+            考试时长 INTEGER
         )
         ''')
 
+        # 旧数据库补充考试时长列（分钟），为空时按时段推算
+        self.cursor.execute('PRAGMA table_info(courses)')
+        if '考试时长' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute('ALTER TABLE courses ADD COLUMN 考试时长 INTEGER')
+
         # 教室表
         self.cursor.execute('''
         CREATE TABLE IF NOT EXISTS exam_rooms (
@@ -62,6 +75,55 @@ class DatabaseManager:
         )
         ''')
 
+        # 考试安排元数据表：记录自动排考时的课程、教室指纹和安排来源（自动/手动），用于增量排考
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_arrangement_meta (
+            arrangement_id INTEGER PRIMARY KEY,
+            course_key TEXT,
+            room_key TEXT,
+            source TEXT DEFAULT 'auto'
+        )
+        ''')
+
+        # 排考结果缓存表：按输入指纹保存试排结果，输入未变化时直接复用
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_cache (
+            fingerprint TEXT PRIMARY KEY,
+            created_at TEXT NOT NULL,
+            result BLOB NOT NULL
+        )
+        ''')
+
+        # 考试时间段表：按学期配置每天的考试时间段，未配置的学期使用默认时间段
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_time_slots (
+            学期 TEXT NOT NULL,
+            序号 INTEGER NOT NULL,
+            开始时间 TEXT NOT NULL,
+            结束时间 TEXT NOT NULL,
+            PRIMARY KEY (学期, 序号)
+        )
+        ''')
+
+        # 学生选课表（可选）：按 (课程名称, 学院班级) 对应课程，用于检查学生考试时间冲突
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_enrolments (
+            学号 TEXT NOT NULL,
+            课程名称 TEXT NOT NULL,
+            学院班级 TEXT NOT NULL,
+            PRIMARY KEY (学号, 课程名称, 学院班级)
+        )
+        ''')
+
+        # 监考安排表：每个考场（考试安排）的监考教师
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS exam_invigilators (
+            arrangement_id INTEGER NOT NULL,
+            监考教师 TEXT NOT NULL,
+            PRIMARY KEY (arrangement_id, 监考教师)
+        )
+        ''')
+
         # 用户表
         self.cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -248,13 +310,22 @@ class DatabaseManager:
             self.conn.rollback()
             return False
 
-    def auto_arrange_exams(self):
+    def auto_arrange_exams(self, incremental=False, start_date=None, end_date=None, slots_per_day=4):
         """
         自动排考场算法
+
+        :param incremental: 为 True 时使用 ExamScheduler 的增量排考，保留内容未变化的课程和手动调整过的安排，
+                            只安排新增或失效的课程；为 False 时清空原有考试安排后重新安排
+        :param start_date: 增量排考的考试开始日期，与 ExamScheduler.schedule_exams 相同
+        :param end_date: 增量排考的考试结束日期
+        :param slots_per_day: 增量排考的每日场次
         """
+        if incremental:
+            return self._auto_arrange_incremental(start_date, end_date, slots_per_day)
         try:
             # 清空原有考试安排
             self.cursor.execute('DELETE FROM exam_arrangements')
+            self.cursor.execute('DELETE FROM exam_arrangement_meta')
 
             # 获取所有课程
             self.cursor.execute('SELECT * FROM courses')
@@ -279,9 +350,12 @@ class DatabaseManager:
             scheduled_teachers = set()
             scheduled_classes = set()
 
+            # 教室容量索引只建立一次
+            room_index = RoomIndex(rooms)
+
             for course in courses:
                 # 选择合适的教室
-                suitable_room = self._find_suitable_room(course, rooms)
+                suitable_room = self._find_suitable_room(course, rooms, room_index)
 
                 if suitable_room:
                     # 插入考试安排
@@ -319,44 +393,40 @@ class DatabaseManager:
             self.conn.rollback()
             return False
 
-    def _find_suitable_room(self, course, rooms):
+    def _auto_arrange_incremental(self, start_date, end_date, slots_per_day):
         """
-        选择合适的教室
+        在同一数据库文件上通过 ExamScheduler 增量排考
         """
+        # 延迟导入：exam_scheduler 依赖本模块
+        from utils.exam_scheduler import ExamScheduler
+
+        self.cursor.execute('PRAGMA database_list')
+        db_path = next((row[2] for row in self.cursor.fetchall() if row[1] == 'main'), '')
+        if not db_path:
+            print("内存数据库不支持增量排考")
+            return False
+        scheduler = ExamScheduler(db_path)
         try:
-            # 打印课程详细信息
-            print("课程详细信息:", course)
-            print("课程长度:", len(course))
+            success, message, _ = scheduler.schedule_exams(start_date, end_date, slots_per_day, incremental=True)
+        finally:
+            scheduler.close()
+        print(message)
+        return success
 
-            # 尝试不同的索引获取考试人数
-            for i in range(len(course)):
-                try:
-                    students_count = course[i]
-                    print(f"尝试索引 {i}: 人数 = {students_count}")
-                except Exception as e:
-                    print(f"索引 {i} 出错: {e}")
-
-            # 筛选符合条件的教室
-            suitable_rooms = []
-            for room in rooms:
-                try:
-                    # 假设教室容量在索引2的位置
-                    if room[2] >= course[9]:
-                        suitable_rooms.append(room)
-                except Exception as e:
-                    print(f"教室匹配出错: {e}")
-                    print("教室数据:", room)
-
-            print(f"符合条件的教室: {suitable_rooms}")
-
-            # 如果有多个合适教室，随机选择
-            if suitable_rooms:
-                selected_room = random.choice(suitable_rooms)
-                print(f"选择教室: {selected_room}")
-                return selected_room
-            else:
-                print("没有找到合适的教室")
-                return None
+    def _find_suitable_room(self, course, rooms, room_index=None):
+        """
+        选择合适的教室
+        在容量足够的教室中选择容量最接近考试人数的教室
+
+        :param room_index: 已建好的 RoomIndex，为空时根据 rooms 建立
+        """
+        try:
+            room_index = room_index or RoomIndex(rooms)
+            # 教室容量在索引2的位置，考试人数在课程索引9的位置
+            selected_room = room_index.select(int(course[9]))
+            if selected_room is None:
+                print(f"没有找到合适的教室: 课程 {course[0]}, 人数 {course[9]}")
+            return selected_room
         except Exception as e:
             print(f"选择教室出错: {e}")
             print("课程数据:", course)
@@ -463,6 +533,53 @@ class DatabaseManager:
             print(f"设置教师约束失败: {e}")
             return False
 
+    def get_term_time_slots(self, term):
+        """
+        获取学期配置的考试时间段，按开始时间排列
+
+        :return: HH:MM-HH:MM 字符串列表，未配置时返回空列表
+        """
+        try:
+            self.cursor.execute('''
+                SELECT 开始时间, 结束时间 FROM exam_time_slots
+                WHERE 学期 = ?
+                ORDER BY 序号
+            ''', (term,))
+            return [f"{start}-{end}" for start, end in self.cursor.fetchall()]
+        except Exception as e:
+            print(f"获取考试时间段失败: {e}")
+            return []
+
+    def set_term_time_slots(self, term, time_slots):
+        """
+        设置学期的考试时间段，替换原有配置
+
+        :param time_slots: HH:MM-HH:MM 字符串列表，为空时删除该学期的配置
+        :return: (success, message)
+        """
+        slots = []
+        for text in time_slots or []:
+            slot = TimeSlot.parse(text)
+            if slot is None:
+                return False, f"无效的考试时间段: {text}"
+            slots.append(slot)
+        slots.sort(key=lambda slot: slot.start)
+        for previous, slot in zip(slots, slots[1:]):
+            if slot.start < previous.end:
+                return False, f"考试时间段 {previous.label} 与 {slot.label} 重叠"
+
+        try:
+            self.cursor.execute('DELETE FROM exam_time_slots WHERE 学期 = ?', (term,))
+            self.cursor.executemany('''
+                INSERT INTO exam_time_slots (学期, 序号, 开始时间, 结束时间) VALUES (?, ?, ?, ?)
+            ''', [(term, i, format_minutes(slot.start), format_minutes(slot.end)) for i, slot in enumerate(slots)])
+            self.conn.commit()
+            return True, f"已设置 {term} 的 {len(slots)} 个考试时间段"
+        except Exception as e:
+            print(f"设置考试时间段失败: {e}")
+            self.conn.rollback()
+            return False, f"设置考试时间段失败: {e}"
+
     def get_exam_arrangements_with_building(self):
         """
         获取包含教学楼信息的考试安排
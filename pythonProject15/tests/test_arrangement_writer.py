@@ -0,0 +1,62 @@
+import sqlite3
+
+import pytest
+
+from conftest import EXAM_DATES
+from utils.arrangement_writer import ArrangementWriter
+
+
+def _placements(count):
+    return [{
+        'course_id': str(i + 1), 'room_id': f'R{i % 7}', 'exam_date': EXAM_DATES[i % len(EXAM_DATES)],
+        'exam_time': '08:00-10:00', 'class_name': f'班级{i}', 'students_count': 30,
+        'department': '学院', 'major': '专业', 'teacher_type': '本科'
+    } for i in range(count)]
+
+
+def _count(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_write_leaves_commit_to_caller(dataset):
+    conn = sqlite3.connect(dataset)
+    try:
+        placements = _placements(250)
+        stats = ArrangementWriter(conn, chunk_size=100).write(placements, meta=lambda p: ('课程', p['room_id']))
+        assert stats['rows'] == 250
+        # 同一事务内生成的编号按插入顺序回填
+        ids = [p['arrangement_id'] for p in placements]
+        assert ids == sorted(ids) and len(set(ids)) == 250
+
+        # 调用方提交前其他连接看不到写入的安排
+        assert conn.in_transaction
+        assert _count(dataset, 'exam_arrangements') == 0
+        conn.commit()
+        assert _count(dataset, 'exam_arrangements') == 250
+        assert _count(dataset, 'exam_arrangement_meta') == 250
+    finally:
+        conn.close()
+
+
+def test_failed_write_rolls_back_with_caller_transaction(dataset):
+    conn = sqlite3.connect(dataset)
+    try:
+        ArrangementWriter(conn).write(_placements(10))
+        conn.commit()
+
+        def broken_meta(placement):
+            raise ValueError('指纹计算失败')
+
+        # 调用方在同一事务内先清空原有安排，写入出错后回滚，原有安排保持不变
+        conn.execute('DELETE FROM exam_arrangements')
+        with pytest.raises(ValueError):
+            ArrangementWriter(conn, chunk_size=50).write(_placements(120), meta=broken_meta)
+        conn.rollback()
+        assert _count(dataset, 'exam_arrangements') == 10
+        assert _count(dataset, 'exam_arrangement_meta') == 0
+    finally:
+        conn.close()
@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from conftest import END_DATE, START_DATE
+from utils import exam_scheduler
+from utils.arrangement_writer import ArrangementWriter
+from utils.exam_scheduler import ExamScheduler
+
+
+def _tables(db_path):
+    """
+    考试安排、安排指纹和监考记录的全部内容
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: sorted(conn.execute(f'SELECT * FROM {table}').fetchall())
+                for table in ('exam_arrangements', 'exam_arrangement_meta', 'exam_invigilators')}
+    finally:
+        conn.close()
+
+
+def _change_courses(db_path, count=5):
+    """
+    修改前几门已安排课程的考试人数，增量排考时删除这些课程的原有安排并重新安排
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('UPDATE courses SET 考试人数 = 考试人数 + 1 WHERE id <= ?', (count,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def scheduler(dataset):
+    scheduler = ExamScheduler(dataset)
+    scheduler.schedule_exams(START_DATE, END_DATE, 4, use_cache=False)
+    scheduler.assign_invigilators()
+    yield scheduler
+    scheduler.close()
+
+
+def test_dry_run_does_not_touch_the_database(scheduler, dataset):
+    _change_courses(dataset)
+    before = _tables(dataset)
+    changes = scheduler.conn.total_changes
+    for settings in ({'mode': 'dsatur'}, {'incremental': True}, {'optimize_seconds': 1, 'optimize_iterations': 500,
+                                                                  'seed': 1}):
+        result = scheduler.dry_run(START_DATE, END_DATE, 4, use_cache=False, **settings)
+        assert result.placements
+    assert scheduler.conn.total_changes == changes
+    assert not scheduler.conn.in_transaction
+    assert _tables(dataset) == before
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_failure_after_insert_keeps_old_arrangements(scheduler, dataset, monkeypatch, incremental):
+    if incremental:
+        _change_courses(dataset)
+    result = scheduler.dry_run(START_DATE, END_DATE, 4, mode='dsatur', incremental=incremental, use_cache=False)
+    assert result.placements
+    before = _tables(dataset)
+    assert before['exam_invigilators']
+
+    class FailingWriter(ArrangementWriter):
+        def write(self, placements, meta=None):
+            super().write(placements, meta)
+            raise sqlite3.OperationalError('写入后出错')
+
+    monkeypatch.setattr(exam_scheduler, 'ArrangementWriter', FailingWriter)
+    success, message, _ = scheduler.commit_schedule(result)
+    assert not success
+    assert '写入后出错' in message
+    # 清空或修剪、写入都已回滚，原有安排和监考记录保持不变
+    assert not scheduler.conn.in_transaction
+    assert _tables(dataset) == before
+
+    monkeypatch.undo()
+    assert scheduler.commit_schedule(result)[0]
+    assert _tables(dataset) != before
+
+
+def test_stale_incremental_dry_run_is_not_written(scheduler, dataset):
+    result = scheduler.dry_run(START_DATE, END_DATE, 4, incremental=True, use_cache=False)
+    before = _tables(dataset)
+
+    # 试排后其他连接修改了一门已安排课程
+    conn = sqlite3.connect(dataset)
+    try:
+        course_id = conn.execute('SELECT 教室号 FROM exam_arrangements LIMIT 1').fetchone()[0]
+        conn.execute('UPDATE courses SET 考试人数 = 考试人数 + 1 WHERE id = ?', (int(course_id),))
+        conn.commit()
+    finally:
+        conn.close()
+
+    success, message, _ = scheduler.commit_schedule(result)
+    assert not success
+    assert '重新试排' in message
+    assert not scheduler.conn.in_transaction
+    assert _tables(dataset) == before
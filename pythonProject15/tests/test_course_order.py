@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from conftest import EXAM_DATES
+from utils.benchmark import benchmark_course_orders, format_benchmark
+from utils.course_order import COURSE_ORDERS, make_course_order
+from utils.occupancy import OccupancyEngine
+from utils.time_slots import DEFAULT_TIME_SLOTS, popcount
+
+
+@pytest.fixture
+def engine(snapshot):
+    return OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+
+
+@pytest.mark.parametrize('name', COURSE_ORDERS)
+def test_orders_are_permutations(engine, name):
+    courses = engine.courses
+    ordered = make_course_order(name, random.Random(1)).order(courses, engine)
+    assert sorted(ordered) == sorted(courses)
+    # 不修改传入的课程列表
+    assert courses == engine.courses
+
+
+def test_order_keys(engine):
+    courses = engine.courses
+    largest = make_course_order('largest_first').order(courses, engine)
+    assert [course[9] for course in largest] == sorted((course[9] for course in courses), reverse=True)
+
+    # 同一教师的课程排在一起，教师按约束从紧到松
+    constrained = make_course_order('constrained_teacher').order(courses, engine)
+    teachers = [course[11] for i, course in enumerate(constrained) if i == 0 or course[11] != constrained[i - 1][11]]
+    assert len(teachers) == len(set(teachers))
+    store = engine.constraint_store
+
+    def slack(teacher):
+        free = sum(min(popcount(mask), store.limit(teacher)) for mask in store.available_masks(teacher))
+        return free / sum(1 for course in courses if course[11] == teacher)
+    assert [slack(teacher) for teacher in teachers] == sorted(slack(teacher) for teacher in teachers)
+
+    teacher = make_course_order('teacher').order(courses, engine)
+    assert list(dict.fromkeys(course[11] for course in teacher)) == list(dict.fromkeys(c[11] for c in courses))
+
+
+def test_random_restart_is_seeded(engine):
+    first = make_course_order('random_restart', random.Random(7))
+    second = make_course_order('random_restart', random.Random(7))
+    assert first.restarts > 1
+    orders = [first.order(engine.courses, engine) for _ in range(first.restarts)]
+    assert orders == [second.order(engine.courses, engine) for _ in range(second.restarts)]
+    # 每次重启使用新的顺序
+    assert orders[0] != orders[1]
+    with pytest.raises(ValueError):
+        make_course_order('unknown')
+
+
+def test_benchmark_reports_every_order(dataset):
+    rows = benchmark_course_orders({'小': dataset}, orders=('teacher', 'fewest_slots'))
+    assert [(row['dataset'], row['order']) for row in rows] == [('小', 'teacher'), ('小', 'fewest_slots')]
+    for row in rows:
+        assert row['failed'] == 0 and row['success_rate'] == 100
+        assert 0 < row['seat_utilisation'] <= 100 and 0 < row['slot_utilisation'] <= 100
+    assert len(format_benchmark(rows).splitlines()) == 3
@@ -0,0 +1,103 @@
+from conftest import EXAM_DATES, START_DATE
+from utils.diagnosis import FAILURE_CAUSES, VIOLATIONS, FailureDiagnoser, format_alternative
+from utils.exam_scheduler import ExamScheduler
+from utils.occupancy import OccupancyEngine
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+DATES = EXAM_DATES[:2]
+ROOMS = [('A101', '', 60, 'A', '1', '', ''), ('A102', '', 100, 'A', '1', '', '')]
+
+
+def _course(course_id, teacher, students=40, room='A101', duration=120, class_name=None):
+    return (course_id, room, f'课程{course_id}', '1-2节', '周一', '专任', '学院', '专业',
+            class_name or f'班级{course_id}', students, '', teacher, duration)
+
+
+def _diagnose(courses, constraints=(), placed=(), **options):
+    """
+    登记 placed 中的考试 [(课程, 教室, 日期序号, 时间段)] 后诊断 courses 的最后一门课程
+    """
+    snapshot = {'courses': courses, 'rooms': ROOMS, 'constraints': list(constraints), 'arrangements': []}
+    engine = OccupancyEngine(snapshot, DATES, DEFAULT_TIME_SLOTS)
+    for course, room_id, day, slot in placed:
+        engine.place(course[11], course[8], [room_id], day, slot, course[12], course[0])
+    course = courses[-1]
+    failure = {'course_id': course[0], 'students_count': course[9], 'reason': '无法找到合适的时间和教室'}
+    FailureDiagnoser(engine, **options).diagnose([failure])
+    return failure
+
+
+def test_no_room_big_enough():
+    failure = _diagnose([_course(1, '教师甲', students=500, room='不在考场列表')])
+    assert failure['cause'] == 'no_room'
+    assert failure['reason'].startswith(FAILURE_CAUSES['no_room'])
+    assert failure['alternative'] is None
+    # 同时分场时按全部教室的总容量判断
+    assert _diagnose([_course(1, '教师甲', students=150)], split_mode='concurrent')['alternative']['room_id'] == \
+        'A102, A101'
+
+
+def test_exam_longer_than_the_day():
+    assert _diagnose([_course(1, '教师甲', duration=900)])['cause'] == 'too_long'
+
+
+def test_teacher_unavailable():
+    failure = _diagnose([_course(1, '教师甲')], [('教师甲', 3, 0, 0, ','.join(DATES), '')])
+    assert failure['cause'] == 'teacher_unavailable'
+    assert VIOLATIONS['teacher_unavailable'] in failure['alternative']['violations']
+
+
+def test_teacher_daily_cap():
+    courses = [_course(1, '教师甲'), _course(2, '教师甲'), _course(3, '教师甲')]
+    placed = [(courses[0], 'A101', 0, 0), (courses[1], 'A101', 1, 0)]
+    failure = _diagnose(courses, [('教师甲', 1, 0, 0, '', '')], placed)
+    assert failure['cause'] == 'teacher_daily_cap'
+    assert '每日上限 1 场' in failure['reason']
+    # 最接近的方案只违反每日上限
+    assert failure['alternative']['violations'] == [VIOLATIONS['teacher_daily_cap']]
+
+
+def test_slots_taken_names_the_closest_alternative():
+    # 只有第二天最后一个时间段的 A102 空闲，但本班同时在 A101 考试；
+    # 教师第一天不可用，第二天其余时间段既没有教室、本班也有考试
+    cells = [(day, slot, room_id) for day in range(2) for slot in range(4) for room_id in ('A101', 'A102')]
+    courses, placed = [], []
+    for i, (day, slot, room_id) in enumerate(cells[:-1], 1):
+        class_name = '本班' if day == 1 and room_id == 'A101' else None
+        courses.append(_course(i, f'教师{i}', class_name=class_name))
+        placed.append((courses[-1], room_id, day, slot))
+    courses.append(_course(99, '教师甲', class_name='本班'))
+    failure = _diagnose(courses, [('教师甲', 3, 0, 0, DATES[0], '')], placed, check_class=True)
+
+    assert failure['cause'] == 'slots_taken'
+    alternative = failure['alternative']
+    assert (alternative['exam_date'], alternative['exam_time'], alternative['room_id']) == \
+        (DATES[1], DEFAULT_TIME_SLOTS[3], 'A102')
+    assert alternative['violations'] == [VIOLATIONS['class_busy']]
+    assert VIOLATIONS['class_busy'] in format_alternative(alternative)
+
+
+def test_sequential_sessions_in_preferred_room():
+    # 250 人的课程需要在常用教室 A102 依次考 3 场
+    failure = _diagnose([_course(1, '教师甲', students=250, room='A102')], [('教师甲', 1, 0, 0, '', '')])
+    sessions = failure['alternative']['sessions']
+    assert len(sessions) == 3
+    assert {session['room_id'] for session in sessions} == {'A102'}
+    assert '需在常用教室 A102 分 3 场考试' in failure['reason']
+    # 两天每天只能考 1 场，第三场违反每日上限
+    assert sum(VIOLATIONS['teacher_daily_cap'] in session['violations'] for session in sessions) == 1
+
+
+def test_scheduler_diagnoses_every_failed_course(dataset):
+    scheduler = ExamScheduler(dataset)
+    try:
+        # 一天的考试窗口容纳不下全部课程
+        success, message, failed = scheduler.schedule_exams(START_DATE, START_DATE, 4, use_cache=False)
+    finally:
+        scheduler.close()
+    assert not success and failed
+    for failure in failed:
+        assert failure['cause'] in FAILURE_CAUSES
+        assert failure['reason'].startswith(FAILURE_CAUSES[failure['cause']])
+    assert any(failure['alternative'] for failure in failed)
+
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+from conftest import END_DATE, EXAM_DATES, START_DATE, overlapping_pairs
+from utils.exam_scheduler import ExamScheduler
+from utils.occupancy import OccupancyEngine, load_schedule_snapshot
+from utils.time_slots import DEFAULT_TIME_SLOTS, TimeSlotGrid, parse_time_range
+
+
+DURATIONS = (90, 120, 180, 240, None)
+
+
+@pytest.fixture
+def mixed_durations(dataset):
+    """
+    课程的考试时长依次为 90、120、180、240 分钟和未填写（按上课时段推算）
+    """
+    conn = sqlite3.connect(dataset)
+    try:
+        course_ids = [row[0] for row in conn.execute('SELECT id FROM courses ORDER BY id')]
+        conn.executemany('UPDATE courses SET 考试时长 = ? WHERE id = ?',
+                         [(DURATIONS[i % len(DURATIONS)], course_id) for i, course_id in enumerate(course_ids)])
+        conn.commit()
+        return dataset, load_schedule_snapshot(conn.cursor())
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('mode', ['greedy', 'dsatur'])
+def test_long_exams_occupy_their_whole_time(mixed_durations, mode):
+    db_path, snapshot = mixed_durations
+    scheduler = ExamScheduler(db_path)
+    try:
+        success, _, _ = scheduler.schedule_exams(START_DATE, END_DATE, 4, mode=mode, use_cache=False)
+        result = scheduler.dry_run(START_DATE, END_DATE, 4, mode=mode, use_cache=False)
+    finally:
+        scheduler.close()
+    assert success
+
+    grid = TimeSlotGrid.of(DEFAULT_TIME_SLOTS)
+    engine = OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    courses = {course[0]: course for course in snapshot['courses']}
+    for p in result.placements:
+        start, end = parse_time_range(p['exam_time'])
+        # 考试从时间段开始时刻开始，时长与课程一致，不超出当天最后一个时间段
+        assert start == grid.slots[p['slot']].start
+        assert end - start == engine.course_duration(courses[p['course_id']])
+        assert end <= grid.day_end
+    assert overlapping_pairs(result.placements, snapshot['courses'], 'room_id') == 0
+    assert overlapping_pairs(result.placements, snapshot['courses'], 'teacher') == 0
+    if mode == 'dsatur':
+        assert overlapping_pairs(result.placements, snapshot['courses'], 'class_name') == 0
+
+    # 写入数据库后重新加载，长考试占用与之重叠的全部时间段
+    conn = sqlite3.connect(db_path)
+    try:
+        engine = OccupancyEngine(load_schedule_snapshot(conn.cursor()), EXAM_DATES, DEFAULT_TIME_SLOTS)
+        rows = conn.execute('SELECT 教室编号, 考试日期, 考试时间 FROM exam_arrangements').fetchall()
+    finally:
+        conn.close()
+    assert len({row[2] for row in rows}) > len(DEFAULT_TIME_SLOTS)
+    for room_id, exam_date, exam_time in rows:
+        day = EXAM_DATES.index(exam_date)
+        mask = grid.mask_of(exam_time)
+        assert mask
+        for slot in range(len(grid)):
+            if mask >> slot & 1:
+                assert not engine.room_free(room_id, day, slot)
@@ -0,0 +1,149 @@
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from conftest import END_DATE, START_DATE
+from models.database import DatabaseManager
+from utils.conflict_detector import ConflictDetector
+from utils.enrolment import CoEnrolmentMatrix
+from utils.exam_scheduler import ExamScheduler
+from utils.time_slots import parse_time_range
+
+
+def _random_enrolment(seed=1, n_courses=40, n_students=300):
+    rng = random.Random(seed)
+    course_keys = [(i + 1, f"课程{i % 25}", f"班级{i % 7}") for i in range(n_courses)]
+    rows = []
+    for student in range(n_students):
+        for course_id, name, class_name in rng.sample(course_keys, rng.randint(1, 6)):
+            rows.append((f"S{student}", name, class_name))
+    # 重复的选课记录和对应不到课程的记录
+    rows.extend(rows[:20])
+    rows.append(('S0', '不存在的课程', '班级0'))
+    return course_keys, rows
+
+
+def _brute_force(course_keys, rows):
+    """
+    逐个学生统计每两门课程的共同考生数
+    """
+    by_key = {}
+    for course_id, name, class_name in course_keys:
+        by_key.setdefault((name, class_name), []).append(course_id)
+    courses_of = {}
+    for student, name, class_name in rows:
+        courses_of.setdefault(student, set()).update(by_key.get((name, class_name), ()))
+    shared = {}
+    for courses in courses_of.values():
+        for a in courses:
+            for b in courses:
+                if a != b:
+                    shared[(a, b)] = shared.get((a, b), 0) + 1
+    return shared
+
+
+def test_shared_matches_brute_force():
+    course_keys, rows = _random_enrolment()
+    matrix = CoEnrolmentMatrix.build(course_keys, rows)
+    expected = _brute_force(course_keys, rows)
+    course_ids = [key[0] for key in course_keys]
+
+    assert matrix.unmatched == 1
+    for course_id in course_ids:
+        counts = matrix.shared(course_id, course_ids)
+        assert counts.tolist() == [expected.get((course_id, other), 0) for other in course_ids]
+
+
+def test_shared_accepts_text_ids_and_unknown_courses():
+    course_keys, rows = _random_enrolment(seed=2)
+    matrix = CoEnrolmentMatrix.build(course_keys, rows)
+    course_ids = [key[0] for key in course_keys]
+
+    # 考试安排中的课程 id 为文字
+    assert matrix.shared(str(course_ids[0]), [str(i) for i in course_ids]).tolist() == \
+        matrix.shared(course_ids[0], course_ids).tolist()
+    assert matrix.shared(course_ids[0], [9999, -1]).tolist() == [0, 0]
+    assert matrix.shared(9999, course_ids).tolist() == [0] * len(course_ids)
+    assert len(matrix.shared(course_ids[0], [])) == 0
+
+
+def test_empty_enrolment():
+    matrix = CoEnrolmentMatrix.build([(1, '课程', '班级'), (2, '课程2', '班级')], [])
+    assert matrix.nnz == 0
+    assert np.array_equal(matrix.shared(1, [1, 2]), np.zeros(2, dtype=np.int64))
+
+
+@pytest.fixture
+def enrolled(dataset):
+    """
+    数据集加上跨班级的学生选课记录（重修、选修其他班级的课程）
+    """
+    rng = random.Random(3)
+    conn = sqlite3.connect(dataset)
+    try:
+        course_keys = conn.execute('SELECT id, 课程名称, 学院班级 FROM courses').fetchall()
+        rows = {(f"S{student}", name, class_name)
+                for student in range(400) for _, name, class_name in rng.sample(course_keys, 4)}
+        conn.executemany('INSERT INTO student_enrolments (学号, 课程名称, 学院班级) VALUES (?, ?, ?)', rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return dataset, course_keys, sorted(rows)
+
+
+@pytest.mark.parametrize('mode', ['greedy', 'dsatur'])
+def test_no_student_sits_two_exams_at_once(enrolled, mode):
+    db_path, course_keys, rows = enrolled
+    scheduler = ExamScheduler(db_path)
+    try:
+        success, _, failed = scheduler.schedule_exams(START_DATE, END_DATE, 4, mode=mode, use_cache=False)
+        arrangements = scheduler.conn.execute('SELECT 教室号, 考试日期, 考试时间 FROM exam_arrangements').fetchall()
+    finally:
+        scheduler.close()
+    assert success and failed == []
+
+    by_key = {}
+    for course_id, name, class_name in course_keys:
+        by_key.setdefault((name, class_name), []).append(str(course_id))
+    exams_of = {}
+    for course_id, exam_date, exam_time in set(arrangements):
+        exams_of.setdefault(course_id, []).append((exam_date, exam_time))
+    clashes = 0
+    students = {}
+    for student, name, class_name in rows:
+        students.setdefault(student, set()).update(by_key[(name, class_name)])
+    for courses in students.values():
+        exams = sorted((exam_date, parse_time_range(exam_time), course_id)
+                       for course_id in courses for exam_date, exam_time in exams_of.get(course_id, ()))
+        for (date_a, (_, end_a), a), (date_b, (start_b, _), b) in zip(exams, exams[1:]):
+            clashes += a != b and date_a == date_b and start_b < end_a
+    assert clashes == 0
+
+
+def test_conflict_detector_reports_shared_students(enrolled):
+    db_path, course_keys, rows = enrolled
+    courses_of = {}
+    ids_of = {(name, class_name): course_id for course_id, name, class_name in course_keys}
+    for student, name, class_name in rows:
+        courses_of.setdefault(student, []).append(ids_of[(name, class_name)])
+    a, b = courses_of['S0'][:2]
+    shared = sum(1 for courses in courses_of.values() if a in courses and b in courses)
+
+    db = DatabaseManager(db_path)
+    try:
+        db.cursor.execute('DELETE FROM exam_arrangements')
+        db.cursor.execute('''
+            INSERT INTO exam_arrangements (教室号, 教室编号, 考试日期, 考试时间, 学院班级, 考试人数, 任课学院, 专业, 学历层次)
+            VALUES (?, 'R1', '2026-06-01', '08:00-10:00', '班级', 30, '学院', '专业', '本科')
+        ''', (str(b),))
+        db.conn.commit()
+        detector = ConflictDetector(db)
+        has_conflict, info = detector.check_student_conflict(a, '2026-06-01', '09:00-11:00')
+        assert has_conflict
+        assert [item['students'] for item in info] == [shared]
+        assert not detector.check_student_conflict(a, '2026-06-01', '10:00-12:00')[0]
+        assert not detector.check_student_conflict(a, '2026-06-02', '08:00-10:00')[0]
+    finally:
+        db.close()
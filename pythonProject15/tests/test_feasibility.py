@@ -0,0 +1,73 @@
+import pytest
+
+from conftest import END_DATE, EXAM_DATES, START_DATE
+from utils.exam_scheduler import ExamScheduler
+from utils.feasibility import FeasibilityChecker
+from utils.teacher_constraints import TeacherConstraintStore
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+
+def _check(snapshot, exam_dates, **options):
+    store = TeacherConstraintStore(exam_dates, DEFAULT_TIME_SLOTS).build(snapshot['constraints'])
+    return FeasibilityChecker(snapshot, exam_dates, DEFAULT_TIME_SLOTS, store, **options).check()
+
+
+def _with_courses(snapshot, update):
+    """
+    修改前若干门课程的字段：update 为 {字段位置: 值}
+    """
+    courses = list(snapshot['courses'])
+    for index, changes in update.items():
+        course = list(courses[index])
+        for column, value in changes.items():
+            course[column] = value
+        courses[index] = tuple(course)
+    return dict(snapshot, courses=courses)
+
+
+@pytest.mark.parametrize('mode', ['greedy', 'dsatur'])
+def test_lower_bound_never_exceeds_days_used(dataset, snapshot, mode):
+    report = _check(snapshot, EXAM_DATES, check_class=mode == 'dsatur')
+    assert report['ok']
+    bounds = report['lower_bounds']
+    assert bounds['days'] == max(bound for key, bound in bounds.items() if key != 'days' and bound is not None)
+
+    scheduler = ExamScheduler(dataset)
+    try:
+        result = scheduler.dry_run(START_DATE, END_DATE, 4, mode=mode, use_cache=False)
+    finally:
+        scheduler.close()
+    assert not result.failed_courses
+    assert result.metrics['days_used'] >= bounds['days']
+
+
+def test_class_bound_and_errors(snapshot):
+    # 9 门课程属于同一班级：每天 4 场时至少需要 3 天
+    snapshot = _with_courses(snapshot, {index: {8: '同一班级'} for index in range(9)})
+    report = _check(snapshot, EXAM_DATES[:2], check_class=True)
+    assert report['lower_bounds']['class'] >= 3
+    assert any(issue['kind'] == 'class' and issue['class_name'] == '同一班级' for issue in report['errors'])
+    assert any(issue['kind'] == 'days' for issue in report['warnings'])
+
+    # 不检查班级冲突时同一班级的考试数只作为提示
+    report = _check(snapshot, EXAM_DATES[:2])
+    assert not any(issue['kind'] == 'class' for issue in report['errors'])
+
+
+def test_teacher_and_oversized_errors(snapshot):
+    rooms = {room[0] for room in snapshot['rooms']}
+    # 教师在窗口内最多 1 天 × 每日上限场考试；超大课程的常用教室不在考场列表中时无法依次分场
+    update = {index: {11: '忙碌的教师'} for index in range(12)}
+    update[20] = {9: 1000, 1: '不存在的教室', 11: '超大课程的教师'}
+    snapshot = _with_courses(snapshot, update)
+    assert '不存在的教室' not in rooms
+    report = _check(snapshot, EXAM_DATES[:1])
+    kinds = {(issue['kind'], issue.get('teacher') or issue.get('course_id')) for issue in report['errors']}
+    assert ('teacher', '忙碌的教师') in kinds
+    assert ('oversized', snapshot['courses'][20][0]) in kinds
+    assert not report['ok']
+
+    # 同时分场时只要全部教室总容量足够即可
+    report = _check(snapshot, EXAM_DATES[:1], split_mode='concurrent')
+    assert not any(issue['kind'] == 'oversized' for issue in report['errors'])
+    assert any(issue['kind'] == 'oversized' for issue in report['warnings'])
@@ -0,0 +1,39 @@
+import pytest
+
+from conftest import END_DATE, START_DATE, overlapping_pairs
+from utils.exam_scheduler import ExamScheduler
+from utils.graph_coloring import ConflictGraph
+
+
+@pytest.fixture
+def scheduler(dataset):
+    scheduler = ExamScheduler(dataset)
+    yield scheduler
+    scheduler.close()
+
+
+def test_dsatur_never_overlaps_a_class(scheduler, snapshot):
+    result = scheduler.dry_run(START_DATE, END_DATE, 4, mode='dsatur', use_cache=False)
+    courses = snapshot['courses']
+
+    assert result.placements
+    assert overlapping_pairs(result.placements, courses, 'class_name') == 0
+    assert overlapping_pairs(result.placements, courses, 'teacher') == 0
+    assert overlapping_pairs(result.placements, courses, 'room_id') == 0
+    # 每门课程要么安排成功，要么列为失败
+    placed = {str(p['course_id']) for p in result.placements}
+    assert len(placed) + len(result.failed_courses) == len(courses)
+
+
+def test_conflict_graph_groups_classes_and_teachers():
+    courses = [
+        (1, 'A101', '高数', '', '', '', '', '', '班级1', 30, '', '张老师', 120),
+        (2, 'A101', '英语', '', '', '', '', '', '班级1', 30, '', '李老师', 120),
+        (3, 'A102', '物理', '', '', '', '', '', '班级2', 30, '', '张老师', 120),
+        (4, 'A103', '化学', '', '', '', '', '', '班级3', 30, '', '王老师', 120)
+    ]
+    graph = ConflictGraph(courses)
+
+    assert graph.degrees == [2, 1, 1, 0]
+    assert set(graph.neighbours(0)) == {1, 2}
+    assert list(graph.neighbours(3)) == []
@@ -0,0 +1,72 @@
+import sqlite3
+
+from conftest import END_DATE, START_DATE
+from models.database import MARK_MANUAL_SQL, DatabaseManager
+from utils.exam_scheduler import ExamScheduler
+
+
+def _arrangements(db_path):
+    """
+    :return: {arrangement_id: (课程 id, 教室编号, 考试日期, 考试时间)}
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT arrangement_id, 教室号, 教室编号, 考试日期, 考试时间 FROM exam_arrangements')
+        return {row[0]: tuple(row[1:]) for row in rows}
+    finally:
+        conn.close()
+
+
+def _schedule(db_path, incremental):
+    scheduler = ExamScheduler(db_path)
+    try:
+        return scheduler.schedule_exams(START_DATE, END_DATE, 4, incremental=incremental, use_cache=False)
+    finally:
+        scheduler.close()
+
+
+def test_incremental_run_pins_unchanged_and_manual_arrangements(dataset):
+    _schedule(dataset, incremental=False)
+    before = _arrangements(dataset)
+    assert before
+
+    # 修改 5 门课程的考试人数，其中一门课程的安排是手动调整过的
+    changed = sorted({row[0] for row in before.values()}, key=int)[:5]
+    manual_id = next(arrangement_id for arrangement_id, row in before.items() if row[0] == changed[0])
+    conn = sqlite3.connect(dataset)
+    try:
+        conn.execute('UPDATE exam_arrangements SET 考试时间 = ? WHERE arrangement_id = ?', ('08:30-10:20', manual_id))
+        conn.execute(MARK_MANUAL_SQL, (manual_id,))
+        conn.executemany('UPDATE courses SET 考试人数 = 考试人数 + 1 WHERE id = ?',
+                         [(int(course_id),) for course_id in changed])
+        conn.commit()
+    finally:
+        conn.close()
+
+    _schedule(dataset, incremental=True)
+    after = _arrangements(dataset)
+
+    # 内容未变化的课程保留原来的安排记录
+    for arrangement_id, row in before.items():
+        if row[0] not in changed:
+            assert after.get(arrangement_id) == row
+    # 手动调整过的安排即使课程已变化也保留
+    assert after[manual_id] == before[manual_id][:3] + ('08:30-10:20',)
+    # 其余变化课程的旧安排被删除，重新安排
+    for arrangement_id, row in before.items():
+        if row[0] in changed[1:]:
+            assert arrangement_id not in after
+    assert {row[0] for row in after.values()} >= set(changed[1:])
+
+
+def test_database_manager_runs_incremental_arrangement(dataset):
+    _schedule(dataset, incremental=False)
+    before = _arrangements(dataset)
+
+    db_manager = DatabaseManager(dataset)
+    try:
+        assert db_manager.auto_arrange_exams(incremental=True, start_date=START_DATE, end_date=END_DATE)
+    finally:
+        db_manager.close()
+    # 数据未变化时全部保留原有安排
+    assert _arrangements(dataset) == before
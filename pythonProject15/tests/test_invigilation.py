@@ -0,0 +1,139 @@
+import sqlite3
+from functools import reduce
+from operator import or_
+
+import pytest
+
+from conftest import END_DATE, EXAM_DATES, START_DATE
+from utils.exam_scheduler import ExamScheduler
+from utils.invigilation import InvigilatorAssigner, covering_time_slots, load_staff
+from utils.occupancy import load_schedule_snapshot
+from utils.teacher_constraints import TeacherConstraintStore
+from utils.time_slots import DEFAULT_TIME_SLOTS, STANDARD_TIME_SLOTS, TimeSlotGrid
+
+
+@pytest.fixture
+def scheduled(dataset):
+    """
+    每日 5 场排考后的数据快照，监考名单为任课教师加 200 名没有约束的教师
+    """
+    scheduler = ExamScheduler(dataset)
+    try:
+        assert scheduler.schedule_exams(START_DATE, END_DATE, 5, mode='dsatur', use_cache=False)[0]
+    finally:
+        scheduler.close()
+    conn = sqlite3.connect(dataset)
+    try:
+        snapshot = load_schedule_snapshot(conn.cursor())
+        staff = load_staff(conn.cursor()) + [f'监考教师{i}' for i in range(200)]
+    finally:
+        conn.close()
+    return snapshot, staff
+
+
+def _assign(snapshot, staff, time_slots, **options):
+    store = TeacherConstraintStore(EXAM_DATES, time_slots).build(snapshot['constraints'])
+    assigner = InvigilatorAssigner(snapshot, staff, EXAM_DATES, time_slots, store, **options)
+    return assigner, store
+
+
+def test_assignments_respect_constraints(scheduled):
+    snapshot, staff = scheduled
+    # 只用任课教师监考，人手不足时部分考场缺人
+    staff = staff[:-200]
+    grid = TimeSlotGrid.of(STANDARD_TIME_SLOTS)
+    assigner, store = _assign(snapshot, staff, grid, students_per_proctor=40)
+    assignments, unfilled = assigner.assign()
+
+    rows = {row[0]: row for row in snapshot['arrangements']}
+    assert set(assignments) == set(rows)
+    missing = {session['arrangement_id']: count for session, count in unfilled}
+    # {(教师, 日期): {(课程或考场, 考试时间)}}，任课教师同时分场的考场按一场考试计
+    busy = {}
+    for row in snapshot['arrangements']:
+        busy.setdefault((row[7], row[3]), set()).add((row[1], row[4]))
+    for arrangement_id, names in assignments.items():
+        row = rows[arrangement_id]
+        required = max(1, -(-row[6] // 40))
+        assert len(names) == len(set(names))
+        assert required - len(names) == missing.get(arrangement_id, 0)
+        for name in names:
+            assert name in staff and name != row[7]
+            busy.setdefault((name, row[3]), set()).add((('监考', arrangement_id), row[4]))
+
+    for (name, exam_date), exams in busy.items():
+        duties = [exam_time for key, exam_time in exams if isinstance(key, tuple)]
+        if not duties:
+            continue
+        assert len(exams) <= store.limit(name)
+        day = EXAM_DATES.index(exam_date)
+        for exam_time in duties:
+            span = grid.mask_of(exam_time)
+            assert store.available_masks(name)[day] & span == span
+        # 教师当天的考试和监考占用的时间段互不重叠
+        masks = [grid.mask_of(exam_time) for _, exam_time in exams]
+        assert sum(masks) == reduce(or_, masks)
+
+    stats = assigner.last_stats
+    assert stats['unfilled'] == sum(missing.values()) > 0
+    assert stats['duties'] == sum(len(names) for names in assignments.values())
+    # 均衡调整结束后，没有监考场次能移给监考少至少两场的教师
+    for s, duties in enumerate(assigner.duties):
+        for index in duties:
+            assert not any(assigner._can_take(t, index) for t in range(len(staff))
+                           if assigner.load[t] <= assigner.load[s] - 2)
+
+
+def test_evening_exams_outside_the_grid_are_covered(scheduled):
+    snapshot, staff = scheduled
+    exam_times = [row[4] for row in snapshot['arrangements']]
+    grid = TimeSlotGrid.of(DEFAULT_TIME_SLOTS)
+    evening = {row[0] for row in snapshot['arrangements'] if not grid.mask_of(row[4])}
+    assert evening
+
+    # 按每日 4 场的网格分配时，晚上的考场对应不到网格，全部报告为缺少监考
+    assigner, _ = _assign(snapshot, staff, DEFAULT_TIME_SLOTS)
+    assignments, unfilled = assigner.assign()
+    assert {session['arrangement_id'] for session in assigner.unmapped} == evening
+    assert evening <= {session['arrangement_id'] for session, _ in unfilled}
+    assert all(not assignments[arrangement_id] for arrangement_id in evening)
+
+    time_slots = covering_time_slots(DEFAULT_TIME_SLOTS, exam_times)
+    assert time_slots == list(STANDARD_TIME_SLOTS)
+    assigner, _ = _assign(snapshot, staff, time_slots)
+    assignments, unfilled = assigner.assign()
+    assert not assigner.unmapped
+    assert unfilled == []
+    assert all(assignments[arrangement_id] for arrangement_id in evening)
+
+
+def test_exams_outside_the_window_are_reported(scheduled):
+    snapshot, staff = scheduled
+    arrangements = list(snapshot['arrangements'])
+    outside = arrangements[0][:3] + ('2026-07-01',) + arrangements[0][4:]
+    snapshot = dict(snapshot, arrangements=arrangements[1:] + [outside])
+    assigner, _ = _assign(snapshot, staff, STANDARD_TIME_SLOTS, students_per_proctor=0, proctors_per_room=2)
+    assignments, unfilled = assigner.assign()
+
+    assert assignments[outside[0]] == []
+    assert [(session['arrangement_id'], count) for session, count in unfilled] == [(outside[0], 2)]
+    assert assigner.last_stats['sessions'] == len(arrangements)
+
+
+def test_covering_time_slots_skips_overlapping_times():
+    assert covering_time_slots(DEFAULT_TIME_SLOTS, ['08:00-11:00', '12:40-13:50', '无效']) == \
+        ['08:00-10:00', '10:30-12:30', '12:40-13:50', '14:00-16:00', '16:30-18:30']
+    assert covering_time_slots(DEFAULT_TIME_SLOTS, ['09:00-11:00']) == list(DEFAULT_TIME_SLOTS)
+
+
+def test_assign_invigilators_writes_every_room(scheduled, dataset):
+    snapshot, staff = scheduled
+    scheduler = ExamScheduler(dataset)
+    try:
+        success, _, unfilled = scheduler.assign_invigilators(staff=staff, slots_per_day=4)
+        rows = scheduler.conn.execute('SELECT arrangement_id, 监考教师 FROM exam_invigilators').fetchall()
+    finally:
+        scheduler.close()
+    assert success and unfilled == []
+    # 每日 5 场排考的晚上场次也分配了监考
+    assert {row[0] for row in rows} == {row[0] for row in snapshot['arrangements']}
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import EXAM_DATES, overlapping_pairs
+from test_occupancy import _state
+from utils.local_search import LocalSearchOptimizer
+from utils.occupancy import OccupancyEngine
+from utils.placement import CoursePlacer
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+
+def _register(snapshot, placements):
+    """
+    在新的占用引擎上登记考试安排，同时分场的多间教室作为一场考试登记
+    """
+    engine = OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    cells = {}
+    for p in placements:
+        cells.setdefault((p['course_id'], p['day'], p['slot']), (p, []))[1].append(p['room_id'])
+    for p, room_ids in cells.values():
+        engine.place(p['teacher'], p['class_name'], room_ids, p['day'], p['slot'], p.get('duration'), p['course_id'])
+    return engine
+
+
+def _check_constraints(engine, placements, courses, check_class):
+    assert overlapping_pairs(placements, courses, 'room_id') == 0
+    assert overlapping_pairs(placements, courses, 'teacher') == 0
+    if check_class:
+        assert overlapping_pairs(placements, courses, 'class_name') == 0
+    store = engine.constraint_store
+    daily = {}
+    for p in placements:
+        span = engine.span(p['slot'], p.get('duration'))
+        assert store.available_masks(p['teacher'])[p['day']] & span == span
+        assert int(engine.room_dict[p['room_id']][2]) >= p['students_count']
+        daily.setdefault((p['teacher'], p['day']), set()).add((p['course_id'], p['slot']))
+    for (teacher, _), exams in daily.items():
+        assert len(exams) <= store.limit(teacher)
+
+
+@pytest.mark.parametrize('mode', ['greedy', 'dsatur'])
+def test_optimizer_never_worsens_cost(snapshot, mode):
+    check_class = mode == 'dsatur'
+    engine = OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    placer = CoursePlacer(engine)
+    placements, failed = placer.place(snapshot['courses'], mode)
+
+    # 反复优化已优化过的结果：接近局部最优时模拟退火接受的变差操作最容易留在最终结果中
+    for round_index in range(6):
+        optimizer = LocalSearchOptimizer(engine, placer, check_class=check_class, seed=round_index)
+        placements, failed = optimizer.optimize(placements, failed, max_iterations=3000)
+        stats = optimizer.last_stats
+        assert stats['final']['total'] <= stats['initial']['total']
+        assert optimizer.evaluate(placements, failed) == stats['final']
+
+        # 占用引擎与返回的结果一致，且结果满足全部硬约束
+        assert _state(engine) == _state(_register(snapshot, placements))
+        _check_constraints(engine, placements, snapshot['courses'], check_class)
+        placed = {p['course_id'] for p in placements}
+        assert len(placed) + len(failed) == len(snapshot['courses'])
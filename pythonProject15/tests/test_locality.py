@@ -0,0 +1,82 @@
+import random
+
+from conftest import EXAM_DATES
+from utils.occupancy import OccupancyEngine
+from utils.placement import CoursePlacer
+from utils.room_index import RoomIndex
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+# 甲楼 1 层的 A101 为教师常用教室
+ROOMS = [('A101', '', 60, '甲楼', '1', '', ''), ('A102', '', 90, '甲楼', '1', '', ''),
+         ('A201', '', 45, '甲楼', '2', '', ''), ('B101', '', 45, '乙楼', '1', '', ''),
+         ('B102', '', 200, '乙楼', '1', '', '')]
+
+
+def test_select_near_matches_linear_scan():
+    rng = random.Random(1)
+    rooms = [(f'R{i}', '', rng.choice([30, 45, 60, 90, 120]), f'楼{rng.randrange(3)}', str(rng.randrange(1, 4)))
+             for i in range(60)]
+    index = RoomIndex(rooms)
+    for _ in range(500):
+        busy = set(rng.sample([room[0] for room in rooms], rng.randrange(len(rooms))))
+        need = rng.randrange(10, 130)
+        building, floor = rng.choice([room[3:5] for room in rooms] + [('楼9', '1'), (None, None)])
+        eligible = [room for room in rooms if int(room[2]) >= need and room[0] not in busy]
+
+        room = index.select_near(need, index.mask_of(busy), None, building, floor)
+        if not eligible:
+            assert room is None
+            continue
+        # 先同一楼层，再同一教学楼，最后全部教室，同一范围内选容量最小的
+        for tier in ([r for r in eligible if (r[3], r[4]) == (building, floor)],
+                     [r for r in eligible if r[3] == building], eligible):
+            if tier:
+                break
+        assert room in tier
+        assert int(room[2]) == min(int(r[2]) for r in tier)
+
+
+def test_nearby_masks():
+    index = RoomIndex(ROOMS)
+    floor, building, everything = index.nearby_masks('甲楼', '1')
+    assert floor == index.mask_of(['A101', 'A102'])
+    assert building == index.mask_of(['A101', 'A102', 'A201'])
+    assert everything == index.all_mask
+    assert index.nearby_masks('甲楼', '9') == [building, everything]
+    assert index.nearby_masks('丙楼', '1') == index.nearby_masks() == [everything]
+
+
+def _placer(split_mode='sequential'):
+    snapshot = {'courses': [], 'rooms': ROOMS, 'constraints': [], 'arrangements': []}
+    engine = OccupancyEngine(snapshot, EXAM_DATES[:1], DEFAULT_TIME_SLOTS)
+    return engine, CoursePlacer(engine, split_mode=split_mode)
+
+
+def _course(course_id, students, teacher='教师甲'):
+    return (course_id, 'A101', f'课程{course_id}', '1-2节', '周一', '专任', '学院', '专业',
+            f'班级{course_id}', students, '', teacher, 120)
+
+
+def test_taken_preferred_room_falls_back_to_the_same_floor():
+    engine, placer = _placer()
+    # 常用教室全天被占用：同一楼层的 A102 比其他楼层容量更合适的 A201、B101 优先
+    for slot in range(engine.n_slots):
+        engine.place('其他教师', '其他班级', ['A101'], 0, slot)
+    placements, failed = placer.place([_course(1, 40)], 'greedy')
+    assert not failed
+    assert [p['room_id'] for p in placements] == ['A102']
+
+    # 同一楼层也被占用时使用同一教学楼的其他楼层
+    for slot in range(engine.n_slots):
+        engine.place('其他教师', '其他班级', ['A102'], 0, slot)
+    placements, failed = placer.place([_course(2, 40, '教师乙')], 'greedy')
+    assert [p['room_id'] for p in placements] == ['A201']
+
+
+def test_concurrent_sessions_stay_in_one_building():
+    engine, placer = _placer('concurrent')
+    # 150 人：常用教室 A101 加同一楼层的 A102 正好容纳，不用乙楼的大教室
+    placements, failed = placer.place([_course(1, 150)], 'greedy')
+    assert not failed
+    assert sorted(p['room_id'] for p in placements) == ['A101', 'A102']
+    assert len({(p['exam_date'], p['exam_time']) for p in placements}) == 1
@@ -0,0 +1,94 @@
+import copy
+import random
+
+from conftest import EXAM_DATES
+from utils.occupancy import OccupancyEngine
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+
+def _state(engine):
+    """
+    占用引擎的全部计数和位图，去掉全为 0 的项
+    """
+    def nonzero(table):
+        return {key: list(value) for key, value in table.items() if any(value)}
+
+    return {
+        'room_busy': nonzero(engine.room_busy),
+        'teacher_busy': nonzero(engine.teacher_busy),
+        'class_busy': nonzero(engine.class_busy),
+        'teacher_exams': nonzero(engine.teacher_exams),
+        'class_cells': nonzero(engine.class_cells),
+        'class_exams': nonzero(engine.class_exams),
+        'class_starts': nonzero(engine.class_starts),
+        'class_ends': nonzero(engine.class_ends),
+        'cell_rooms': list(engine.cell_rooms)
+    }
+
+
+def _random_exams(engine, rng, count=200):
+    """
+    随机的考试登记参数：(教师, 班级, 教室, 日期, 开始时间段, 时长)，包含跨多个时间段的长考试和同时分场
+    """
+    rooms = [room[0] for room in engine.rooms]
+    exams = []
+    for _ in range(count):
+        course = rng.choice(engine.courses)
+        duration = rng.choice([None, 90, 180, 240])
+        slot = rng.randrange(engine.n_slots)
+        if not engine.span(slot, duration):
+            continue
+        exams.append((course[11], course[8], rng.sample(rooms, rng.choice([1, 1, 2])),
+                      rng.randrange(engine.n_days), slot, duration))
+    return exams
+
+
+def test_release_restores_state_after_place(snapshot):
+    engine = OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    initial = copy.deepcopy(_state(engine))
+    rng = random.Random(1)
+    exams = _random_exams(engine, rng)
+
+    for exam in exams:
+        engine.place(*exam)
+    assert _state(engine) != initial
+
+    # 以任意顺序撤销，重叠的登记按计数清除
+    rng.shuffle(exams)
+    for exam in exams:
+        engine.release(*exam)
+    assert _state(engine) == initial
+
+
+def test_place_blocks_and_release_frees_the_cell(snapshot):
+    engine = OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    teacher, class_name = engine.courses[0][11], engine.courses[0][8]
+    room_id = engine.rooms[0][0]
+    day = next(day for day in range(engine.n_days) if engine.teacher_can_take(teacher, day, 0, 180))
+    assert engine.is_feasible(teacher, class_name, [room_id], day, 0, True, 180)
+
+    engine.place(teacher, class_name, [room_id], day, 0, 180)
+    # 180 分钟的考试占用前两个时间段
+    assert not engine.room_free(room_id, day, 1)
+    assert not engine.is_feasible(teacher, None, [engine.rooms[1][0]], day, 1)
+    assert not engine.class_free(class_name, day, 1)
+    assert engine.room_free(room_id, day, 2)
+    assert engine.teacher_daily_count(teacher, day) == 1
+
+    engine.release(teacher, class_name, [room_id], day, 0, 180)
+    assert engine.is_feasible(teacher, class_name, [room_id], day, 0, True, 180)
+    assert engine.teacher_daily_count(teacher, day) == 0
+
+
+def test_existing_arrangements_are_registered(snapshot):
+    room_id = snapshot['rooms'][0][0]
+    course = snapshot['courses'][0]
+    snapshot = dict(snapshot, arrangements=[
+        # 手动调整的非标准时间占用与之重叠的全部时间段
+        (1, str(course[0]), room_id, EXAM_DATES[0], '09:00-11:00', course[8], 30, course[11])
+    ])
+    engine = OccupancyEngine(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    assert not engine.room_free(room_id, 0, 0)
+    assert not engine.room_free(room_id, 0, 1)
+    assert engine.room_free(room_id, 0, 2)
+    assert engine.teacher_daily_count(course[11], 0) == 1
@@ -0,0 +1,44 @@
+import pytest
+
+from conftest import EXAM_DATES, overlapping_pairs
+from utils.parallel_scheduler import ParallelScheduler, partition_courses
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+
+def test_component_partitions_share_no_teacher_or_class(snapshot):
+    courses = snapshot['courses']
+    partitions = partition_courses(courses, snapshot['rooms'], 'component', snapshot['enrolment'])
+
+    assert sorted(course[0] for partition in partitions for course in partition) == \
+        sorted(course[0] for course in courses)
+    owner = {}
+    for index, partition in enumerate(partitions):
+        for course in partition:
+            for key in (('teacher', course[11]), ('class', course[8])):
+                assert owner.setdefault(key, index) == index
+
+
+def test_partition_by_college(snapshot):
+    partitions = partition_courses(snapshot['courses'], snapshot['rooms'], 'college')
+    assert all(len({course[6] for course in partition}) == 1 for partition in partitions)
+    with pytest.raises(ValueError):
+        partition_courses(snapshot['courses'], snapshot['rooms'], 'teacher')
+
+
+@pytest.mark.parametrize('partition_by, mode', [
+    ('college', 'greedy'), ('building', 'dsatur'), ('component', 'greedy')
+])
+def test_merge_repairs_conflicts_between_partitions(snapshot, partition_by, mode):
+    scheduler = ParallelScheduler(snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS, max_workers=2)
+    placements, failed = scheduler.schedule(partition_by, mode)
+    courses = snapshot['courses']
+
+    # 按学院、教学楼分区时不同分区共享教师和教室，合并时换教室或重新安排
+    if partition_by != 'component':
+        assert scheduler.last_stats['room_repairs'] + scheduler.last_stats['replanned'] > 0
+    assert overlapping_pairs(placements, courses, 'room_id') == 0
+    assert overlapping_pairs(placements, courses, 'teacher') == 0
+    if mode == 'dsatur':
+        assert overlapping_pairs(placements, courses, 'class_name') == 0
+    placed = {str(p['course_id']) for p in placements}
+    assert len(placed) + len(failed) == len(courses)
@@ -0,0 +1,69 @@
+import itertools
+import random
+import sqlite3
+from types import SimpleNamespace
+
+from conftest import END_DATE, START_DATE
+from utils.exam_scheduler import ExamScheduler
+from utils.schedule_result import format_pareto_front, pareto_front
+
+
+def _dominates(a, b):
+    return all(x <= y for x, y in zip(a, b)) and a != b
+
+
+def test_front_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(200):
+        results = [None if rng.random() < 0.1 else
+                   SimpleNamespace(objectives=(rng.randrange(3), rng.randrange(3), rng.randrange(3),
+                                               float(rng.randrange(3))))
+                   for _ in range(rng.randrange(12))]
+        indices = [i for i, result in enumerate(results) if result is not None]
+        expected = set()
+        seen = set()
+        for i in indices:
+            objectives = results[i].objectives
+            # 目标相同的结果只保留第一个
+            if objectives in seen or any(_dominates(results[j].objectives, objectives) for j in indices):
+                continue
+            seen.add(objectives)
+            expected.add(i)
+
+        front = pareto_front(results)
+        assert set(front) == expected
+        assert [results[i].objectives for i in front] == sorted(results[i].objectives for i in front)
+
+
+def test_explore_schedules_and_commit_from_the_front(dataset):
+    settings_list = [
+        {'start_date': START_DATE, 'end_date': END_DATE, 'slots_per_day': 4, 'use_cache': False},
+        {'start_date': START_DATE, 'end_date': END_DATE, 'slots_per_day': 5, 'use_cache': False,
+         'course_order': 'random_restart', 'spread': {'min_gap_days': 2}},
+    ]
+    done = []
+    scheduler = ExamScheduler(dataset)
+    try:
+        results, front = scheduler.explore_schedules(settings_list, seeds=[1, 2], max_workers=2,
+                                                     callback=lambda index, result: done.append(index))
+        assert sorted(done) == [0, 1, 2, 3]
+        assert [(r.settings['slots_per_day'], r.settings['seed']) for r in results] == \
+            list(itertools.product([4, 5], [1, 2]))
+        assert front and set(front) <= set(range(4))
+        for i, j in itertools.product(front, range(4)):
+            assert not _dominates(results[j].objectives, results[i].objectives)
+        text = format_pareto_front(results, front)
+        assert text.count('\n') == len(front)
+
+        best = results[front[0]]
+        assert scheduler.commit_schedule(best)[0]
+    finally:
+        scheduler.close()
+
+    conn = sqlite3.connect(dataset)
+    try:
+        rows = conn.execute('SELECT 教室号, 教室编号, 考试日期, 考试时间 FROM exam_arrangements').fetchall()
+    finally:
+        conn.close()
+    assert sorted(rows) == sorted((str(p['course_id']), p['room_id'], p['exam_date'], p['exam_time'])
+                                  for p in best.placements)
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import EXAM_DATES, overlapping_pairs
+from utils.occupancy import OccupancyEngine
+from utils.placement import CoursePlacer
+from utils.time_slots import DEFAULT_TIME_SLOTS
+
+
+OVERSIZED = {0: 200, 1: 320, 2: 420}
+
+
+@pytest.fixture
+def oversized_snapshot(snapshot):
+    """
+    把前 3 门课程的考试人数改为超过最大教室容量
+    """
+    courses = list(snapshot['courses'])
+    for index, students_count in OVERSIZED.items():
+        courses[index] = courses[index][:9] + (students_count,) + courses[index][10:]
+    return dict(snapshot, courses=courses)
+
+
+@pytest.mark.parametrize('split_mode', ['sequential', 'concurrent'])
+def test_oversized_courses_are_split(oversized_snapshot, split_mode):
+    engine = OccupancyEngine(oversized_snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    courses = oversized_snapshot['courses']
+    assert min(OVERSIZED.values()) > engine.room_index.max_capacity
+    placements, failed = CoursePlacer(engine, split_mode=split_mode).place(courses, 'greedy')
+
+    assert not failed
+    assert overlapping_pairs(placements, courses, 'room_id') == 0
+    assert overlapping_pairs(placements, courses, 'teacher') == 0
+    for index, students_count in OVERSIZED.items():
+        sessions = [p for p in placements if p['course_id'] == courses[index][0]]
+        assert len(sessions) > 1
+        assert sum(p['students_count'] for p in sessions) == students_count
+        assert all(p['students_count'] <= int(engine.room_dict[p['room_id']][2]) for p in sessions)
+        assert sorted(p['session'] for p in sessions) == list(range(1, len(sessions) + 1))
+        assert all(p['total_sessions'] == len(sessions) for p in sessions)
+        cells = {(p['exam_date'], p['exam_time']) for p in sessions}
+        if split_mode == 'concurrent':
+            # 同时分场：同一时间段的多间不同教室
+            assert len(cells) == 1
+            assert len({p['room_id'] for p in sessions}) == len(sessions)
+            assert all(p['concurrent'] for p in sessions)
+        else:
+            assert len(cells) == len(sessions)
+
+
+def test_concurrent_split_counts_as_one_exam(oversized_snapshot):
+    engine = OccupancyEngine(oversized_snapshot, EXAM_DATES, DEFAULT_TIME_SLOTS)
+    course = oversized_snapshot['courses'][1]
+    placements, _ = CoursePlacer(engine, split_mode='concurrent').place([course], 'greedy')
+
+    # 多间教室同时考试，教师当天只计一场
+    day = placements[0]['day']
+    assert engine.teacher_daily_count(course[11], day) == 1
+    for p in placements:
+        assert not engine.room_free(p['room_id'], day, p['slot'])
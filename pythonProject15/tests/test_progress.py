@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from conftest import END_DATE, START_DATE
+from utils.exam_scheduler import ExamScheduler
+from utils.progress import CancellationToken, ProgressReporter, ScheduleCancelled
+
+
+def _arrangements(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(conn.execute('SELECT * FROM exam_arrangements').fetchall())
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def scheduler(dataset):
+    scheduler = ExamScheduler(dataset)
+    scheduler.schedule_exams(START_DATE, END_DATE, 4, use_cache=False)
+    yield scheduler
+    scheduler.close()
+
+
+@pytest.mark.parametrize('stage, settings', [
+    ('加载数据', {}),
+    ('安排课程', {'mode': 'dsatur'}),
+    ('并行排考', {'partition_by': 'college', 'max_workers': 1}),
+    ('局部搜索优化', {'optimize_seconds': 5, 'optimize_iterations': 100000, 'seed': 1}),
+])
+def test_cancel_during_stage_keeps_arrangements(scheduler, dataset, stage, settings):
+    before = _arrangements(dataset)
+    token = CancellationToken()
+    stages = []
+
+    def on_progress(info):
+        stages.append(info['stage'])
+        if info['stage'] == stage:
+            token.cancel()
+
+    # 换一种排考方式，未取消时会替换原有安排
+    success, message, failed = scheduler.schedule_exams(
+        START_DATE, END_DATE, 5, use_cache=False, progress_callback=on_progress, cancel_token=token, **settings
+    )
+    assert not success
+    assert '已取消' in message
+    assert failed == []
+    # 取消后不再进入后续阶段
+    assert stages[-1] == stage
+    assert not scheduler.conn.in_transaction
+    assert _arrangements(dataset) == before
+
+
+def test_cancel_between_dry_run_and_commit(scheduler, dataset):
+    before = _arrangements(dataset)
+    token = CancellationToken()
+    result = scheduler.dry_run(START_DATE, END_DATE, 5, use_cache=False, cancel_token=token)
+    token.cancel()
+    assert not scheduler.commit_schedule(result, token)[0]
+    assert _arrangements(dataset) == before
+
+
+def test_reporter_throttles_callbacks_and_checks_token():
+    reports = []
+    token = CancellationToken()
+    progress = ProgressReporter(reports.append, token, interval=60)
+
+    progress.begin('安排课程', 10)
+    for _ in range(5):
+        progress.update(teacher='教师')
+    # 开始新阶段时立即报告，阶段内按时间间隔节流
+    assert [(r['stage'], r['done'], r['total']) for r in reports] == [('安排课程', 0, 10)]
+    assert progress.done == 5
+
+    token.cancel()
+    with pytest.raises(ScheduleCancelled):
+        progress.update()
+    with pytest.raises(ScheduleCancelled):
+        ProgressReporter(cancel_token=token).begin('加载数据')
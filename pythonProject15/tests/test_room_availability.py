@@ -0,0 +1,78 @@
+import random
+
+from conftest import EXAM_DATES
+from utils.occupancy import OccupancyEngine
+from utils.placement import CoursePlacer
+from utils.room_availability import (ALL_WEEKDAYS, RoomAvailability, normalize_room_availability,
+                                     parse_room_availability, room_open_at)
+from utils.room_index import RoomIndex
+from utils.time_slots import STANDARD_TIME_SLOTS
+
+AVAILABLE_DATES = ['', '1-5', '1,3,5', '6,7', '2-4,7', '8,周一']
+AVAILABLE_TIMES = ['', '08:00-12:30', '08:00-22:00', '14:00-16:00,19:00-21:00', '10:00-18:30', '无效']
+
+
+def test_parse_room_availability():
+    assert parse_room_availability('', '') == (ALL_WEEKDAYS, None, ())
+    assert parse_room_availability('1-3，5', None)[0] == 0b10111
+    weekdays, windows, invalid = parse_room_availability('8,周一', '08:00-12:00,无效,12:00-10:00')
+    # 全部星期都无法解析时按不限处理
+    assert weekdays == ALL_WEEKDAYS
+    assert windows == ((480, 720),)
+    assert invalid == ('8', '周一', '无效', '12:00-10:00')
+    assert normalize_room_availability('5,1-3', '14:00-16:00,08:00-12:00') == \
+        ('1,2,3,5', '08:00-12:00,14:00-16:00', ())
+
+
+def test_masks_match_single_checks():
+    rng = random.Random(1)
+    rooms = [(f'R{i}', '', rng.choice([30, 60, 120]), '楼', '1',
+              rng.choice(AVAILABLE_DATES), rng.choice(AVAILABLE_TIMES)) for i in range(80)]
+    # 没有可用日期、可用时间字段的旧教室记录不受限制
+    rooms.append(('旧教室', '', 60, '楼', '1'))
+    index = RoomIndex(rooms)
+    availability = RoomAvailability(rooms, index, EXAM_DATES, STANDARD_TIME_SLOTS)
+
+    for room in rooms:
+        open_slots = 0
+        for day, exam_date in enumerate(EXAM_DATES):
+            for slot, exam_time in enumerate(STANDARD_TIME_SLOTS):
+                expected = len(room) < 7 or room_open_at(room[5], room[6], exam_date, exam_time)
+                assert availability.is_open(room[0], day, slot) == expected
+                closed = availability.closed_rooms(day, slot) & index.mask_of([room[0]])
+                assert bool(closed) != expected
+                open_slots += expected
+        assert availability.open_slot_count(room[0]) == open_slots
+
+
+def test_placements_use_open_rooms_only(snapshot):
+    rng = random.Random(2)
+    rooms = [room[:5] + (rng.choice(AVAILABLE_DATES[:5]), rng.choice(AVAILABLE_TIMES[:5]))
+             for room in snapshot['rooms']]
+    snapshot = dict(snapshot, rooms=rooms)
+    engine = OccupancyEngine(snapshot, EXAM_DATES, STANDARD_TIME_SLOTS)
+    placements, failed = CoursePlacer(engine).place(snapshot['courses'], 'greedy')
+
+    assert placements
+    room_dict = {room[0]: room for room in rooms}
+    for p in placements:
+        room = room_dict[p['room_id']]
+        # 长考试跨多个时间段，整个考试时间都要开放
+        assert room_open_at(room[5], room[6], p['exam_date'], p['exam_time'])
+
+
+def test_long_exam_must_fit_in_opening_hours():
+    rooms = [('上午', '', 60, '楼', '1', '', '08:00-12:30'), ('全天', '', 60, '楼', '1', '', '08:00-22:00'),
+             ('不限', '', 60, '楼', '1', '', '')]
+    snapshot = {'courses': [], 'rooms': rooms, 'constraints': [], 'arrangements': []}
+    engine = OccupancyEngine(snapshot, EXAM_DATES, STANDARD_TIME_SLOTS)
+
+    # 10:30 开始的 180 分钟考试只占一个时间段，但到 13:30 才结束
+    assert engine.span(1, 180) == 0b10
+    assert engine.room_free('上午', 0, 1)
+    assert not engine.room_free('上午', 0, 1, 180)
+    assert engine.room_free('全天', 0, 1, 180)
+    assert engine.room_free('不限', 0, 1, 180)
+    occupied = engine.occupied_rooms(0, 1, 180)
+    assert occupied == engine.room_index.mask_of(['上午'])
+    assert engine.room_index.select(50, occupied)[0] != '上午'
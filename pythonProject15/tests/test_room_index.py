@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from utils.room_index import RoomIndex, make_room_strategy
+
+
+def _rooms(seed=1, count=60):
+    """
+    随机教室：(教室编号, 名称, 容量, 教学楼, 楼层)
+    """
+    rng = random.Random(seed)
+    return [(f'R{i}', f'教室{i}', rng.choice([30, 45, 60, 60, 90, 120, 200]),
+             f'楼{rng.randrange(3)}', str(rng.randrange(1, 5))) for i in range(count)]
+
+
+def _occupied(index, rng):
+    busy = rng.sample([room[0] for room in index.rooms], rng.randrange(len(index.rooms)))
+    return set(busy), index.mask_of(busy + ['不存在的教室'])
+
+
+def test_select_matches_linear_scan():
+    rooms = _rooms()
+    index = RoomIndex(rooms)
+    rng = random.Random(2)
+    for _ in range(500):
+        busy, occupied = _occupied(index, rng)
+        need = rng.randrange(10, 220)
+        building = rng.choice([None, '楼0', '楼1'])
+        floor = rng.choice([None, '1', '2']) if building else None
+        eligible = [room for room in rooms if int(room[2]) >= need and room[0] not in busy
+                    and building in (None, room[3]) and floor in (None, room[4])]
+
+        best = index.select(need, occupied, make_room_strategy('best_fit'), building, floor)
+        first = index.select(need, occupied, make_room_strategy('first_fit'), building, floor)
+        chosen = index.select(need, occupied, make_room_strategy('random', rng), building, floor)
+        if not eligible:
+            assert best is first is chosen is None
+            continue
+        # 最佳适配选容量最小的，首次适配选导入顺序最前的
+        assert int(best[2]) == min(int(room[2]) for room in eligible)
+        assert first == eligible[0]
+        assert chosen in eligible
+
+
+def test_select_many_covers_need_with_free_rooms():
+    rooms = _rooms(seed=3)
+    index = RoomIndex(rooms)
+    rng = random.Random(4)
+    for _ in range(500):
+        busy, occupied = _occupied(index, rng)
+        need = rng.randrange(50, 1500)
+        building = rng.choice([None, '楼0', '楼2'])
+        free_capacity = sum(int(room[2]) for room in rooms if room[0] not in busy)
+
+        selected = index.select_many(need, occupied, building)
+        if free_capacity < need:
+            assert selected is None
+            continue
+        assert selected is not None
+        ids = [room[0] for room in selected]
+        assert len(set(ids)) == len(ids)
+        assert not busy & set(ids)
+        assert sum(int(room[2]) for room in selected) >= need
+        # 去掉任意一间后都容纳不下，不会多占教室
+        assert all(sum(int(room[2]) for room in selected) - int(room[2]) < need for room in selected)
+
+
+def test_select_many_prefers_the_given_building():
+    rooms = [('A1', '', 60, '甲楼', '1'), ('A2', '', 60, '甲楼', '2'),
+             ('B1', '', 200, '乙楼', '1'), ('B2', '', 30, '乙楼', '1')]
+    index = RoomIndex(rooms)
+    assert {room[0] for room in index.select_many(100, 0, '甲楼')} == {'A1', 'A2'}
+    assert [room[0] for room in index.select_many(100)] == ['B1']
+    assert index.select_many(400) is None
+
+
+def test_unknown_strategy():
+    with pytest.raises(ValueError):
+        make_room_strategy('worst_fit')
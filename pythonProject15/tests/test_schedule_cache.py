@@ -0,0 +1,123 @@
+import json
+import pickle
+import sqlite3
+
+import pytest
+
+from conftest import END_DATE, START_DATE
+from utils.exam_scheduler import ExamScheduler
+
+
+UNPICKLED = []
+
+
+def _unpickled(value):
+    UNPICKLED.append(value)
+
+
+class _Payload:
+    """
+    反序列化时会执行代码的对象
+    """
+
+    def __reduce__(self):
+        return _unpickled, ('已执行',)
+
+
+def _settings(**overrides):
+    settings = {
+        'seed': None, 'optimize_seconds': 0, 'optimize_iterations': None,
+        'room_strategy': 'best_fit', 'course_order': 'teacher'
+    }
+    settings.update(overrides)
+    return settings
+
+
+def _cells(result):
+    return sorted((p['course_id'], p['room_id'], p['day'], p['slot'], p['students_count']) for p in result.placements)
+
+
+@pytest.fixture
+def scheduler(dataset):
+    scheduler = ExamScheduler(dataset)
+    yield scheduler
+    scheduler.close()
+
+
+@pytest.mark.parametrize('overrides, expected', [
+    ({}, True),
+    ({'room_strategy': 'random'}, False),
+    ({'course_order': 'random_restart'}, False),
+    ({'optimize_seconds': 1}, False),
+    ({'seed': 1, 'room_strategy': 'random', 'course_order': 'random_restart'}, True),
+    ({'seed': 1, 'optimize_seconds': 1}, False),
+    ({'seed': 1, 'optimize_seconds': 1, 'optimize_iterations': 1000}, True),
+])
+def test_is_deterministic(scheduler, overrides, expected):
+    assert scheduler._is_deterministic(_settings(**overrides)) is expected
+
+
+def test_iteration_capped_optimization_ignores_time_budget(scheduler):
+    # 时间预算远小于完成全部迭代所需的时间，结果仍只取决于随机种子和迭代次数
+    results = [
+        scheduler.dry_run(START_DATE, END_DATE, seed=1, optimize_seconds=0.001, optimize_iterations=3000,
+                          use_cache=False)
+        for _ in range(2)
+    ]
+    assert [result.optimizer_stats['iterations'] for result in results] == [3000, 3000]
+    assert _cells(results[0]) == _cells(results[1])
+
+
+def test_deterministic_run_is_served_from_cache(scheduler):
+    first = scheduler.dry_run(START_DATE, END_DATE, seed=1, optimize_seconds=0.001, optimize_iterations=500)
+    second = scheduler.dry_run(START_DATE, END_DATE, seed=1, optimize_seconds=0.001, optimize_iterations=500)
+    assert not first.from_cache
+    assert second.from_cache
+    assert _cells(first) == _cells(second)
+
+
+def test_time_budget_run_is_not_cached(scheduler):
+    scheduler.dry_run(START_DATE, END_DATE, optimize_seconds=0.01)
+    second = scheduler.dry_run(START_DATE, END_DATE, optimize_seconds=0.01)
+    assert not second.from_cache
+
+
+def test_cache_stores_json_and_rebuilds_result(scheduler, dataset):
+    first = scheduler.dry_run(START_DATE, END_DATE, seed=1, optimize_seconds=1, optimize_iterations=300,
+                              spread={'same_day': 20})
+    second = scheduler.dry_run(START_DATE, END_DATE, seed=1, optimize_seconds=1, optimize_iterations=300,
+                               spread={'same_day': 20})
+    assert second.from_cache
+    assert second.to_dict() == json.loads(json.dumps(first.to_dict()))
+    assert second.metrics == first.metrics
+    assert second.objectives == first.objectives
+    # 整数课程 id 在缓存中保持不变，写入时能找到课程指纹
+    assert second.course_keys == first.course_keys
+    assert scheduler.commit_schedule(second)[0]
+
+    conn = sqlite3.connect(dataset)
+    try:
+        stored = conn.execute('SELECT result FROM schedule_cache WHERE fingerprint = ?',
+                              (first.fingerprint,)).fetchone()[0]
+    finally:
+        conn.close()
+    assert json.loads(stored)['fingerprint'] == first.fingerprint
+
+
+def test_cached_incremental_result_can_be_committed(scheduler):
+    scheduler.schedule_exams(START_DATE, END_DATE, use_cache=False)
+    first = scheduler.dry_run(START_DATE, END_DATE, incremental=True)
+    cached = scheduler.dry_run(START_DATE, END_DATE, incremental=True)
+    assert cached.from_cache
+    # 课程 id 的类型在缓存中保持不变，写入前的比对和课程指纹查找与试排结果一致
+    assert cached.pinned == first.pinned
+    assert cached.course_keys == first.course_keys
+    assert scheduler.commit_schedule(cached)[0]
+
+
+def test_pickled_rows_are_never_loaded(scheduler):
+    scheduler.conn.execute('INSERT INTO schedule_cache (fingerprint, created_at, result) VALUES (?, ?, ?)',
+                           ('旧缓存', '2026-01-01', pickle.dumps(_Payload())))
+    scheduler.conn.commit()
+    assert scheduler.schedule_cache.get('旧缓存') is None
+    assert UNPICKLED == []
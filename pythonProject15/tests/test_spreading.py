@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from conftest import END_DATE, EXAM_DATES, START_DATE
+from utils.exam_scheduler import ExamScheduler
+from utils.occupancy import OccupancyEngine
+from utils.spreading import SpreadingObjective
+from utils.time_slots import STANDARD_TIME_SLOTS
+
+CLASSES = ['班级1', '班级2', '班级3']
+
+
+@pytest.mark.parametrize('min_gap_days', [1, 2, 3])
+def test_incremental_cost_matches_full_evaluation(min_gap_days):
+    rng = random.Random(min_gap_days)
+    engine = OccupancyEngine({'courses': [], 'rooms': [], 'constraints': [], 'arrangements': []},
+                             EXAM_DATES[:5], STANDARD_TIME_SLOTS)
+    objective = SpreadingObjective(engine, min_gap_days, {'same_day': 7, 'back_to_back': 3, 'min_gap': 1})
+    placed = []
+    for _ in range(300):
+        before = objective.evaluate()['total']
+        if placed and rng.random() < 0.4:
+            class_name, day, slot, duration = placed.pop(rng.randrange(len(placed)))
+            delta = objective.cost(class_name, day, slot, duration, placed=True)
+            engine.release(None, class_name, [], day, slot, duration)
+            assert before - objective.evaluate()['total'] == pytest.approx(delta)
+        else:
+            # 包含跨两个时间段的长考试和同一班级同时进行的考试
+            exam = (rng.choice(CLASSES), rng.randrange(5), rng.randrange(5), rng.choice([None, 180]))
+            delta = objective.cost(*exam)
+            engine.place(None, exam[0], [], *exam[1:])
+            if engine.span(exam[2], exam[3]):
+                placed.append(exam)
+            assert objective.evaluate()['total'] - before == pytest.approx(delta)
+
+
+def test_penalties():
+    engine = OccupancyEngine({'courses': [], 'rooms': [], 'constraints': [], 'arrangements': []},
+                             EXAM_DATES[:5], STANDARD_TIME_SLOTS)
+    objective = SpreadingObjective(engine, min_gap_days=2)
+    # 08:00-11:00 的考试结束后紧接着 14:00 开始的考试，第二天还有一场
+    engine.place(None, '班级', [], 0, 0, 180)
+    assert objective.cost('班级', 0, 2) == 20 + 10
+    assert objective.cost('班级', 1, 0) == 5
+    assert objective.cost('班级', 2, 0) == 0
+    assert objective.cost('', 0, 0) == 0
+    engine.place(None, '班级', [], 0, 2)
+    engine.place(None, '班级', [], 1, 0)
+    assert objective.evaluate() == {'same_day': 1, 'back_to_back': 1, 'min_gap': 2, 'total': 20 + 10 + 2 * 5}
+
+
+def test_from_settings():
+    engine = OccupancyEngine({'courses': [], 'rooms': [], 'constraints': [], 'arrangements': []},
+                             EXAM_DATES[:5], STANDARD_TIME_SLOTS)
+    objective = SpreadingObjective.from_settings(engine, {'min_gap_days': 3, 'same_day': 50})
+    assert objective.min_gap_days == 3
+    assert objective.weights == dict(SpreadingObjective.DEFAULT_WEIGHTS, same_day=50)
+    with pytest.raises(ValueError):
+        SpreadingObjective.from_settings(engine, {'same_days': 1})
+
+
+def test_spread_schedule_has_fewer_same_day_exams(dataset):
+    scheduler = ExamScheduler(dataset)
+    try:
+        plain = scheduler.dry_run(START_DATE, END_DATE, 4, use_cache=False)
+        spread = scheduler.dry_run(START_DATE, END_DATE, 4, use_cache=False, spread={'min_gap_days': 2})
+    finally:
+        scheduler.close()
+    assert not spread.failed_courses
+    assert spread.spread_stats['same_day'] < plain.spread_stats['same_day']
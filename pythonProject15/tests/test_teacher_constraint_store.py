@@ -0,0 +1,94 @@
+from conftest import EXAM_DATES
+from models.database import DatabaseManager
+from utils.teacher_constraints import TeacherConstraintStore, TeacherConstraintsManager
+from utils.time_slots import STANDARD_TIME_SLOTS
+
+
+FULL_DAY = 0b11111
+
+
+def _row(teacher, max_exams=3, no_evening=0, no_weekend=0, dates='', times=''):
+    """
+    teacher_constraints 表的一行：(教师, 每日场次, 不排晚上, 不排周末, 不可用日期, 不可用时间)
+    """
+    return (teacher, max_exams, no_evening, no_weekend, dates, times)
+
+
+def test_masks_compile_each_constraint():
+    store = TeacherConstraintStore(EXAM_DATES, STANDARD_TIME_SLOTS).build([
+        _row('晚上', no_evening=1),
+        _row('周末', no_weekend=1),
+        _row('日期', dates='2026-06-03,2026-07-01'),
+        # 与时间段部分重叠的不可用时间占掉整个时间段，落在时间段之间空隙的不占用
+        _row('时间', times='10:00-11:00,12:40-13:50'),
+        _row('场次', max_exams=1)
+    ])
+
+    assert store.available_masks('晚上') == [0b01111] * len(EXAM_DATES)
+    # 2026-06-06、2026-06-07 为周末
+    assert [day for day, mask in enumerate(store.available_masks('周末')) if not mask] == [5, 6]
+    assert [day for day, mask in enumerate(store.available_masks('日期')) if not mask] == [2]
+    assert store.available_masks('时间') == [0b11101] * len(EXAM_DATES)
+    assert store.available_masks('场次') == [FULL_DAY] * len(EXAM_DATES)
+    assert store.limit('场次') == 1
+
+    # 没有约束记录的教师全部可用
+    assert store.available_masks('无约束') == [FULL_DAY] * len(EXAM_DATES)
+    assert store.limit('无约束') == 3
+
+
+def test_is_available_on_and_off_grid():
+    store = TeacherConstraintStore(EXAM_DATES, STANDARD_TIME_SLOTS).build([_row('时间', times='10:00-11:00')])
+    assert not store.is_available('时间', '2026-06-01', '10:30-12:30')
+    assert store.is_available('时间', '2026-06-01', '08:00-10:00')
+    # 跨两个时间段的考试需要两个时间段都可用
+    assert not store.is_available('时间', '2026-06-01', '09:00-11:00')
+    assert store.is_available('时间', '2026-06-01', '14:00-17:00')
+    # 窗口外的日期和无法解析的时间交给逐项检查
+    assert store.is_available('时间', '2026-07-01', '08:00-10:00') is None
+    assert store.is_available('时间', '2026-06-01', '无效时间') is None
+
+
+def test_refresh_recompiles_one_teacher():
+    store = TeacherConstraintStore(EXAM_DATES, STANDARD_TIME_SLOTS).build([_row('甲', no_evening=1), _row('乙')])
+    store.refresh('甲', _row('甲', max_exams=2))
+    assert store.available_masks('甲') == [FULL_DAY] * len(EXAM_DATES)
+    assert store.limit('甲') == 2
+    store.refresh('乙', None)
+    assert store.get('乙')['max_exams_per_day'] == 3
+
+
+def test_compile_window_follows_other_connections(dataset):
+    first = DatabaseManager(dataset)
+    second = DatabaseManager(dataset)
+    try:
+        manager = TeacherConstraintsManager(first)
+        store = manager.compile_window(EXAM_DATES, STANDARD_TIME_SLOTS)
+        teacher = next(iter(store.constraints))
+        # 窗口和数据都没有变化时复用已编译的位图
+        assert manager.compile_window(EXAM_DATES, STANDARD_TIME_SLOTS) is store
+
+        # 另一个连接用 UPDATE 修改约束，记录数和 rowid 都不变
+        second.cursor.execute('UPDATE teacher_constraints SET unavailable_dates = ? WHERE teacher_name = ?',
+                              (EXAM_DATES[0], teacher))
+        second.conn.commit()
+        store = manager.compile_window(EXAM_DATES, STANDARD_TIME_SLOTS)
+        assert store.available_masks(teacher)[0] == 0
+        assert EXAM_DATES[0] in manager.get_constraints(teacher)['unavailable_dates']
+
+        # 本连接的修改通过 set_teacher_constraints 只更新该教师
+        assert manager.set_teacher_constraints(teacher, max_exams_per_day=1)
+        assert manager.compile_window(EXAM_DATES, STANDARD_TIME_SLOTS) is store
+        assert store.available_masks(teacher)[0] == FULL_DAY
+        assert store.limit(teacher) == 1
+        assert manager.get_constraints(teacher)['max_exams_per_day'] == 1
+
+        # 直接修改约束表后 invalidate() 丢弃全部缓存
+        first.cursor.execute('UPDATE teacher_constraints SET no_evening_exams = 1')
+        first.conn.commit()
+        manager.invalidate()
+        store = manager.compile_window(EXAM_DATES, STANDARD_TIME_SLOTS)
+        assert store.available_masks(teacher)[0] == 0b01111
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from conftest import END_DATE, EXAM_DATES, START_DATE
+from models.database import DatabaseManager
+from utils.exam_scheduler import ExamScheduler
+from utils.teacher_constraints import BATCH_OK, TeacherConstraintsManager
+from utils.time_slots import STANDARD_TIME_SLOTS
+
+
+@pytest.fixture
+def manager(dataset):
+    scheduler = ExamScheduler(dataset)
+    try:
+        scheduler.schedule_exams(START_DATE, END_DATE, 4, use_cache=False)
+    finally:
+        scheduler.close()
+
+    db_manager = DatabaseManager(dataset)
+    # 覆盖每种约束：不可用日期、与时间段部分重叠的不可用时间、每日 1 场
+    db_manager.cursor.execute('''
+        UPDATE teacher_constraints
+        SET unavailable_dates = '2026-06-03', unavailable_times = '10:00-11:00,18:30-19:30'
+        WHERE rowid % 3 = 0
+    ''')
+    db_manager.cursor.execute('UPDATE teacher_constraints SET max_exams_per_day = 1 WHERE rowid % 4 = 0')
+    db_manager.conn.commit()
+    yield TeacherConstraintsManager(db_manager)
+    db_manager.close()
+
+
+def _teachers(manager):
+    manager.db_manager.cursor.execute('SELECT DISTINCT 教师 FROM courses ORDER BY 教师')
+    return [row[0] for row in manager.db_manager.cursor.fetchall()]
+
+
+def test_validate_batch_matches_single_checks(manager):
+    rng = random.Random(1)
+    teachers = _teachers(manager) + ['没有课程的教师']
+    dates = EXAM_DATES
+    # 网格外的考试时间：跨两个时间段、落在时间段之间的空隙、无法解析
+    times = list(STANDARD_TIME_SLOTS) + ['09:00-10:30', '12:40-13:50', '19:30-20:00', '无效时间']
+    checks = [(rng.choice(teachers), rng.choice(dates), rng.choice(times)) for _ in range(1500)]
+
+    results = manager.validate_batch(checks)
+    assert results == [manager.validate_teacher_schedule(*check) for check in checks]
+    assert any(is_valid for is_valid, _ in results)
+    assert not all(is_valid for is_valid, _ in results)
+
+
+def test_validate_grid_matches_single_checks(manager):
+    teachers = _teachers(manager)[:30]
+    dates = EXAM_DATES
+    valid, codes = manager.validate_grid(teachers, dates)
+
+    assert valid.shape == codes.shape == (len(teachers), len(dates), len(STANDARD_TIME_SLOTS))
+    assert (valid == (codes == BATCH_OK)).all()
+    for i, teacher in enumerate(teachers):
+        for j, exam_date in enumerate(dates):
+            for k, exam_time in enumerate(STANDARD_TIME_SLOTS):
+                assert valid[i, j, k] == manager.validate_teacher_schedule(teacher, exam_date, exam_time)[0]
+
+
+def test_validate_batch_empty(manager):
+    assert manager.validate_batch([]) == []
+
+
+def test_validate_batch_query_count_does_not_grow(manager):
+    teachers = _teachers(manager)
+    checks = [(teacher, exam_date, exam_time)
+              for teacher in teachers for exam_date in EXAM_DATES for exam_time in STANDARD_TIME_SLOTS]
+    statements = []
+    manager.db_manager.conn.set_trace_callback(statements.append)
+    try:
+        manager.validate_batch(checks[:10])
+        small = len(statements)
+        statements.clear()
+        manager.validate_batch(checks)
+    finally:
+        manager.db_manager.conn.set_trace_callback(None)
+    # 每张表一次分组查询，与检查的数量无关
+    assert len(statements) == small <= 3
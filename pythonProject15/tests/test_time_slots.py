@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from utils.time_slots import (DEFAULT_TIME_SLOTS, STANDARD_TIME_SLOTS, IntervalIndex, TimeSlotGrid, exam_duration,
+                              popcount, times_overlap)
+
+
+def test_interval_index_matches_linear_scan():
+    rng = random.Random(1)
+    items = []
+    for i in range(300):
+        start = rng.randrange(0, 1440)
+        # 包含长度为 0 和结束早于开始的无效区间
+        items.append((start, start + rng.randrange(-10, 240), i))
+    index = IntervalIndex(items)
+    assert len(index) == sum(1 for item in items if item[1] > item[0])
+
+    for _ in range(1000):
+        start = rng.randrange(-60, 1500)
+        end = start + rng.randrange(1, 300)
+        expected = {item[2] for item in items if item[1] > item[0] and item[0] < end and start < item[1]}
+        result = index.query(start, end)
+        assert len(result) == len(set(result))
+        assert set(result) == expected
+
+
+def test_interval_index_half_open():
+    index = IntervalIndex([(480, 600, 'a'), (600, 720, 'b')])
+    # 首尾相接不算重叠
+    assert index.query(600, 610) == ['b']
+    assert sorted(index.query(590, 610)) == ['a', 'b']
+    assert index.query(720, 800) == []
+    assert index.query(550, 550) == []
+    assert IntervalIndex().query(0, 100) == []
+
+
+def test_grid_masks():
+    grid = TimeSlotGrid.of(STANDARD_TIME_SLOTS)
+    assert TimeSlotGrid.of(list(STANDARD_TIME_SLOTS)) is grid
+    assert TimeSlotGrid.of(grid) is grid
+    assert grid.full_day_mask == 0b11111
+    assert grid.evening_bits == 0b10000
+
+    assert grid.mask_of('10:30-12:30') == 0b00010
+    # 网格外的时间占用所有重叠的时间段，落在空隙中的不占用
+    assert grid.mask_of('09:00-11:00') == 0b00011
+    assert grid.mask_of('12:40-13:50') == 0
+    assert grid.mask_of('无效时间') == 0
+    assert grid.overlap_mask(10 * 60, 10 * 60 + 30) == 0
+
+
+def test_grid_spans_and_exam_times():
+    grid = TimeSlotGrid.of(DEFAULT_TIME_SLOTS)
+    assert grid.span(1) == 0b0010
+    assert grid.span(0, 90) == 0b0001
+    assert grid.span(0, 180) == 0b0011
+    assert grid.span(2, 240) == 0b1100
+    # 超出当天最后一个时间段
+    assert grid.span(3, 180) == 0
+
+    assert grid.exam_time(0, 180) == '08:00-11:00'
+    assert grid.exam_time(2) == '14:00-16:00'
+    assert grid.locate('08:00-11:00') == (0, 180)
+    assert grid.locate('14:00-16:00') == (2, None)
+    assert grid.locate('09:00-11:00') is None
+    assert grid.locate('无效时间') is None
+
+
+def test_invalid_grid():
+    with pytest.raises(ValueError):
+        TimeSlotGrid(['08:00-10:00', '10:00-09:00'])
+
+
+def test_helpers():
+    assert times_overlap('08:00-10:00', '09:30-11:00')
+    assert not times_overlap('08:00-10:00', '10:00-11:00')
+    assert times_overlap('无效', '无效')
+    assert [popcount(mask) for mask in (0, 1, 0b1011, (1 << 100) - 1)] == [0, 1, 3, 100]
+    assert exam_duration(150) == 150
+    assert exam_duration(None, '8:00 - 9:50') == 120
+    assert exam_duration(None, '8:00 - 8:30') == 90
+    assert exam_duration(None, '无效') is None
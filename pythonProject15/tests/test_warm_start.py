@@ -0,0 +1,110 @@
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import END_DATE, EXAM_DATES, START_DATE, overlapping_pairs
+from utils.exam_scheduler import ExamScheduler
+from utils.occupancy import OccupancyEngine, load_schedule_snapshot
+from utils.placement import CoursePlacer
+from utils.time_slots import DEFAULT_TIME_SLOTS
+from utils.warm_start import WarmStartPlanner, load_previous_arrangements, previous_digest
+
+# 本学期的考试窗口比上学期晚 14 周，星期相同
+WEEKS = 14
+
+
+def _shift(exam_date):
+    return (datetime.strptime(exam_date, "%Y-%m-%d") + timedelta(weeks=WEEKS)).strftime("%Y-%m-%d")
+
+
+@pytest.fixture
+def previous_term(dataset, tmp_path):
+    """
+    复制数据集作为上学期并用另一种排考方式排考，返回上学期的数据库路径
+    """
+    previous = str(tmp_path / 'previous.db')
+    shutil.copy(dataset, previous)
+    scheduler = ExamScheduler(previous)
+    try:
+        assert scheduler.schedule_exams(START_DATE, END_DATE, 4, mode='dsatur', use_cache=False)[0]
+    finally:
+        scheduler.close()
+    return previous
+
+
+def _by_key(rows):
+    """
+    {(课程名称, 教师, 学院班级): {(考试日期, 考试时间, 教室编号)}}
+    """
+    placed = {}
+    for course_name, teacher, class_name, room_id, exam_date, exam_time in rows:
+        placed.setdefault((course_name, teacher, class_name), set()).add((exam_date, exam_time, room_id))
+    return placed
+
+
+def test_warm_start_keeps_previous_placements(dataset, previous_term):
+    previous_rows = load_previous_arrangements(previous_term)
+    previous = _by_key(previous_rows)
+    # 本学期换了任课教师的课程对应不到上学期的安排
+    conn = sqlite3.connect(dataset)
+    try:
+        conn.execute("UPDATE courses SET 教师 = '新教师' WHERE id IN (1, 2, 3)")
+        conn.commit()
+        snapshot = load_schedule_snapshot(conn.cursor())
+    finally:
+        conn.close()
+
+    scheduler = ExamScheduler(dataset)
+    try:
+        cold = scheduler.dry_run(_shift(START_DATE), _shift(END_DATE), 4, use_cache=False)
+        result = scheduler.dry_run(_shift(START_DATE), _shift(END_DATE), 4, use_cache=False, warm_start=previous_term)
+    finally:
+        scheduler.close()
+    assert not result.failed_courses
+
+    courses = {course[0]: course for course in snapshot['courses']}
+
+    def kept(placements):
+        count = 0
+        for course_id, course in courses.items():
+            exams = {(p['exam_date'], p['exam_time'], p['room_id']) for p in placements if p['course_id'] == course_id}
+            if course_id in (1, 2, 3):
+                assert exams
+                continue
+            expected = {(_shift(exam_date), exam_time, room_id)
+                        for exam_date, exam_time, room_id in previous[(course[2], course[11], course[8])]}
+            count += exams == expected
+        return count
+
+    # 没有换教师的课程全部沿用上学期的日期、时间和教室，不沿用时大多不同
+    assert kept(result.placements) == len(courses) - 3
+    assert kept(cold.placements) < len(courses) // 2
+    assert overlapping_pairs(result.placements, snapshot['courses'], 'room_id') == 0
+    assert overlapping_pairs(result.placements, snapshot['courses'], 'teacher') == 0
+
+
+def test_planner_falls_back_when_previous_slot_is_taken(snapshot, previous_term):
+    previous_rows = load_previous_arrangements(previous_term)
+    engine = OccupancyEngine(dict(snapshot, arrangements=[]), EXAM_DATES, DEFAULT_TIME_SLOTS)
+    courses = engine.courses
+    course = courses[0]
+    exam_date, exam_time, room_id = sorted(_by_key(previous_rows)[(course[2], course[11], course[8])])[0]
+    # 上学期的教室在同一时间已被其他考试占用
+    slot, duration = engine.slot_grid.locate(exam_time)
+    engine.place('其他教师', '其他班级', [room_id], EXAM_DATES.index(exam_date), slot, duration)
+
+    planner = WarmStartPlanner(engine, CoursePlacer(engine), previous_rows)
+    placements, remaining = planner.place(courses)
+    assert planner.last_stats == {'courses': len(courses), 'mapped': len(courses), 'placed': len(courses) - 1}
+    assert remaining == [course]
+    assert {p['course_id'] for p in placements} == {c[0] for c in courses[1:]}
+
+
+def test_previous_arrangements_source(previous_term, tmp_path):
+    rows = load_previous_arrangements(previous_term)
+    assert previous_digest(rows) == previous_digest(list(reversed(rows)))
+    assert previous_digest(rows) != previous_digest(rows[1:])
+    with pytest.raises(FileNotFoundError):
+        load_previous_arrangements(str(tmp_path / 'missing.db'))
@@ -2,7 +2,8 @@ from PyQt5.QtWidgets import (QWidget, QTableWidget, QTableWidgetItem,
                              QVBoxLayout, QHBoxLayout, QPushButton, 
                              QMessageBox, QLabel)
 from PyQt5.QtCore import Qt
-from models.database import DatabaseManager
+from models.database import DatabaseManager, MARK_MANUAL_SQL
+from utils.conflict_detector import ConflictDetector
 
 class ExamAdjustmentReviewWindow(QWidget):
     def __init__(self):
@@ -161,16 +162,11 @@ class ExamAdjustmentReviewWindow(QWidget):
 
     def check_exam_conflict(self, new_date, new_time, new_room):
         """
-        检查新的考试安排是否与现有安排冲突
+        检查新的考试安排是否与现有安排冲突，考试时间段重叠即算冲突
         """
         try:
-            query = '''
-                SELECT COUNT(*) FROM exam_arrangements 
-                WHERE 考试日期 = ? AND 考试时间 = ? AND 教室编号 = ?
-            '''
-            self.db_manager.cursor.execute(query, (new_date, new_time, new_room))
-            conflict_count = self.db_manager.cursor.fetchone()[0]
-            return conflict_count > 0
+            has_conflict, _ = ConflictDetector(self.db_manager).check_room_conflict(new_room, new_date, new_time)
+            return has_conflict
         except Exception as e:
             QMessageBox.warning(self, '错误', f'检查冲突失败：{str(e)}')
             return True
@@ -206,6 +202,14 @@ class ExamAdjustmentReviewWindow(QWidget):
             self.db_manager.cursor.execute(update_arrangement_query, 
                                            (new_date, new_time, new_room, request_id))
 
+            # 标记为手动调整，增量排考时保留
+            self.db_manager.cursor.execute('''
+                SELECT arrangement_id FROM exam_adjustment_requests WHERE request_id = ?
+            ''', (request_id,))
+            arrangement = self.db_manager.cursor.fetchone()
+            if arrangement:
+                self.db_manager.cursor.execute(MARK_MANUAL_SQL, (arrangement[0],))
+
             # 更新申请状态
             update_request_query = '''
                 UPDATE exam_adjustment_requests 
@@ -3,14 +3,48 @@ import pandas as pd
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
                              QTableWidget, QTableWidgetItem, QFileDialog, QMessageBox,
                              QDialog, QFormLayout, QLineEdit, QComboBox, QLabel,
-                             QTabWidget, QSplitter, QDateEdit, QGroupBox, QRadioButton)
-from PyQt5.QtCore import Qt, QDate
+                             QTabWidget, QSplitter, QDateEdit, QGroupBox, QRadioButton,
+                             QCheckBox, QSpinBox, QProgressDialog)
+from PyQt5.QtCore import Qt, QDate, QThread, pyqtSignal
 from utils.excel_importer import ExcelImporter
 from utils.exam_scheduler import ExamScheduler
 from utils.conflict_detector import ConflictDetector
+from utils.progress import CancellationToken
 from models.database import DatabaseManager
 
 
+class ScheduleWorker(QThread):
+    """
+    在后台线程中运行排考，避免界面卡死
+    SQLite 连接不能跨线程使用，线程内新建 ExamScheduler
+    """
+    progress = pyqtSignal(dict)
+    finished_with_result = pyqtSignal(bool, str, list)
+
+    def __init__(self, db_path, settings, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.settings = settings
+        self.cancel_token = CancellationToken()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        scheduler = ExamScheduler(self.db_path)
+        try:
+            success, message, failed_courses = scheduler.schedule_exams(
+                progress_callback=self.progress.emit,
+                cancel_token=self.cancel_token,
+                **self.settings
+            )
+        except Exception as e:
+            success, message, failed_courses = False, f'排课失败：{str(e)}', []
+        finally:
+            scheduler.close()
+        self.finished_with_result.emit(success, message, failed_courses)
+
+
 class AdjustExamDialog(QDialog):
     def __init__(self, parent=None, arrangement=None):
         super().__init__(parent)
@@ -250,6 +284,28 @@ class ExamSettingsDialog(QDialog):
 
         layout.addRow(slots_group)
 
+        # 排考算法选择
+        self.mode_combo = QComboBox()
+        self.mode_combo.addItem('按教师顺序安排', 'greedy')
+        self.mode_combo.addItem('冲突图着色（避免班级冲突）', 'dsatur')
+        layout.addRow('排考算法:', self.mode_combo)
+
+        # 人数超过教室容量时的分场方式
+        self.split_combo = QComboBox()
+        self.split_combo.addItem('多个时间段依次考试', 'sequential')
+        self.split_combo.addItem('同一时间段多间教室同时考试', 'concurrent')
+        layout.addRow('分场方式:', self.split_combo)
+
+        # 增量排考：保留未变化的课程和手动调整过的安排
+        self.incremental_check = QCheckBox('保留未变化课程及手动调整的安排（增量排考）')
+        layout.addRow(self.incremental_check)
+
+        # 排考后局部搜索优化的时间预算，0 表示不优化
+        self.optimize_spin = QSpinBox()
+        self.optimize_spin.setRange(0, 300)
+        self.optimize_spin.setSuffix(' 秒')
+        layout.addRow('优化时间:', self.optimize_spin)
+
         # 确定和取消按钮
         buttons = QHBoxLayout()
         confirm_btn = QPushButton('确定')
@@ -271,7 +327,11 @@ class ExamSettingsDialog(QDialog):
         return {
             'start_date': start_date,
             'end_date': end_date,
-            'slots_per_day': slots_per_day
+            'slots_per_day': slots_per_day,
+            'mode': self.mode_combo.currentData(),
+            'incremental': self.incremental_check.isChecked(),
+            'optimize_seconds': self.optimize_spin.value(),
+            'split_mode': self.split_combo.currentData()
         }
 
 
@@ -286,8 +346,14 @@ class ExamArrangementWindow(QWidget):
         self.exam_settings = {
             'start_date': None,  # 使用默认值（下周一）
             'end_date': None,  # 使用默认值（开始日期+6天）
-            'slots_per_day': 4  # 默认每天4场考试
+            'slots_per_day': 4,  # 默认每天4场考试
+            'mode': 'greedy',  # 默认按教师顺序安排
+            'incremental': False,  # 默认重新安排全部课程
+            'optimize_seconds': 0,  # 默认不做局部搜索优化
+            'split_mode': 'sequential'  # 默认按多个时间段依次考试
         }
+        # 后台排考线程
+        self.schedule_worker = None
         self.init_ui()
 
     def init_ui(self):
@@ -476,35 +542,102 @@ class ExamArrangementWindow(QWidget):
                 # 获取用户设置
                 self.exam_settings = settings_dialog.get_settings()
 
-                # 调用新的排课算法，传入设置参数
-                success, message, failed_courses = self.exam_scheduler.schedule_exams(
+                # 排考前预检查，发现必然失败的问题时让用户确认是否继续
+                feasible, check_message, _ = self.exam_scheduler.check_feasibility(
                     start_date=self.exam_settings['start_date'],
                     end_date=self.exam_settings['end_date'],
-                    slots_per_day=self.exam_settings['slots_per_day']
+                    slots_per_day=self.exam_settings['slots_per_day'],
+                    mode=self.exam_settings['mode'],
+                    split_mode=self.exam_settings['split_mode']
                 )
-
-                if success:
-                    QMessageBox.information(self, '排考成功', message)
-                    # 刷新考试安排预览
-                    self.preview_exam_arrangements()
-                else:
-                    # 显示详细的失败信息
+                if not feasible:
                     reply = QMessageBox.question(
-                        self, '排考未完全成功',
-                        f"{message}\n\n是否查看已成功安排的考试？",
-                        QMessageBox.Yes | QMessageBox.No
+                        self, '预检查未通过',
+                        f"{check_message}\n按当前设置必然有课程排考失败，是否仍要开始排考？",
+                        QMessageBox.Yes | QMessageBox.No,
+                        QMessageBox.No
                     )
+                    if reply != QMessageBox.Yes:
+                        return
 
-                    if reply == QMessageBox.Yes:
-                        # 刷新考试安排预览，显示部分成功的结果
-                        self.preview_exam_arrangements()
-
-                        # 如果有失败的课程，提供建议
-                        if failed_courses:
-                            self.show_scheduling_suggestions(failed_courses)
+                # 在后台线程中调用排课算法，显示进度并允许取消
+                self.start_schedule_worker(self.exam_settings)
         except Exception as e:
             QMessageBox.warning(self, '错误', f'排课失败：{str(e)}')
 
+    def start_schedule_worker(self, settings):
+        """
+        启动后台排考线程和进度对话框
+        """
+        self.schedule_worker = ScheduleWorker(self.exam_scheduler.db_path, settings, self)
+        self.progress_dialog = QProgressDialog('正在准备排考...', '取消', 0, 0, self)
+        self.progress_dialog.setWindowTitle('自动排考场')
+        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setMinimumDuration(0)
+        self.progress_dialog.setAutoClose(False)
+        self.progress_dialog.setAutoReset(False)
+        self.progress_dialog.canceled.connect(self.cancel_schedule_worker)
+        self.schedule_worker.progress.connect(self.on_schedule_progress)
+        self.schedule_worker.finished_with_result.connect(self.on_schedule_finished)
+        self.schedule_worker.start()
+        self.progress_dialog.show()
+
+    def cancel_schedule_worker(self):
+        """
+        请求取消排考，排考线程在下一次报告进度时停止，原有考试安排不变
+        """
+        if self.schedule_worker is not None:
+            self.schedule_worker.cancel()
+            self.progress_dialog.setLabelText('正在取消...')
+
+    def on_schedule_progress(self, info):
+        """
+        更新进度对话框：阶段、已完成数量、当前教师、已用时间
+        """
+        if info['total']:
+            self.progress_dialog.setMaximum(info['total'])
+            self.progress_dialog.setValue(min(info['done'], info['total']))
+            text = f"{info['stage']}: {info['done']}/{info['total']}"
+        else:
+            self.progress_dialog.setMaximum(0)
+            text = info['stage']
+        if info['teacher']:
+            text += f"\n当前教师: {info['teacher']}"
+        text += f"\n已用时间: {info['elapsed']:.1f} 秒"
+        self.progress_dialog.setLabelText(text)
+
+    def on_schedule_finished(self, success, message, failed_courses):
+        """
+        排考线程结束后关闭进度对话框并显示结果
+        """
+        # 先读取取消标记再关闭对话框：关闭对话框会发出 canceled 信号
+        cancelled = self.schedule_worker.cancel_token.cancelled
+        self.schedule_worker = None
+        self.progress_dialog.canceled.disconnect(self.cancel_schedule_worker)
+        self.progress_dialog.close()
+
+        if success:
+            QMessageBox.information(self, '排考成功', message)
+            # 刷新考试安排预览
+            self.preview_exam_arrangements()
+        elif cancelled:
+            QMessageBox.information(self, '已取消', message)
+        else:
+            # 显示详细的失败信息
+            reply = QMessageBox.question(
+                self, '排考未完全成功',
+                f"{message}\n\n是否查看已成功安排的考试？",
+                QMessageBox.Yes | QMessageBox.No
+            )
+
+            if reply == QMessageBox.Yes:
+                # 刷新考试安排预览，显示部分成功的结果
+                self.preview_exam_arrangements()
+
+                # 如果有失败的课程，提供建议
+                if failed_courses:
+                    self.show_scheduling_suggestions(failed_courses)
+
     def show_scheduling_suggestions(self, failed_courses):
         """
         显示排考建议对话框
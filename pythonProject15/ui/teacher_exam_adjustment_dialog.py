@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QLineEdit, QTextEdit, QPushButton, QComboBox, QMessageBox)
-from models.database import DatabaseManager
+from models.database import DatabaseManager, MARK_MANUAL_SQL
 from datetime import datetime
 from utils.styles import GLOBAL_STYLESHEET, COLORS, add_shadow_effect
 from utils.conflict_detector import ConflictDetector
@@ -296,6 +296,8 @@ class TeacherExamAdjustmentDialog(QDialog):
             '''
             
             db_manager.cursor.execute(update_query, (new_date, new_time, new_room_id, self.arrangement_id))
+            # 标记为手动调整，增量排考时保留
+            db_manager.cursor.execute(MARK_MANUAL_SQL, (self.arrangement_id,))
             db_manager.conn.commit()
             
             QMessageBox.information(self, '成功', '考试安排已成功调整')
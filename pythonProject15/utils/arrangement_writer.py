@@ -0,0 +1,101 @@
+import time
+
+
+ARRANGEMENT_INSERT_SQL = '''
+INSERT INTO exam_arrangements (
+    教室号,
+    教室编号,
+    考试日期,
+    考试时间,
+    学院班级,
+    考试人数,
+    任课学院,
+    专业,
+    学历层次
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+META_INSERT_SQL = '''
+INSERT OR REPLACE INTO exam_arrangement_meta (arrangement_id, course_key, room_key, source)
+VALUES (?, ?, ?, 'auto')
+'''
+
+
+def placement_to_row(placement):
+    """
+    将内存中的考试安排记录转换为 exam_arrangements 的一行
+    """
+    return (
+        placement['course_id'],       # 使用课程ID作为教室号字段（原代码使用的逻辑）
+        placement['room_id'],         # 实际的教室编号
+        placement['exam_date'],       # 考试日期
+        placement['exam_time'],       # 考试时间
+        placement['class_name'],      # 学院班级
+        placement['students_count'],  # 考试人数
+        placement['department'],      # 任课学院
+        placement['major'],           # 专业
+        placement['teacher_type']     # 学历层次
+    )
+
+
+class ArrangementWriter:
+    """
+    考试安排批量写入器
+    用 executemany 写入全部考试安排，可选按块写入；
+    不提交事务，由调用方把清空原有安排、写入和清理监考记录放在同一个事务内提交或回滚
+    """
+
+    def __init__(self, conn, chunk_size=None):
+        """
+        :param conn: 数据库连接
+        :param chunk_size: 每次 executemany 写入的行数，为空时一次写入全部
+        """
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.last_stats = None
+
+    def write(self, placements, meta=None):
+        """
+        在调用方的事务内写入考试安排，出错时直接抛出异常，由调用方回滚
+
+        :param placements: 内存中的考试安排记录列表
+        :param meta: 可选函数 placement -> (course_key, room_key)，提供时同时写入 exam_arrangement_meta，
+                     并把生成的 arrangement_id 回填到 placement 中
+        :return: {'rows': 行数, 'seconds': 用时, 'rows_per_second': 每秒行数}
+        """
+        rows = [placement_to_row(placement) for placement in placements]
+        chunk_size = self.chunk_size or len(rows) or 1
+
+        start_time = time.perf_counter()
+        cursor = self.conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(arrangement_id), 0) FROM exam_arrangements')
+        last_id = cursor.fetchone()[0]
+        for offset in range(0, len(rows), chunk_size):
+            cursor.executemany(ARRANGEMENT_INSERT_SQL, rows[offset:offset + chunk_size])
+        if meta is not None:
+            self._write_meta(cursor, placements, last_id, meta)
+        seconds = time.perf_counter() - start_time
+
+        self.last_stats = {
+            'rows': len(rows),
+            'seconds': seconds,
+            'rows_per_second': len(rows) / seconds if seconds > 0 else float(len(rows))
+        }
+        print(f"写入考试安排 {len(rows)} 条，用时 {seconds:.3f} 秒，"
+              f"{self.last_stats['rows_per_second']:.0f} 条/秒")
+        return self.last_stats
+
+    def _write_meta(self, cursor, placements, last_id, meta):
+        """
+        同一事务内新插入的安排编号连续递增，按插入顺序与 placements 对应
+        """
+        cursor.execute(
+            'SELECT arrangement_id FROM exam_arrangements WHERE arrangement_id > ? ORDER BY arrangement_id',
+            (last_id,)
+        )
+        meta_rows = []
+        for (arrangement_id,), placement in zip(cursor.fetchall(), placements):
+            placement['arrangement_id'] = arrangement_id
+            course_key, room_key = meta(placement)
+            meta_rows.append((arrangement_id, course_key, room_key))
+        cursor.executemany(META_INSERT_SQL, meta_rows)
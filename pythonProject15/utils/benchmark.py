@@ -0,0 +1,159 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+if __name__ == '__main__':
+    # 作为脚本运行时（python utils/benchmark.py）把项目目录加入模块搜索路径
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import DatabaseManager
+from utils.course_order import COURSE_ORDERS
+from utils.exam_scheduler import ExamScheduler
+from utils.time_slots import TimeSlotGrid, popcount
+
+
+# 基准测试使用的数据规模：(名称, 课程数, 教室数, 教师数, 班级数)
+DEFAULT_DATASETS = (
+    ('small', 500, 80, 120, 150),
+    ('medium', 3000, 400, 600, 800),
+    ('tight', 3000, 220, 400, 500)
+)
+
+
+def generate_dataset(db_path, n_courses=3000, n_rooms=400, n_teachers=600, n_classes=800, seed=1):
+    """
+    生成一个随机排考数据集（课程、教室、教师约束），已存在的数据会被替换
+
+    :return: db_path
+    """
+    rng = random.Random(seed)
+    db = DatabaseManager(db_path)
+    try:
+        cursor = db.cursor
+        cursor.execute('DELETE FROM courses')
+        cursor.execute('DELETE FROM exam_rooms')
+        cursor.execute('DELETE FROM teacher_constraints')
+        cursor.execute('DELETE FROM exam_arrangements')
+
+        rooms = []
+        for i in range(n_rooms):
+            rooms.append((
+                f"R{i:04d}", f"教室{i}", rng.choice([30, 40, 48, 60, 80, 100, 120, 150]),
+                f"教学楼{i % 8}", str(1 + (i // 8) % 6), None, None
+            ))
+        cursor.executemany('''
+            INSERT INTO exam_rooms (教室编号, 教室名称, 教室容量, 教学楼, 楼层, 可用日期, 可用时间)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rooms)
+
+        courses = []
+        for i in range(n_courses):
+            courses.append((
+                rooms[rng.randrange(n_rooms)][0], f"课程{i}", '8:00 - 9:50', '周一', '本科',
+                f"学院{rng.randrange(12)}", '专业', f"班级{rng.randrange(n_classes)}",
+                rng.randint(15, 130), '', f"教师{rng.randrange(n_teachers)}",
+                rng.choice([None, None, None, 180])
+            ))
+        cursor.executemany('''
+            INSERT INTO courses (教室号, 课程名称, 时段, 日期, 教师类型, 任课学院, 专业, 学院班级,
+                                 考试人数, 考试地点, 教师, 考试时长)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', courses)
+
+        # 每十位教师中有一位限制每日场数、不考晚间和周末
+        constraints = [
+            (f"教师{k}", 2, 1, 1, '', '') for k in range(0, n_teachers, 10)
+        ]
+        cursor.executemany('''
+            INSERT INTO teacher_constraints (teacher_name, max_exams_per_day, no_evening_exams, no_weekend_exams,
+                                             unavailable_dates, unavailable_times)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', constraints)
+        db.conn.commit()
+    finally:
+        db.close()
+    return db_path
+
+
+def utilisation(result, rooms):
+    """
+    试排结果的资源利用率
+
+    :param rooms: {教室编号: 容量}
+    :return: (座位利用率, 教室时间段利用率)，均为百分比
+    """
+    grid = TimeSlotGrid.of(result.time_slots)
+    seats = 0
+    capacity = 0
+    cells = 0
+    for placement in result.placements:
+        seats += placement['students_count']
+        capacity += rooms.get(placement['room_id'], 0)
+        duration = placement.get('duration')
+        cells += popcount(grid.span(placement['slot'], duration)) if duration else 1
+    total_cells = len(rooms) * len(result.exam_dates) * len(result.time_slots)
+    return (seats / capacity * 100 if capacity else 0.0,
+            cells / total_cells * 100 if total_cells else 0.0)
+
+
+def benchmark_course_orders(db_paths, orders=COURSE_ORDERS, start_date='2026-06-01', end_date='2026-06-12',
+                            slots_per_day=4, mode='greedy', seed=1):
+    """
+    在每个数据集上用每种课程排序策略试排一次（不写入考试安排、不使用缓存）
+
+    :param db_paths: {数据集名称: 数据库路径}
+    :return: [{'dataset', 'order', 'seconds', 'failed', 'success_rate', 'seat_utilisation', 'slot_utilisation'}]
+    """
+    rows = []
+    for name, db_path in db_paths.items():
+        scheduler = ExamScheduler(db_path)
+        try:
+            scheduler.cursor.execute('SELECT 教室编号, 教室容量 FROM exam_rooms')
+            rooms = {room_id: int(capacity) for room_id, capacity in scheduler.cursor.fetchall()}
+            for order in orders:
+                start_time = time.perf_counter()
+                result = scheduler.dry_run(start_date, end_date, slots_per_day, mode, seed=seed,
+                                           use_cache=False, course_order=order)
+                seconds = time.perf_counter() - start_time
+                seat_rate, slot_rate = utilisation(result, rooms)
+                rows.append({
+                    'dataset': name,
+                    'order': order,
+                    'seconds': seconds,
+                    'failed': result.metrics['failed'],
+                    'success_rate': result.metrics['success_rate'],
+                    'seat_utilisation': seat_rate,
+                    'slot_utilisation': slot_rate
+                })
+        finally:
+            scheduler.close()
+    return rows
+
+
+def format_benchmark(rows):
+    """
+    将基准测试结果格式化为表格文本
+    """
+    lines = [f"{'数据集':<8}{'排序策略':<22}{'用时(秒)':>10}{'失败':>8}{'成功率':>10}{'座位利用率':>12}{'时段利用率':>12}"]
+    for row in rows:
+        lines.append(f"{row['dataset']:<10}{row['order']:<24}{row['seconds']:>10.3f}{row['failed']:>10}"
+                     f"{row['success_rate']:>11.1f}%{row['seat_utilisation']:>13.1f}%"
+                     f"{row['slot_utilisation']:>13.1f}%")
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    import contextlib
+    import io
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = {}
+        for name, n_courses, n_rooms, n_teachers, n_classes in DEFAULT_DATASETS:
+            paths[name] = generate_dataset(os.path.join(workdir, f'{name}.db'), n_courses, n_rooms,
+                                           n_teachers, n_classes)
+        # 试排过程的逐门输出较多，只显示汇总表格
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = benchmark_course_orders(paths)
+        print(format_benchmark(rows))
@@ -1,5 +1,8 @@
 from models.database import DatabaseManager
 from datetime import datetime
+from utils.room_availability import room_open_at
+from utils.enrolment import CoEnrolmentMatrix, load_enrolments
+from utils.time_slots import STANDARD_TIME_SLOTS, IntervalIndex, TimeSlotGrid, parse_time_range, times_overlap
 
 class ConflictDetector:
     """
@@ -9,6 +12,9 @@ class ConflictDetector:
     
     def __init__(self, db_manager=None):
         self.db_manager = db_manager or DatabaseManager()
+        # 共同选课矩阵及其对应的数据版本，选课或课程变化时重新构建
+        self._enrolment = None
+        self._enrolment_version = None
     
     def check_room_conflict(self, room_id, exam_date, exam_time, exclude_arrangement_id=None):
         """
@@ -16,25 +22,25 @@ class ConflictDetector:
         
         :param room_id: 教室编号
         :param exam_date: 考试日期
-        :param exam_time: 考试时间
+        :param exam_time: 考试时间，与已有安排的时间段重叠即算冲突
         :param exclude_arrangement_id: 排除的考试安排ID（用于调整时）
         :return: (has_conflict, conflict_info)
         """
         try:
             query = '''
-                SELECT ea.arrangement_id, c.课程名称, c.学院班级, c.教师
+                SELECT ea.arrangement_id, c.课程名称, c.学院班级, c.教师, ea.考试时间
                 FROM exam_arrangements ea
                 JOIN courses c ON ea.教室号 = c.id
-                WHERE ea.教室编号 = ? AND ea.考试日期 = ? AND ea.考试时间 = ?
+                WHERE ea.教室编号 = ? AND ea.考试日期 = ?
             '''
-            params = [room_id, exam_date, exam_time]
+            params = [room_id, exam_date]
             
             if exclude_arrangement_id:
                 query += ' AND ea.arrangement_id != ?'
                 params.append(exclude_arrangement_id)
             
             self.db_manager.cursor.execute(query, params)
-            conflicts = self.db_manager.cursor.fetchall()
+            conflicts = [row for row in self.db_manager.cursor.fetchall() if times_overlap(row[4], exam_time)]
             
             if conflicts:
                 conflict_info = []
@@ -59,20 +65,21 @@ class ConflictDetector:
         """
         try:
             query = '''
-                SELECT ea.arrangement_id, c.课程名称, c.学院班级, er.教室名称
+                SELECT ea.arrangement_id, c.课程名称, c.学院班级, er.教室名称, ea.考试时间
                 FROM exam_arrangements ea
                 JOIN courses c ON ea.教室号 = c.id
                 JOIN exam_rooms er ON ea.教室编号 = er.教室编号
-                WHERE c.教师 = ? AND ea.考试日期 = ? AND ea.考试时间 = ?
+                WHERE c.教师 = ? AND ea.考试日期 = ?
             '''
-            params = [teacher_name, exam_date, exam_time]
+            params = [teacher_name, exam_date]
             
             if exclude_arrangement_id:
-                query += ' AND ea.arrangement_id != ?'
-                params.append(exclude_arrangement_id)
+                # 同一课程同时分场的其他教室不算冲突
+                query += ' AND ea.arrangement_id != ? AND ea.教室号 IS NOT (SELECT 教室号 FROM exam_arrangements WHERE arrangement_id = ?)'
+                params.extend([exclude_arrangement_id, exclude_arrangement_id])
             
             self.db_manager.cursor.execute(query, params)
-            conflicts = self.db_manager.cursor.fetchall()
+            conflicts = [row for row in self.db_manager.cursor.fetchall() if times_overlap(row[4], exam_time)]
             
             if conflicts:
                 conflict_info = []
@@ -97,20 +104,21 @@ class ConflictDetector:
         """
         try:
             query = '''
-                SELECT ea.arrangement_id, c.课程名称, c.教师, er.教室名称
+                SELECT ea.arrangement_id, c.课程名称, c.教师, er.教室名称, ea.考试时间
                 FROM exam_arrangements ea
                 JOIN courses c ON ea.教室号 = c.id
                 JOIN exam_rooms er ON ea.教室编号 = er.教室编号
-                WHERE c.学院班级 = ? AND ea.考试日期 = ? AND ea.考试时间 = ?
+                WHERE c.学院班级 = ? AND ea.考试日期 = ?
             '''
-            params = [class_name, exam_date, exam_time]
+            params = [class_name, exam_date]
             
             if exclude_arrangement_id:
-                query += ' AND ea.arrangement_id != ?'
-                params.append(exclude_arrangement_id)
+                # 同一课程同时分场的其他教室不算冲突
+                query += ' AND ea.arrangement_id != ? AND ea.教室号 IS NOT (SELECT 教室号 FROM exam_arrangements WHERE arrangement_id = ?)'
+                params.extend([exclude_arrangement_id, exclude_arrangement_id])
             
             self.db_manager.cursor.execute(query, params)
-            conflicts = self.db_manager.cursor.fetchall()
+            conflicts = [row for row in self.db_manager.cursor.fetchall() if times_overlap(row[4], exam_time)]
             
             if conflicts:
                 conflict_info = []
@@ -129,16 +137,88 @@ class ConflictDetector:
             print(f"检查班级冲突失败: {e}")
             return True, [{'error': str(e)}]
     
-    def check_all_conflicts(self, room_id, teacher_name, class_name, exam_date, exam_time, exclude_arrangement_id=None):
+    def get_enrolment(self):
+        """
+        获取共同选课矩阵，没有选课记录时返回 None
+        选课记录和课程的行数、最大编号未变化时复用已构建的矩阵
+        """
+        cursor = self.db_manager.cursor
+        cursor.execute('''
+            SELECT (SELECT COUNT(*) FROM student_enrolments), (SELECT MAX(rowid) FROM student_enrolments),
+                   (SELECT COUNT(*) FROM courses), (SELECT MAX(id) FROM courses)
+        ''')
+        version = cursor.fetchone()
+        if version != self._enrolment_version:
+            enrolment_rows = load_enrolments(cursor)
+            self._enrolment = None
+            if enrolment_rows:
+                cursor.execute('SELECT id, 课程名称, 学院班级 FROM courses')
+                self._enrolment = CoEnrolmentMatrix.build(cursor.fetchall(), enrolment_rows)
+            self._enrolment_version = version
+        return self._enrolment
+
+    def check_student_conflict(self, course_id, exam_date, exam_time, exclude_arrangement_id=None):
+        """
+        检查学生考试时间冲突：同一时间有考试的课程中是否有本课程的考生（按选课记录）
+        未导入选课记录时不检查
+
+        :param course_id: 课程ID（考试安排的教室号字段）
+        :return: (has_conflict, conflict_info)，conflict_info 中 students 为共同考生人数
+        """
+        try:
+            enrolment = self.get_enrolment()
+            if enrolment is None or course_id is None:
+                return False, []
+
+            query = '''
+                SELECT ea.arrangement_id, ea.教室号, c.课程名称, c.学院班级, c.教师, ea.考试时间
+                FROM exam_arrangements ea
+                JOIN courses c ON ea.教室号 = c.id
+                WHERE ea.考试日期 = ? AND ea.教室号 != ?
+            '''
+            params = [exam_date, str(course_id)]
+            if exclude_arrangement_id:
+                query += ' AND ea.arrangement_id != ?'
+                params.append(exclude_arrangement_id)
+
+            self.db_manager.cursor.execute(query, params)
+            rows = [row for row in self.db_manager.cursor.fetchall() if times_overlap(row[5], exam_time)]
+            if not rows:
+                return False, []
+
+            # 一次查询全部同时考试课程的共同考生数，同一课程的多个考场只报告一次
+            shared = enrolment.shared(course_id, [row[1] for row in rows])
+            conflict_info = []
+            reported = set()
+            for row, students in zip(rows, shared.tolist()):
+                if students and row[1] not in reported:
+                    reported.add(row[1])
+                    conflict_info.append({
+                        'arrangement_id': row[0],
+                        'course_name': row[2],
+                        'class_name': row[3],
+                        'teacher': row[4],
+                        'students': students
+                    })
+            return bool(conflict_info), conflict_info
+
+        except Exception as e:
+            print(f"检查学生冲突失败: {e}")
+            return True, [{'error': str(e)}]
+
+    def check_all_conflicts(self, room_id, teacher_name, class_name, exam_date, exam_time, exclude_arrangement_id=None,
+                            course_id=None):
         """
         检查所有类型的冲突
-        
+
+        :param course_id: 课程ID，用于检查学生冲突；为空时取 exclude_arrangement_id 对应的课程
         :return: (has_any_conflict, conflict_details)
         """
         all_conflicts = {
             'room_conflicts': [],
             'teacher_conflicts': [],
-            'class_conflicts': []
+            'class_conflicts': [],
+            'student_conflicts': []
         }
         
         has_any_conflict = False
@@ -161,6 +241,20 @@ class ConflictDetector:
             has_any_conflict = True
             all_conflicts['class_conflicts'] = class_info
         
+        # 检查学生冲突（导入了选课记录时）
+        if course_id is None and exclude_arrangement_id:
+            self.db_manager.cursor.execute(
+                'SELECT 教室号 FROM exam_arrangements WHERE arrangement_id = ?', (exclude_arrangement_id,)
+            )
+            row = self.db_manager.cursor.fetchone()
+            course_id = row[0] if row else None
+        student_conflict, student_info = self.check_student_conflict(
+            course_id, exam_date, exam_time, exclude_arrangement_id
+        )
+        if student_conflict:
+            has_any_conflict = True
+            all_conflicts['student_conflicts'] = student_info
+        
         return has_any_conflict, all_conflicts
     
     def format_conflict_message(self, conflicts):
@@ -193,26 +287,62 @@ class ConflictDetector:
                 else:
                     messages.append(f"  - {conflict['course_name']} (教师: {conflict['teacher']}, 教室: {conflict['room_name']})")
         
+        if conflicts.get('student_conflicts'):
+            messages.append("学生冲突:")
+            for conflict in conflicts['student_conflicts']:
+                if 'error' in conflict:
+                    messages.append(f"  - 检查出错: {conflict['error']}")
+                else:
+                    messages.append(f"  - {conflict['course_name']} ({conflict['class_name']}, "
+                                    f"共同考生 {conflict['students']} 人)")
+        
         return "\n".join(messages)
     
-    def get_available_rooms(self, exam_date, exam_time, min_capacity=0):
+    def get_day_index(self, exam_date):
+        """
+        一次读取指定日期的全部考试安排，建立按考试时间的区间索引
+
+        :return: IntervalIndex，值为 (arrangement_id, 教室编号, 教师, 学院班级)
         """
-        获取指定时间可用的教室列表
+        self.db_manager.cursor.execute('''
+            SELECT ea.arrangement_id, ea.教室编号, c.教师, c.学院班级, ea.考试时间
+            FROM exam_arrangements ea
+            LEFT JOIN courses c ON ea.教室号 = c.id
+            WHERE ea.考试日期 = ?
+        ''', (exam_date,))
+        items = []
+        for arrangement_id, room_id, teacher, class_name, exam_time in self.db_manager.cursor.fetchall():
+            time_range = parse_time_range(exam_time)
+            if time_range:
+                items.append((time_range[0], time_range[1], (arrangement_id, room_id, teacher, class_name)))
+        return IntervalIndex(items)
+
+    def get_available_rooms(self, exam_date, exam_time, min_capacity=0, day_index=None):
+        """
+        获取指定时间可用的教室列表，不含已占用和未开放的教室
+
+        :param day_index: get_day_index 返回的当天安排索引，为空时读取
         """
         try:
             # 获取所有教室
             self.db_manager.cursor.execute('''
-                SELECT 教室编号, 教室名称, 教室容量, 教学楼
+                SELECT 教室编号, 教室名称, 教室容量, 教学楼, 可用日期, 可用时间
                 FROM exam_rooms
                 WHERE 教室容量 >= ?
             ''', (min_capacity,))
             all_rooms = self.db_manager.cursor.fetchall()
-            
+
+            # 与考试时间重叠的安排所占用的教室
+            if day_index is None:
+                day_index = self.get_day_index(exam_date)
+            time_range = parse_time_range(exam_time)
+            if time_range is None:
+                return []
+            busy_rooms = {hit[1] for hit in day_index.query(*time_range)}
+
             available_rooms = []
             for room in all_rooms:
-                room_id = room[0]
-                has_conflict, _ = self.check_room_conflict(room_id, exam_date, exam_time)
-                if not has_conflict:
+                if room[0] not in busy_rooms and room_open_at(room[4], room[5], exam_date, exam_time):
                     available_rooms.append({
                         'room_id': room[0],
                         'room_name': room[1],
@@ -226,29 +356,32 @@ class ConflictDetector:
             print(f"获取可用教室失败: {e}")
             return []
     
-    def suggest_alternative_arrangements(self, teacher_name, class_name, exam_date, min_capacity=0):
+    def suggest_alternative_arrangements(self, teacher_name, class_name, exam_date, min_capacity=0,
+                                         time_slots=None):
         """
         为指定教师和班级建议可用的考试安排
+
+        :param time_slots: 候选时间段，默认为标准考试时间段
         """
         try:
-            # 标准考试时间段
-            time_slots = [
-                "08:00-10:00", "10:30-12:30", "14:00-16:00", "16:30-18:30", "19:00-21:00"
-            ]
+            grid = TimeSlotGrid.of(time_slots or STANDARD_TIME_SLOTS)
+            # 当天安排只读取一次，各时间段在区间索引上查询
+            day_index = self.get_day_index(exam_date)
             
             suggestions = []
             
-            for time_slot in time_slots:
+            for slot in grid.slots:
                 # 检查教师和班级在该时间段是否有冲突
-                teacher_conflict, _ = self.check_teacher_conflict(teacher_name, exam_date, time_slot)
-                class_conflict, _ = self.check_class_conflict(class_name, exam_date, time_slot)
+                hits = day_index.query(slot.start, slot.end)
+                teacher_conflict = any(hit[2] == teacher_name for hit in hits)
+                class_conflict = any(hit[3] == class_name for hit in hits)
                 
                 if not teacher_conflict and not class_conflict:
                     # 获取可用教室
-                    available_rooms = self.get_available_rooms(exam_date, time_slot, min_capacity)
+                    available_rooms = self.get_available_rooms(exam_date, slot.label, min_capacity, day_index)
                     if available_rooms:
                         suggestions.append({
-                            'time': time_slot,
+                            'time': slot.label,
                             'available_rooms': available_rooms
                         })
             
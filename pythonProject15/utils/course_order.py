@@ -0,0 +1,131 @@
+import random
+from utils.time_slots import popcount
+
+
+class CourseOrderStrategy:
+    """
+    课程排序策略基类
+    贪心排考按策略给出的顺序逐门安排课程，顺序影响排考速度和失败课程数
+    """
+
+    # 排考重复次数，每次使用新的顺序，保留失败课程最少的结果
+    restarts = 1
+
+    def order(self, courses, engine):
+        """
+        :param courses: 待安排的课程列表
+        :param engine: OccupancyEngine（已登记已有安排）
+        :return: 排序后的课程列表
+        """
+        raise NotImplementedError
+
+
+class TeacherGroupOrder(CourseOrderStrategy):
+    """
+    按教师分组：按教师第一次出现的顺序，依次安排同一教师的全部课程（课程表顺序）
+    """
+
+    def order(self, courses, engine):
+        teacher_courses = {}
+        for course in courses:
+            teacher_courses.setdefault(course[11], []).append(course)
+        return [course for group in teacher_courses.values() for course in group]
+
+
+class LargestEnrolmentOrder(CourseOrderStrategy):
+    """
+    考试人数多的课程优先，大教室被小课程占用前先安排大课程
+    """
+
+    def order(self, courses, engine):
+        return sorted(courses, key=lambda course: -(course[9] or 0))
+
+
+class ConstrainedTeacherOrder(CourseOrderStrategy):
+    """
+    约束最紧的教师优先：按教师每门课程平均可用的开始时间段数升序，
+    可用时间段数取教师可用位图与每日考试上限中较小的一个
+    """
+
+    def order(self, courses, engine):
+        teacher_courses = {}
+        for course in courses:
+            teacher_courses.setdefault(course[11], []).append(course)
+        slack = {}
+        for teacher, group in teacher_courses.items():
+            masks = engine.constraint_store.available_masks(teacher)
+            limit = engine.teacher_limit(teacher)
+            free = sum(min(popcount(mask), limit) for mask in masks)
+            slack[teacher] = free / len(group)
+        return [course for teacher in sorted(teacher_courses, key=lambda teacher: slack[teacher])
+                for course in teacher_courses[teacher]]
+
+
+class FewestSlotsOrder(CourseOrderStrategy):
+    """
+    可行时间段最少的课程优先：统计教师可用、考试时长放得下且有容量足够的开放教室的开始时间段数，
+    教师、时长、人数相同的课程只统计一次
+    """
+
+    def order(self, courses, engine):
+        counts = {}
+        room_index = engine.room_index
+
+        def feasible(course):
+            students_count = max(10, course[9] or 0)
+            duration = engine.course_duration(course)
+            key = (course[11], duration, students_count)
+            count = counts.get(key)
+            if count is None:
+                count = 0
+                masks = engine.constraint_store.available_masks(course[11])
+                for day in range(engine.n_days):
+                    for slot in range(engine.n_slots):
+                        span = engine.span(slot, duration)
+                        if not span or masks[day] & span != span:
+                            continue
+                        if students_count > room_index.max_capacity or room_index.select(
+                                students_count, engine.occupied_rooms(day, slot, duration)) is not None:
+                            count += 1
+                counts[key] = count
+            return count
+
+        return sorted(courses, key=feasible)
+
+
+class RandomRestartOrder(CourseOrderStrategy):
+    """
+    随机重启：每次排考使用随机打乱的顺序，重复 restarts 次，保留失败课程最少的结果
+    """
+
+    def __init__(self, rng=None, restarts=5):
+        self.rng = rng or random.Random()
+        self.restarts = restarts
+
+    def order(self, courses, engine):
+        courses = list(courses)
+        self.rng.shuffle(courses)
+        return courses
+
+
+COURSE_ORDERS = ('teacher', 'largest_first', 'constrained_teacher', 'fewest_slots', 'random_restart')
+
+
+def make_course_order(name='teacher', rng=None):
+    """
+    根据名称创建课程排序策略
+
+    :param name: COURSE_ORDERS 中的一个
+    :param rng: 随机重启使用的随机数生成器
+    """
+    if name == 'teacher':
+        return TeacherGroupOrder()
+    if name == 'largest_first':
+        return LargestEnrolmentOrder()
+    if name == 'constrained_teacher':
+        return ConstrainedTeacherOrder()
+    if name == 'fewest_slots':
+        return FewestSlotsOrder()
+    if name == 'random_restart':
+        return RandomRestartOrder(rng)
+    raise ValueError(f"未知的课程排序策略: {name}")
@@ -0,0 +1,253 @@
+import time
+from utils.placement import sequential_plans, teacher_preferred_rooms
+
+
+# 排考失败的主要原因
+FAILURE_CAUSES = {
+    'no_room': '没有容量足够的教室',
+    'too_long': '考试时长超过每天的考试时间',
+    'teacher_unavailable': '教师在考试窗口内没有可用时间',
+    'teacher_daily_cap': '教师可用日期的考试场数均已达到每日上限',
+    'slots_taken': '可用时间段均已被占用'
+}
+
+# 某个时间段不可行的具体原因
+VIOLATIONS = {
+    'teacher_unavailable': '教师不可用',
+    'teacher_daily_cap': '教师当天已达每日上限',
+    'teacher_busy': '教师有其他考试',
+    'class_busy': '班级有其他考试',
+    'student_busy': '考生有其他考试',
+    'room': '没有空闲的合适教室'
+}
+
+
+class FailureDiagnoser:
+    """
+    排考失败诊断
+    复用排考结束时的 OccupancyEngine（占用位图、教师约束位图、教室索引），
+    对每门失败课程逐个检查考试网格中的开始时间段，找出导致失败的主要原因，
+    并给出违反条件最少的时间段作为最接近的可行方案。
+    教室的选择与贪心排考相同：人数超过最大教室容量时按教师常用教室的顺序依次分场，
+    方案包含所需的全部场次。
+    每门课程只做 日期数 × 时间段数 次位运算和教室索引查询，不重新排考
+    """
+
+    def __init__(self, engine, check_class=False, split_mode='sequential'):
+        """
+        :param engine: 已登记全部考试安排的 OccupancyEngine
+        :param check_class: 排考时是否避免同一班级同时考试
+        :param split_mode: 分场方式，决定超过教室容量的课程如何检查教室
+        """
+        self.engine = engine
+        self.check_class = check_class
+        self.split_mode = split_mode
+        self.course_by_id = {course[0]: course for course in engine.courses}
+        self.teacher_preferred = teacher_preferred_rooms(engine.courses)
+        self.capacities = {room[0]: int(room[2]) for room in engine.rooms}
+        self.last_stats = None
+
+    def diagnose(self, failed_courses):
+        """
+        为失败课程补充诊断信息（直接修改传入的记录）：
+        cause 为 FAILURE_CAUSES 中的键，reason 为说明文字，
+        alternative 为最接近的可行方案 {'exam_date', 'exam_time', 'room_id', 'violations', 'sessions'}，
+        sessions 为依次分场时每一场的 {'exam_date', 'exam_time', 'room_id', 'violations'}，没有方案时为 None
+
+        :return: failed_courses
+        """
+        start_time = time.perf_counter()
+        for failure in failed_courses:
+            course = self.course_by_id.get(failure['course_id'])
+            if course is None:
+                continue
+            cause, detail, alternative = self._diagnose_course(course, failure['students_count'])
+            failure['cause'] = cause
+            failure['reason'] = f"{FAILURE_CAUSES[cause]}{detail}"
+            failure['alternative'] = alternative
+        self.last_stats = {'courses': len(failed_courses), 'seconds': time.perf_counter() - start_time}
+        return failed_courses
+
+    def _diagnose_course(self, course, students_count):
+        engine = self.engine
+        teacher, class_name, course_id = course[11], course[8], course[0]
+        duration = engine.course_duration(course)
+        limit = engine.teacher_limit(teacher)
+        available = engine.constraint_store.available_masks(teacher)
+        teacher_busy = engine.teacher_busy.get(teacher)
+        class_busy = engine.class_busy.get(class_name) if self.check_class else None
+
+        room_mode, plans = self._room_mode(course, students_count)
+        if room_mode is None:
+            detail = f"（需要 {students_count} 个座位，最大教室 {engine.room_index.max_capacity} 个座位"
+            if self.split_mode == 'sequential':
+                detail += "，教师常用教室均不在考场列表中，无法分场"
+            return 'no_room', detail + "）", None
+
+        # 每个开始时间段与教室无关的违反条件：[(violations, day, slot, span)]
+        cells = []
+        unavailable_all = True
+        capped_all = True
+        for day in range(engine.n_days):
+            capped = engine.teacher_daily_count(teacher, day) >= limit
+            student_busy = engine.student_busy(course_id, day)
+            for slot in range(engine.n_slots):
+                span = engine.span(slot, duration)
+                if not span:
+                    continue  # 考试超出当天考试时间
+                violations = []
+                if available[day] & span != span:
+                    violations.append('teacher_unavailable')
+                else:
+                    unavailable_all = False
+                    if not capped:
+                        capped_all = False
+                if capped:
+                    violations.append('teacher_daily_cap')
+                if teacher_busy and teacher_busy[day] & span:
+                    violations.append('teacher_busy')
+                if class_busy and class_busy[day] & span:
+                    violations.append('class_busy')
+                if student_busy & span:
+                    violations.append('student_busy')
+                cells.append((violations, day, slot, span))
+
+        if not cells:
+            return 'too_long', f"（{duration} 分钟）", None
+
+        if room_mode == 'sequential':
+            sessions, detail = self._best_sequential(teacher, plans, cells, duration, limit)
+        else:
+            best = None
+            for violations, day, slot, _ in cells:
+                room_id = self._free_room(room_mode, students_count, day, slot, duration)
+                if room_id is None:
+                    violations = violations + ['room']
+                if best is None or len(violations) < len(best[0]):
+                    best = (violations, day, slot, room_id)
+            sessions, detail = [best], ''
+
+        violations, day, slot, room_id = sessions[0]
+        alternative = {
+            'exam_date': engine.exam_dates[day],
+            'exam_time': engine.exam_time(slot, duration),
+            'room_id': room_id,
+            'violations': [VIOLATIONS[name] for name in violations],
+            'sessions': [
+                {
+                    'exam_date': engine.exam_dates[day],
+                    'exam_time': engine.exam_time(slot, duration),
+                    'room_id': room_id,
+                    'violations': [VIOLATIONS[name] for name in violations]
+                }
+                for violations, day, slot, room_id in sessions
+            ]
+        }
+
+        if unavailable_all:
+            return 'teacher_unavailable', detail, alternative
+        if capped_all:
+            return 'teacher_daily_cap', f"（每日上限 {limit} 场）{detail}", alternative
+        return 'slots_taken', detail, alternative
+
+    def _room_mode(self, course, students_count):
+        """
+        课程使用教室的方式，与贪心排考相同：
+        'single' 一间教室；'concurrent' 同一时间段多间教室；
+        'sequential' 超过最大教室容量时在教师常用教室分多个时间段依次考试，同时返回依次尝试的 (教室编号, 场次数)；
+        不可能有足够教室时返回 (None, None)
+        """
+        engine = self.engine
+        if students_count <= engine.room_index.max_capacity:
+            return 'single', None
+        if self.split_mode == 'concurrent':
+            total = sum(self.capacities.values())
+            return ('concurrent', None) if total >= students_count else (None, None)
+        plans = sequential_plans(self.teacher_preferred.get(course[11], ()), self.capacities, students_count)
+        return ('sequential', plans) if plans else (None, None)
+
+    def _free_room(self, room_mode, students_count, day, slot, duration):
+        engine = self.engine
+        occupied = engine.occupied_rooms(day, slot, duration)
+        if room_mode == 'concurrent':
+            rooms = engine.room_index.select_many(students_count, occupied)
+            return ', '.join(room[0] for room in rooms) if rooms else None
+        room = engine.room_index.select(students_count, occupied)
+        return room[0] if room else None
+
+    def _best_sequential(self, teacher, plans, cells, duration, limit):
+        """
+        依次分场的最接近方案：对每间常用教室选出所需场次数个违反条件最少的时间段，
+        同一天的场次互不重叠且计入教师每日上限，取违反条件总数最少的教室
+
+        :return: ([(violations, day, slot, room_id)], 说明文字)
+        """
+        engine = self.engine
+        best = None
+        for room_id, sessions_needed in plans:
+            candidates = []
+            for violations, day, slot, span in cells:
+                if not engine.room_free(room_id, day, slot, duration):
+                    violations = violations + ['room']
+                candidates.append((violations, day, slot, span))
+            candidates.sort(key=lambda cell: (len(cell[0]), cell[1], cell[2]))
+
+            # 逐场选择：已选场次使同一天再考一场可能超出每日上限，每次按计入上限后的违反条件数重新比较
+            chosen = []
+            day_spans = {}
+            while len(chosen) < sessions_needed:
+                pick = None
+                for violations, day, slot, span in candidates:
+                    if pick is not None and len(violations) >= len(pick[0]):
+                        break  # 按原违反条件数排序，之后的时间段不会更少
+                    taken = day_spans.get(day, [])
+                    if any(span & other for other in taken):
+                        continue  # 同一课程的两场不能同时进行
+                    if ('teacher_daily_cap' not in violations
+                            and engine.teacher_daily_count(teacher, day) + len(taken) >= limit):
+                        violations = violations + ['teacher_daily_cap']
+                    if pick is None or len(violations) < len(pick[0]):
+                        pick = (violations, day, slot, span)
+                if pick is None:
+                    break
+                violations, day, slot, span = pick
+                day_spans.setdefault(day, []).append(span)
+                chosen.append((violations, day, slot, room_id))
+            if len(chosen) < sessions_needed:
+                continue
+            score = sum(len(violations) for violations, _, _, _ in chosen)
+            if best is None or score < best[0]:
+                best = (score, room_id, sessions_needed, chosen)
+
+        if best is None:
+            # 考试窗口的时间段数少于所需场次数，按第一间常用教室给出能安排的场次
+            room_id, sessions_needed = plans[0]
+            chosen = [(violations + ([] if engine.room_free(room_id, day, slot, duration) else ['room']),
+                       day, slot, room_id) for violations, day, slot, _ in cells]
+            return chosen[:sessions_needed], f"（需在常用教室 {room_id} 分 {sessions_needed} 场考试）"
+        _, room_id, sessions_needed, chosen = best
+        chosen.sort(key=lambda cell: (cell[1], cell[2]))
+        return chosen, f"（需在常用教室 {room_id} 分 {sessions_needed} 场考试）"
+
+
+def format_alternative(alternative):
+    """
+    最接近的可行方案的说明文字
+    """
+    if alternative is None:
+        return '无'
+    sessions = alternative.get('sessions') or [alternative]
+    if len(sessions) == 1:
+        return _format_session(sessions[0])
+    return '；'.join(f"第 {i} 场 {_format_session(session)}" for i, session in enumerate(sessions, 1))
+
+
+def _format_session(session):
+    text = f"{session['exam_date']} {session['exam_time']}"
+    if session['room_id']:
+        text += f" 教室 {session['room_id']}"
+    if session['violations']:
+        text += f"（需解决: {'、'.join(session['violations'])}）"
+    else:
+        text += "（当前可直接安排，可重新排考或手动调整）"
+    return text
@@ -0,0 +1,139 @@
+import hashlib
+import numpy as np
+
+
+def load_enrolments(cursor):
+    """
+    读取学生选课记录 (学号, 课程名称, 学院班级)
+    """
+    cursor.execute('SELECT 学号, 课程名称, 学院班级 FROM student_enrolments')
+    return cursor.fetchall()
+
+
+class CoEnrolmentMatrix:
+    """
+    课程 × 课程共同选课稀疏矩阵
+    以 CSR 格式保存（indptr, indices, counts 三个 numpy 数组），counts 为同时选修两门课程的学生数。
+    选课记录按 (课程名称, 学院班级) 对应到课程，重修、选修其他班级课程的学生也能对应到实际考试的课程。
+    查询一门课程的全部相邻课程是一次切片，批量查询共同考生数用 searchsorted 完成
+    """
+
+    def __init__(self, course_ids, indptr, indices, counts, unmatched=0):
+        """
+        :param course_ids: 矩阵行号对应的课程 id
+        :param unmatched: 没有对应课程的选课记录数
+        """
+        self.course_ids = list(course_ids)
+        self.indptr = indptr
+        self.indices = indices
+        self.counts = counts
+        self.unmatched = unmatched
+        # 考试安排中课程 id 保存为文字，两种形式都可以查询
+        self.position = {}
+        for i, course_id in enumerate(self.course_ids):
+            self.position[course_id] = i
+            self.position[str(course_id)] = i
+
+    @classmethod
+    def build(cls, course_keys, enrolment_rows):
+        """
+        :param course_keys: [(课程 id, 课程名称, 学院班级)]
+        :param enrolment_rows: [(学号, 课程名称, 学院班级)]
+        :return: CoEnrolmentMatrix
+        """
+        course_keys = list(course_keys)
+        n = len(course_keys)
+        by_key = {}
+        for i, (_, name, class_name) in enumerate(course_keys):
+            by_key.setdefault((str(name).strip(), str(class_name).strip()), []).append(i)
+
+        students = {}
+        student_codes = []
+        course_codes = []
+        unmatched = 0
+        for student, name, class_name in enrolment_rows:
+            positions = by_key.get((str(name).strip(), str(class_name).strip()))
+            if not positions:
+                unmatched += 1
+                continue
+            code = students.setdefault(student, len(students))
+            for i in positions:
+                student_codes.append(code)
+                course_codes.append(i)
+
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        if not course_codes:
+            return cls([key[0] for key in course_keys], indptr, np.zeros(0, dtype=np.int64),
+                       np.zeros(0, dtype=np.int64), unmatched)
+
+        # 去掉重复的 (学生, 课程)，按学生排序
+        pairs = np.unique(np.array(student_codes, dtype=np.int64) * n + np.array(course_codes, dtype=np.int64))
+        student_of = pairs // n
+        course_of = pairs % n
+
+        # 同一学生的每两门课程组成一对：第 p 条记录与所在学生的全部记录配对
+        _, group_start, group_len = np.unique(student_of, return_index=True, return_counts=True)
+        lengths = np.repeat(group_len, group_len)
+        starts = np.repeat(group_start, group_len)
+        left = np.repeat(np.arange(len(pairs)), lengths)
+        offsets = np.arange(len(left)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        right = np.repeat(starts, lengths) + offsets
+        keep = left != right
+        keys = course_of[left[keep]] * n + course_of[right[keep]]
+
+        cells, counts = np.unique(keys, return_counts=True)
+        rows = cells // n
+        indices = cells % n
+        indptr[1:] = np.cumsum(np.bincount(rows, minlength=n))
+        return cls([key[0] for key in course_keys], indptr, indices, counts.astype(np.int64), unmatched)
+
+    @classmethod
+    def from_snapshot(cls, courses, enrolment_rows):
+        """
+        根据课程表查询结果（字段顺序与 courses 表查询一致）构建
+        """
+        return cls.build(((course[0], course[2], course[8]) for course in courses), enrolment_rows)
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def neighbours(self, course_id):
+        """
+        与课程有共同考生的课程行号数组，课程不在矩阵中时返回空数组
+        """
+        i = self.position.get(course_id)
+        if i is None:
+            return self.indices[:0]
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def shared(self, course_id, other_ids):
+        """
+        批量查询与 other_ids 中各课程的共同考生数
+
+        :return: 与 other_ids 等长的 numpy 数组
+        """
+        result = np.zeros(len(other_ids), dtype=np.int64)
+        i = self.position.get(course_id)
+        if i is None or not len(other_ids):
+            return result
+        start, end = self.indptr[i], self.indptr[i + 1]
+        row = self.indices[start:end]
+        if not len(row):
+            return result
+        others = np.array([self.position.get(other, -1) for other in other_ids], dtype=np.int64)
+        found = np.searchsorted(row, others)
+        found = np.minimum(found, len(row) - 1)
+        hit = (row[found] == others) & (others >= 0)
+        result[hit] = self.counts[start:end][found[hit]]
+        return result
+
+    def digest(self):
+        """
+        矩阵内容的指纹，用于排考结果缓存
+        """
+        digest = hashlib.sha256()
+        digest.update(repr(self.course_ids).encode('utf-8'))
+        for array in (self.indptr, self.indices, self.counts):
+            digest.update(array.tobytes())
+        return digest.hexdigest()
@@ -1,22 +1,65 @@
-import sqlite3
+import os
 import random
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from models.database import DatabaseManager, MARK_MANUAL_SQL
 from utils.teacher_constraints import TeacherConstraintsManager
+from utils.occupancy import OccupancyEngine, load_schedule_snapshot
+from utils.arrangement_writer import ArrangementWriter
+from utils.placement import CoursePlacer
+from utils.parallel_scheduler import ParallelScheduler
+from utils.room_index import RoomIndex, make_room_strategy
+from utils.course_order import make_course_order
+from utils.local_search import LocalSearchOptimizer
+from utils.feasibility import FeasibilityChecker, format_feasibility_report
+from utils.incremental import IncrementalPlanner, course_digest, room_digest
+from utils.schedule_result import ScheduleResult, format_comparison, format_pareto_front, pareto_front
+from utils.schedule_cache import ScheduleCache, schedule_fingerprint
+from utils.progress import ProgressReporter, ScheduleCancelled
+from utils.spreading import SpreadingObjective
+from utils.diagnosis import FAILURE_CAUSES, FailureDiagnoser, format_alternative
+from utils.invigilation import (INVIGILATOR_INSERT_SQL, InvigilatorAssigner, covering_time_slots,
+                                 format_invigilation_report, load_staff)
+from utils.time_slots import DEFAULT_TIME_SLOTS, EXTRA_TIME_SLOT
+from utils.warm_start import WarmStartPlanner, load_previous_arrangements, previous_digest
+
+
+def _dry_run_worker(db_path, settings):
+    """
+    在工作进程中试排一组参数
+    """
+    scheduler = ExamScheduler(db_path)
+    try:
+        return scheduler.dry_run(**settings)
+    finally:
+        scheduler.close()
+
 
 class ExamScheduler:
     def __init__(self, db_path='exam_system.db'):
+        self.db_path = db_path
         self.conn = sqlite3.connect(db_path)
         self.cursor = self.conn.cursor()
-        # 默认考试时间段
-        self.default_time_slots = [
-            "08:00-10:00", "10:30-12:30", "14:00-16:00", "16:30-18:30"
-        ]
+        # 默认考试时间段，学期配置了考试时间段时使用学期的配置
+        self.default_time_slots = list(DEFAULT_TIME_SLOTS)
         # 默认为五场考试时添加的时间段
-        self.extra_time_slot = "19:00-21:00"
+        self.extra_time_slot = EXTRA_TIME_SLOT
+        self.db_manager = DatabaseManager(db_path)
         # 教师约束管理器
-        self.teacher_constraints = TeacherConstraintsManager()
+        self.teacher_constraints = TeacherConstraintsManager(self.db_manager)
+        # 批量写入考试安排，write_chunk_size 为空时一次写入全部
+        self.write_chunk_size = None
+        self.last_write_stats = None
+        # 按输入指纹缓存的排考结果
+        self.schedule_cache = ScheduleCache(self.conn)
 
-    def schedule_exams(self, start_date=None, end_date=None, slots_per_day=4):
+    def schedule_exams(self, start_date=None, end_date=None, slots_per_day=4, mode='greedy',
+                       room_strategy='best_fit', partition_by=None, max_workers=None, incremental=False,
+                       optimize_seconds=0, split_mode='sequential', seed=None, optimize_iterations=None,
+                       use_cache=True, progress_callback=None, cancel_token=None, term=None, warm_start=None,
+                       spread=None, course_order='teacher'):
         """
         自动排考场算法
         根据老师平时上课教室安排考试，处理教室容量和时间冲突问题
@@ -25,311 +68,483 @@ class ExamScheduler:
         :param start_date: 考试开始日期，格式：YYYY-MM-DD
         :param end_date: 考试结束日期，格式：YYYY-MM-DD
         :param slots_per_day: 每天安排的考试场次数量，4或5
+        :param mode: 排考模式，'greedy' 按教师顺序贪心安排；
+                     'dsatur' 按冲突图着色安排，保证同一班级不会同时考试
+        :param room_strategy: 常用教室不可用时的教室选择策略，'best_fit'、'first_fit' 或 'random'
+        :param partition_by: 并行排考的分区方式，'college'、'building' 或 'component'，为空时单进程排考
+        :param max_workers: 并行排考的进程数，默认为 CPU 核数
+        :param incremental: 增量排考，保留内容未变化的课程和手动调整过的安排，只安排新增或失效的课程
+        :param optimize_seconds: 排考后局部搜索优化的时间预算（秒），为 0 时不优化
+        :param split_mode: 人数超过教室容量时的分场方式，'sequential' 按多个时间段依次考试；
+                           'concurrent' 在同一时间段使用多间教室同时考试
+        :param seed: 随机种子，'random' 教室选择策略和局部搜索使用，相同输入和种子得到相同结果
+        :param optimize_iterations: 局部搜索的最大迭代次数，指定后不受 optimize_seconds 限制，优化结果可复现
+        :param use_cache: 输入指纹未变化时直接使用缓存的排考结果
+        :param progress_callback: 进度回调函数，参数为 {'stage', 'done', 'total', 'teacher', 'elapsed'}
+        :param cancel_token: CancellationToken，取消后不修改原有考试安排
+        :param term: 学期，使用该学期配置的考试时间段（见 DatabaseManager.set_term_time_slots）
+        :param warm_start: 上学期的数据库文件或导出的考场安排 Excel，按 (课程名称, 教师, 学院班级)
+                           沿用上学期的考试时间和教室，沿用不了的课程再正常排考
+        :param spread: 班级考试分散度，如 {'min_gap_days': 2, 'same_day': 20, 'back_to_back': 10, 'min_gap': 5}，
+                       贪心排考选择惩罚最小的时间段，局部搜索把惩罚计入目标函数；为空时不考虑分散度
+        :param course_order: 贪心排考的课程顺序，'teacher' 按教师分组（课程表顺序）、'largest_first' 考试人数多的优先、
+                             'constrained_teacher' 约束最紧的教师优先、'fewest_slots' 可行时间段最少的优先、
+                             'random_restart' 多次随机顺序排考取失败最少的结果
         :return: (success, message, failed_courses)
         """
         try:
-            # 清空原有考试安排
-            self.cursor.execute('DELETE FROM exam_arrangements')
-            
-            # 如果没有指定日期，默认为下周一开始，持续一周
-            if not start_date:
-                start_date = self._get_next_monday().strftime("%Y-%m-%d")
-            if not end_date:
-                start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-                end_date_obj = start_date_obj + timedelta(days=6)
-                end_date = end_date_obj.strftime("%Y-%m-%d")
-                
-            print(f"排课日期范围: {start_date} 到 {end_date}, 每天 {slots_per_day} 场")
+            result = self.dry_run(
+                start_date=start_date, end_date=end_date, slots_per_day=slots_per_day, mode=mode,
+                room_strategy=room_strategy, partition_by=partition_by, max_workers=max_workers,
+                incremental=incremental, optimize_seconds=optimize_seconds, split_mode=split_mode,
+                seed=seed, optimize_iterations=optimize_iterations, use_cache=use_cache,
+                progress_callback=progress_callback, cancel_token=cancel_token, term=term,
+                warm_start=warm_start, spread=spread, course_order=course_order
+            )
+        except ScheduleCancelled:
+            print("排考已取消")
+            self.conn.rollback()
+            return False, "排考已取消，原有考试安排未改变", []
+        except Exception as e:
+            print(f"自动排考场出错: {e}")
+            import traceback
+            traceback.print_exc()
+            self.conn.rollback()
+            return False, f"排考过程中出现错误: {e}", []
+        return self.commit_schedule(result, cancel_token)
+
+    def dry_run(self, start_date=None, end_date=None, slots_per_day=4, mode='greedy',
+                room_strategy='best_fit', partition_by=None, max_workers=None, incremental=False,
+                optimize_seconds=0, split_mode='sequential', seed=None, optimize_iterations=None,
+                use_cache=True, progress_callback=None, cancel_token=None, term=None, warm_start=None,
+                spread=None, course_order='teacher'):
+        """
+        试排：在内存中完成排考，不修改考试安排（结果缓存除外）
+        参数含义与 schedule_exams 相同
+        
+        :return: ScheduleResult
+        :raises ScheduleCancelled: cancel_token 被取消时
+        """
+        run_start = time.perf_counter()
+        progress = ProgressReporter(progress_callback, cancel_token)
+        progress.begin('加载数据')
+        start_date, end_date = self._resolve_dates(start_date, end_date)
+        settings = {
+            'start_date': start_date, 'end_date': end_date, 'slots_per_day': slots_per_day, 'mode': mode,
+            'room_strategy': room_strategy, 'partition_by': partition_by, 'max_workers': max_workers,
+            'incremental': incremental, 'optimize_seconds': optimize_seconds, 'split_mode': split_mode,
+            'seed': seed, 'optimize_iterations': optimize_iterations, 'term': term, 'warm_start': warm_start,
+            'spread': spread, 'course_order': course_order
+        }
             
-            # 设置考试时间段
-            time_slots = self.default_time_slots
-            if slots_per_day == 5:
-                time_slots = time_slots + [self.extra_time_slot]
+        print(f"排课日期范围: {start_date} 到 {end_date}, 每天 {slots_per_day} 场")
+        
+        # 设置考试时间段
+        time_slots = self._get_time_slots(slots_per_day, term)
+        
+        # 生成考试日期安排
+        exam_dates = self._get_exam_dates(start_date, end_date)
+        
+        # 一次性加载课程、教室、教师约束和已有安排，排考循环中不再访问数据库
+        constraint_store = self.teacher_constraints.compile_window(exam_dates, time_slots)
+        snapshot = load_schedule_snapshot(self.cursor)
+        previous_rows = load_previous_arrangements(warm_start, snapshot['rooms']) if warm_start else None
+        
+        # 输入指纹未变化时直接返回缓存的结果
+        fingerprint = None
+        if use_cache and self._is_deterministic(settings):
+            fingerprint = self._fingerprint(snapshot, settings, time_slots, previous_rows)
+            cached = self.schedule_cache.get(fingerprint)
+            if cached is not None:
+                cached.from_cache = True
+                print(f"使用缓存的排考结果 {fingerprint[:12]}")
+                return cached
+        
+        pinned = set()
+        if incremental:
+            # 保留仍然有效的安排，失效的安排在内存中剔除，写入时再从数据库删除
+            planner = IncrementalPlanner(self.cursor, snapshot, exam_dates, time_slots, constraint_store)
+            pinned = planner.prepare(apply=False)
+            snapshot = planner.apply_to_snapshot(snapshot)
+        else:
+            # 全部重新安排，忽略原有考试安排
+            snapshot['arrangements'] = []
+        
+        all_courses = snapshot['courses']
+        snapshot['courses'] = [course for course in all_courses if str(course[0]) not in pinned]
+        engine = OccupancyEngine(snapshot, exam_dates, time_slots, constraint_store)
+        courses = engine.courses
+        print(f"课程总数: {len(all_courses)}, 待安排: {len(courses)}")
+        spread_objective = SpreadingObjective.from_settings(engine, spread) if spread else None
+        
+        # 先沿用上学期的安排，映射不到或已被占用的课程再正常排考
+        warm_placements = []
+        if previous_rows is not None:
+            progress.begin('沿用上学期安排')
+            warm = WarmStartPlanner(engine, CoursePlacer(engine, split_mode=split_mode), previous_rows,
+                                    check_class=mode == 'dsatur')
+            warm_placements, courses = warm.place(courses)
+            stats = warm.last_stats
+            print(f"沿用上学期安排: 对应到 {stats['mapped']} 门课程, 沿用 {stats['placed']} 门, "
+                  f"其余 {len(courses)} 门正常排考")
+        
+        if partition_by:
+            # 沿用的安排作为已有安排交给各分区
+            warm_rows = [
+                (None, str(p['course_id']), p['room_id'], p['exam_date'], p['exam_time'],
+                 p['class_name'], p['students_count'], p['teacher'])
+                for p in warm_placements
+            ]
+            parallel = ParallelScheduler(
+                dict(snapshot, courses=courses, arrangements=snapshot['arrangements'] + warm_rows),
+                exam_dates, time_slots, constraint_store, max_workers
+            )
+            placements, failed_courses = parallel.schedule(
+                partition_by, mode, room_strategy, split_mode, seed, progress, spread, course_order
+            )
+            # 并行排考的结果登记在子进程中，重放到本进程的占用引擎供优化、诊断和统计使用
+            self._replay(engine, placements)
+        else:
+            order = make_course_order(course_order, random.Random(seed))
+            room_choice = make_room_strategy(room_strategy, random.Random(seed))
+            best = None
+            for attempt in range(order.restarts):
+                if attempt:
+                    # 随机重启：在新的占用引擎上按新的顺序重新排考
+                    engine = OccupancyEngine(snapshot, exam_dates, time_slots, constraint_store)
+                    self._replay(engine, warm_placements)
+                    spread_objective = SpreadingObjective.from_settings(engine, spread) if spread else None
+                progress.begin('安排课程', len(courses))
+                placer = CoursePlacer(engine, room_choice, split_mode, progress, spread_objective, order)
+                placements, failed_courses = placer.place(courses, mode)
+                if best is None or len(failed_courses) < len(best[3]):
+                    best = (engine, spread_objective, placements, failed_courses)
+                if not failed_courses:
+                    break
+            engine, spread_objective, placements, failed_courses = best
+            if order.restarts > 1:
+                print(f"随机重启排考 {attempt + 1} 次, 最少失败 {len(failed_courses)} 门")
+        placements = warm_placements + placements
+        
+        # 在时间预算内用局部搜索减少失败课程、班级连续考试和教室空余座位
+        optimizer_stats = None
+        if optimize_seconds:
+            progress.begin('局部搜索优化', 100)
+            optimizer = LocalSearchOptimizer(
+                engine,
+                CoursePlacer(engine, make_room_strategy(room_strategy, random.Random(seed)), split_mode,
+                             spread=spread_objective),
+                check_class=mode == 'dsatur', seed=seed, progress=progress, spread=spread_objective
+            )
+            placements, failed_courses = optimizer.optimize(
+                placements, failed_courses, optimize_seconds, optimize_iterations
+            )
+            optimizer_stats = optimizer.last_stats
+        
+        # 在排考结束时的占用位图上诊断每门失败课程的原因和最接近的可行方案
+        if failed_courses:
+            diagnoser = FailureDiagnoser(engine, check_class=mode == 'dsatur', split_mode=split_mode)
+            diagnoser.diagnose(failed_courses)
+            print(f"失败原因诊断用时 {diagnoser.last_stats['seconds']:.3f} 秒")
+        
+        # 班级考试分散度惩罚，未指定分散度参数时按默认权重统计
+        spread_stats = (spread_objective or SpreadingObjective(engine)).evaluate()
+        
+        result = ScheduleResult(
+            settings, exam_dates, time_slots, placements, failed_courses, len(all_courses),
+            pinned=pinned,
+            course_keys={course[0]: course_digest(course) for course in engine.courses},
+            room_keys={room[0]: room_digest(room) for room in snapshot['rooms']},
+            seconds=time.perf_counter() - run_start,
+            optimizer_stats=optimizer_stats,
+            fingerprint=fingerprint,
+            spread_stats=spread_stats
+        )
+        if fingerprint is not None:
+            self.schedule_cache.put(fingerprint, result)
+        return result
+
+    def _replay(self, engine, placements):
+        """
+        并行排考的结果登记在子进程中，在本进程的占用引擎上重放
+        """
+        exams = {}
+        for placement in placements:
+            key = (placement['course_id'], placement['day'], placement['slot'])
+            exams.setdefault(key, (placement, []))[1].append(placement['room_id'])
+        for placement, room_ids in exams.values():
+            engine.place(placement['teacher'], placement['class_name'], room_ids,
+                         placement['day'], placement['slot'], placement.get('duration'),
+                         placement['course_id'])
+
+    def _is_deterministic(self, settings):
+        """
+        未指定随机种子时，使用随机教室策略、随机重启或按时间预算优化的结果不可复现，不缓存
+        """
+        if settings['seed'] is not None:
+            return not settings['optimize_seconds'] or settings['optimize_iterations'] is not None
+        return (settings['room_strategy'] != 'random' and settings['course_order'] != 'random_restart'
+                and not settings['optimize_seconds'])
+
+    def _fingerprint(self, snapshot, settings, time_slots, previous_rows=None):
+        """
+        计算排考输入指纹；并行排考的任务划分取决于进程数，指纹中使用实际进程数，
+        学期的考试时间段配置可能变化，指纹中使用实际时间段，
+        热启动的文件内容可能变化，指纹中使用上学期安排的内容指纹
+        """
+        settings = dict(settings, time_slots=tuple(time_slots))
+        if settings['spread']:
+            settings['spread'] = tuple(sorted(settings['spread'].items()))
+        if previous_rows is not None:
+            settings['warm_start'] = previous_digest(previous_rows)
+        if settings['partition_by']:
+            settings['max_workers'] = settings['max_workers'] or os.cpu_count() or 1
+        else:
+            settings['max_workers'] = None
+        arrangement_meta = None
+        if settings['incremental']:
+            self.cursor.execute('SELECT arrangement_id, course_key, room_key, source FROM exam_arrangement_meta')
+            arrangement_meta = self.cursor.fetchall()
+        return schedule_fingerprint(snapshot, settings, arrangement_meta)
+
+    def commit_schedule(self, result, cancel_token=None):
+        """
+        将试排结果一次性写入数据库，替换原有考试安排
+        增量排考的结果写入前会重新比对已有安排，数据已变化时放弃写入；
+        比对、清空或修剪原有安排、写入新安排和清理监考记录在同一个事务内提交，出错时全部回滚
+        
+        :param result: dry_run 返回的 ScheduleResult
+        :param cancel_token: CancellationToken，写入前已取消时不修改数据库
+        :return: (success, message, failed_courses)
+        """
+        if cancel_token is not None and cancel_token.cancelled:
+            return False, "排考已取消，原有考试安排未改变", []
+        try:
+            # 立即获取写锁，比对与写入之间其他连接不能修改考试安排
+            if not self.conn.in_transaction:
+                self.cursor.execute('BEGIN IMMEDIATE')
+            if result.settings['incremental']:
+                constraint_store = self.teacher_constraints.compile_window(result.exam_dates, result.time_slots)
+                planner = IncrementalPlanner(
+                    self.cursor, load_schedule_snapshot(self.cursor),
+                    result.exam_dates, result.time_slots, constraint_store
+                )
+                if planner.prepare() != result.pinned:
+                    self.conn.rollback()
+                    return False, "试排后考试安排或课程数据已变化，请重新试排", result.failed_courses
+            else:
+                # 清空原有考试安排
+                self.cursor.execute('DELETE FROM exam_arrangements')
+                self.cursor.execute('DELETE FROM exam_arrangement_meta')
             
-            # 获取所有课程
+            # 批量写入考试安排，并记录课程和教室指纹供下次增量排考比对
+            course_keys = result.course_keys
+            room_keys = result.room_keys
+            writer = ArrangementWriter(self.conn, self.write_chunk_size)
+            self.last_write_stats = writer.write(
+                result.placements, meta=lambda p: (course_keys[p['course_id']], room_keys.get(p['room_id']))
+            )
+            # 已删除的考试安排不再保留监考记录
             self.cursor.execute('''
-            SELECT 
-                id, 教室号, 课程名称, 时段, 日期, 教师类型, 
-                任课学院, 专业, 学院班级, 考试人数, 考试地点, 教师
-            FROM courses
+                DELETE FROM exam_invigilators
+                WHERE arrangement_id NOT IN (SELECT arrangement_id FROM exam_arrangements)
             ''')
-            courses = self.cursor.fetchall()
-            print(f"课程总数: {len(courses)}")
-
-            # 获取所有教室信息
-            self.cursor.execute('SELECT 教室编号, 教室名称, 教室容量, 教学楼, 楼层 FROM exam_rooms')
-            rooms = self.cursor.fetchall()
-            
-            # 创建教室字典，方便查询
-            room_dict = {room[0]: room for room in rooms}
-            
-            # 创建教室类型分组，以便在需要更换教室时找到类似类型的教室
-            room_types = {}
-            for room in rooms:
-                room_id, _, _, building, floor = room
-                room_type = f"{building}-{floor}"
-                if room_type not in room_types:
-                    room_types[room_type] = []
-                room_types[room_type].append(room_id)
-            
-            # 记录教室使用情况
-            # 格式: {(日期, 时间段, 教室编号): 已用座位数}
-            room_usage = {}
-            
-            # 记录教师每日考试安排数量
-            teacher_daily_count = {}
-            
-            # 按教师分组课程，确保同一教师的课程尽量安排在同一教室
-            teacher_courses = {}
-            for course in courses:
-                teacher = course[11]  # 教师
-                if teacher not in teacher_courses:
-                    teacher_courses[teacher] = []
-                teacher_courses[teacher].append(course)
-            
-            # 生成考试日期安排
-            exam_dates = []
-            current_date = datetime.strptime(start_date, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-            
-            while current_date <= end_date_obj:
-                exam_dates.append(current_date.strftime("%Y-%m-%d"))
-                current_date += timedelta(days=1)
-            
-            # 记录排考失败的课程
-            failed_courses = []
-            successfully_scheduled = 0
-            
-            # 为每个教师的课程安排考试
-            for teacher, teacher_course_list in teacher_courses.items():
-                # 教师的教室使用记录，用于决定使用哪个教室
-                teacher_rooms = {}
-                
-                # 统计教师使用各教室的次数
-                for course in teacher_course_list:
-                    room_id = course[1]  # 教室号
-                    if room_id not in teacher_rooms:
-                        teacher_rooms[room_id] = 0
-                    teacher_rooms[room_id] += 1
-                
-                # 优先使用教师最常用的教室
-                preferred_rooms = sorted(teacher_rooms.items(), key=lambda x: x[1], reverse=True)
-                
-                # 为每个课程安排考试
-                for course in teacher_course_list:
-                    course_id = course[0]
-                    room_id = course[1]  # 原始教室号
-                    course_name = course[2]
-                    time_slot = course[3]
-                    date = course[4]
-                    teacher_type = course[5]
-                    department = course[6]  # 任课学院
-                    major = course[7]  # 专业
-                    class_name = course[8]  # 学院班级
-                    students_count = course[9]  # 考试人数
-                    teacher = course[11]  # 教师
-                    
-                    # 如果考试人数超过一个合理值（如10人），则使用实际的考试教室
-                    actual_students_count = max(10, students_count)
-                    
-                    # 标记是否成功安排
-                    course_scheduled = False
-                    
-                    # 尝试使用教师常用的教室（按使用频率排序）
-                    for preferred_room_id, _ in preferred_rooms:
-                        if course_scheduled:
-                            break
-                            
-                        # 如果该教室号在room_dict中有对应信息
-                        if preferred_room_id in room_dict:
-                            room_info = room_dict[preferred_room_id]
-                            room_capacity = int(room_info[2])
-                            
-                            # 如果学生人数超过教室容量，需要分场次考试
-                            if actual_students_count > room_capacity:
-                                # 计算需要多少场次
-                                sessions_needed = (actual_students_count + room_capacity - 1) // room_capacity
-                                
-                                # 每场安排的学生数量
-                                students_per_session = (actual_students_count + sessions_needed - 1) // sessions_needed
-                                
-                                # 为每场次安排教室和时间
-                                sessions_scheduled = 0
-                                for session in range(sessions_needed):
-                                    # 分配学生数量
-                                    session_students = min(students_per_session, actual_students_count - session * students_per_session)
-                                    
-                                    # 分配考试日期和时间
-                                    session_assigned = False
-                                    
-                                    for exam_date in exam_dates:
-                                        if session_assigned:
-                                            break
-                                            
-                                        # 检查教师每日考试限制
-                                        teacher_date_key = f"{teacher}_{exam_date}"
-                                        current_daily_count = teacher_daily_count.get(teacher_date_key, 0)
-                                        
-                                        # 获取教师约束
-                                        constraints = self.teacher_constraints.db_manager.get_teacher_constraints(teacher)
-                                        if current_daily_count >= constraints['max_exams_per_day']:
-                                            continue  # 该日期已达到教师考试限制
-                                            
-                                        for time_slot in time_slots:
-                                            # 验证教师时间约束
-                                            is_valid, reason = self.teacher_constraints.validate_teacher_schedule(
-                                                teacher, exam_date, time_slot
-                                            )
-                                            if not is_valid:
-                                                continue
-                                            
-                                            # 检查该时段该教室是否已被安排
-                                            usage_key = (exam_date, time_slot, preferred_room_id)
-                                            
-                                            if usage_key not in room_usage:
-                                                # 安排考试
-                                                if self._arrange_exam(
-                                                    course_id, preferred_room_id, exam_date, time_slot,
-                                                    class_name, session_students, department, major, teacher_type,
-                                                    teacher, course_name, session + 1, sessions_needed
-                                                ):
-                                                    # 记录教室使用情况
-                                                    room_usage[usage_key] = session_students
-                                                    # 更新教师每日考试计数
-                                                    teacher_daily_count[teacher_date_key] = current_daily_count + 1
-                                                    session_assigned = True
-                                                    sessions_scheduled += 1
-                                                    break
-                                
-                                # 如果所有场次都成功安排，标记课程为已安排
-                                if sessions_scheduled == sessions_needed:
-                                    course_scheduled = True
-                                    successfully_scheduled += 1
-                            else:
-                                # 学生人数不超过教室容量，直接安排一场考试
-                                for exam_date in exam_dates:
-                                    if course_scheduled:
-                                        break
-                                    
-                                    # 检查教师每日考试限制
-                                    teacher_date_key = f"{teacher}_{exam_date}"
-                                    current_daily_count = teacher_daily_count.get(teacher_date_key, 0)
-                                    
-                                    # 获取教师约束
-                                    constraints = self.teacher_constraints.db_manager.get_teacher_constraints(teacher)
-                                    if current_daily_count >= constraints['max_exams_per_day']:
-                                        continue  # 该日期已达到教师考试限制
-                                        
-                                    for time_slot in time_slots:
-                                        # 验证教师时间约束
-                                        is_valid, reason = self.teacher_constraints.validate_teacher_schedule(
-                                            teacher, exam_date, time_slot
-                                        )
-                                        if not is_valid:
-                                            continue
-                                        
-                                        usage_key = (exam_date, time_slot, preferred_room_id)
-                                        
-                                        if usage_key not in room_usage:
-                                            # 安排考试
-                                            if self._arrange_exam(
-                                                course_id, preferred_room_id, exam_date, time_slot,
-                                                class_name, actual_students_count, department, major, teacher_type,
-                                                teacher, course_name
-                                            ):
-                                                # 记录教室使用情况
-                                                room_usage[usage_key] = actual_students_count
-                                                # 更新教师每日考试计数
-                                                teacher_daily_count[teacher_date_key] = current_daily_count + 1
-                                                course_scheduled = True
-                                                successfully_scheduled += 1
-                                                break
-                    
-                    # 如果使用常用教室失败，尝试其他教室
-                    if not course_scheduled:
-                        # 尝试所有可用教室
-                        for exam_date in exam_dates:
-                            if course_scheduled:
-                                break
-                            
-                            # 检查教师每日考试限制
-                            teacher_date_key = f"{teacher}_{exam_date}"
-                            current_daily_count = teacher_daily_count.get(teacher_date_key, 0)
-                            
-                            # 获取教师约束
-                            constraints = self.teacher_constraints.db_manager.get_teacher_constraints(teacher)
-                            if current_daily_count >= constraints['max_exams_per_day']:
-                                continue
-                                
-                            for time_slot in time_slots:
-                                # 验证教师时间约束
-                                is_valid, reason = self.teacher_constraints.validate_teacher_schedule(
-                                    teacher, exam_date, time_slot
-                                )
-                                if not is_valid:
-                                    continue
-                                
-                                # 查找所有容量符合要求的教室
-                                suitable_rooms = [room for room in rooms if int(room[2]) >= actual_students_count]
-                                
-                                # 随机打乱顺序，避免总是选择同一个教室
-                                random.shuffle(suitable_rooms)
-                                
-                                for room in suitable_rooms:
-                                    room_id = room[0]
-                                    usage_key = (exam_date, time_slot, room_id)
-                                    
-                                    if usage_key not in room_usage:
-                                        # 安排考试
-                                        if self._arrange_exam(
-                                            course_id, room_id, exam_date, time_slot,
-                                            class_name, actual_students_count, department, major, teacher_type,
-                                            teacher, course_name
-                                        ):
-                                            # 记录教室使用情况
-                                            room_usage[usage_key] = actual_students_count
-                                            # 更新教师每日考试计数
-                                            teacher_daily_count[teacher_date_key] = current_daily_count + 1
-                                            course_scheduled = True
-                                            successfully_scheduled += 1
-                                            break
-                                
-                                if course_scheduled:
-                                    break
-                    
-                    # 如果课程仍未安排，记录为失败
-                    if not course_scheduled:
-                        failed_courses.append({
-                            'course_id': course_id,
-                            'course_name': course_name,
-                            'teacher': teacher,
-                            'class_name': class_name,
-                            'students_count': actual_students_count,
-                            'reason': '无法找到合适的时间和教室'
-                        })
-            
-            # 生成排考结果报告
-            total_courses = len(courses)
-            success_rate = (successfully_scheduled / total_courses * 100) if total_courses > 0 else 0
-            
-            if failed_courses:
-                # 有课程排考失败
-                failure_message = self._generate_failure_report(failed_courses, exam_dates, slots_per_day)
-                self.conn.commit()
-                return False, failure_message, failed_courses
-            else:
-                # 所有课程都成功安排
-                success_message = f"排考成功！共安排 {successfully_scheduled} 门课程的考试，成功率 {success_rate:.1f}%"
-                print(success_message)
-                self.conn.commit()
-                return True, success_message, []
-
+            self.conn.commit()
         except Exception as e:
             print(f"自动排考场出错: {e}")
             import traceback
             traceback.print_exc()
             self.conn.rollback()
             return False, f"排考过程中出现错误: {e}", []
+        
+        # 生成排考结果报告
+        failed_courses = result.failed_courses
+        successfully_scheduled = result.metrics['scheduled']
+        success_rate = result.metrics['success_rate']
+        
+        if failed_courses:
+            # 有课程排考失败
+            failure_message = self._generate_failure_report(
+                failed_courses, result.exam_dates, len(result.time_slots)
+            )
+            return False, failure_message, failed_courses
+        else:
+            # 所有课程都成功安排
+            success_message = f"排考成功！共安排 {successfully_scheduled} 门课程的考试，成功率 {success_rate:.1f}%"
+            if result.pinned:
+                success_message += f"（其中 {len(result.pinned)} 门课程保留原有安排）"
+            print(success_message)
+            return True, success_message, []
+
+    def compare_schedules(self, settings_list, max_workers=None):
+        """
+        在多个进程中并行试排多组参数，便于比较后选择一组写入
+        
+        :param settings_list: 参数字典列表，键与 schedule_exams 的参数相同
+        :param max_workers: 进程数，默认为 CPU 核数
+        :return: ScheduleResult 列表，与 settings_list 一一对应，试排出错的位置为 None
+        """
+        results = self._run_settings(settings_list, max_workers)
+        print(format_comparison(results))
+        return results
+
+    def explore_schedules(self, settings_list, seeds=None, max_workers=None, callback=None):
+        """
+        多目标排考探索：每组参数与每个随机种子组合，在进程池中并行试排，
+        收集 (失败课程数, 使用天数, 晚间考试场数, 分散度惩罚) 的 Pareto 前沿，
+        选定的结果用 commit_schedule 写入
+
+        :param settings_list: 参数字典列表，键与 schedule_exams 的参数相同
+        :param seeds: 随机种子列表，为空时每组参数只按其自身的 seed 试排一次
+        :param max_workers: 进程数，默认为 CPU 核数
+        :param callback: 每完成一次试排调用 callback(index, result)，试排出错时 result 为 None
+        :return: (results, front)，results 为全部试排结果（与组合顺序一致），
+                 front 为 Pareto 前沿上结果的下标，按失败课程数、使用天数排序
+        """
+        runs = []
+        for settings in settings_list:
+            if seeds:
+                runs.extend(dict(settings, seed=seed) for seed in seeds)
+            else:
+                runs.append(dict(settings))
+        results = self._run_settings(runs, max_workers, callback)
+        front = pareto_front(results)
+        print(format_pareto_front(results, front))
+        return results, front
+
+    def _run_settings(self, settings_list, max_workers=None, callback=None):
+        """
+        依次或在进程池中试排多组参数，按完成顺序调用 callback
+
+        :return: ScheduleResult 列表，与 settings_list 一一对应，试排出错的位置为 None
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        results = [None] * len(settings_list)
+        if max_workers == 1 or len(settings_list) <= 1:
+            for index, settings in enumerate(settings_list):
+                try:
+                    results[index] = self.dry_run(**settings)
+                except Exception as e:
+                    print(f"试排出错: {e}")
+                if callback is not None:
+                    callback(index, results[index])
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, len(settings_list))) as pool:
+                futures = {pool.submit(_dry_run_worker, self.db_path, settings): index
+                           for index, settings in enumerate(settings_list)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        print(f"试排出错: {e}")
+                    if callback is not None:
+                        callback(index, results[index])
+        return results
+
+    def check_feasibility(self, start_date=None, end_date=None, slots_per_day=4, mode='greedy',
+                          split_mode='sequential', term=None):
+        """
+        排考前的可行性预检查，不修改数据库
+        参数含义与 schedule_exams 相同
+        
+        :return: (ok, message, report)，ok 为 False 表示必然有课程排考失败
+        """
+        try:
+            start_date, end_date = self._resolve_dates(start_date, end_date)
+            time_slots = self._get_time_slots(slots_per_day, term)
+            exam_dates = self._get_exam_dates(start_date, end_date)
+            snapshot = load_schedule_snapshot(self.cursor)
+            constraint_store = self.teacher_constraints.compile_window(exam_dates, time_slots)
+            checker = FeasibilityChecker(snapshot, exam_dates, time_slots, constraint_store,
+                                         check_class=mode == 'dsatur', split_mode=split_mode)
+            report = checker.check()
+            print(f"可行性预检查用时 {report['seconds']:.3f} 秒，"
+                  f"问题 {len(report['errors'])} 项，提示 {len(report['warnings'])} 项")
+            return report['ok'], format_feasibility_report(report), report
+        except Exception as e:
+            print(f"可行性预检查出错: {e}")
+            return False, f"可行性预检查出错: {e}", None
+
+    def assign_invigilators(self, staff=None, proctors_per_room=1, students_per_proctor=60,
+                            slots_per_day=4, term=None):
+        """
+        为当前全部考试安排分配监考教师，替换原有监考安排
+        使用与排考相同的教师约束（每日上限、不安排晚上/周末、不可用日期和时间）
+
+        :param staff: 可监考的教师名单，默认为全部任课教师和设置了约束的教师
+        :param proctors_per_room: 每个考场至少的监考人数
+        :param students_per_proctor: 每名监考教师负责的最多考生数
+        :param slots_per_day: 每日考试场次，用于确定考试时间段网格
+        :return: (success, message, unfilled)，unfilled 为监考人数不足的考场列表 [(考试安排字典, 缺少人数)]
+        """
+        try:
+            snapshot = load_schedule_snapshot(self.cursor)
+            exam_dates = sorted({row[3] for row in snapshot['arrangements']})
+            if not exam_dates:
+                return False, "没有考试安排，请先排考", []
+            # 网格外的考试时间（如每日 5 场排考的晚上场次）加入网格，每个考场都参与分配
+            time_slots = covering_time_slots(self._get_time_slots(slots_per_day, term),
+                                             [row[4] for row in snapshot['arrangements']])
+            constraint_store = self.teacher_constraints.compile_window(exam_dates, time_slots)
+            assigner = InvigilatorAssigner(
+                snapshot, staff if staff is not None else load_staff(self.cursor),
+                exam_dates, time_slots, constraint_store, proctors_per_room, students_per_proctor
+            )
+            assignments, unfilled = assigner.assign()
+
+            self.cursor.execute('DELETE FROM exam_invigilators')
+            self.cursor.executemany(INVIGILATOR_INSERT_SQL, [
+                (arrangement_id, name) for arrangement_id, names in assignments.items() for name in names
+            ])
+            self.conn.commit()
+        except Exception as e:
+            print(f"分配监考教师出错: {e}")
+            self.conn.rollback()
+            return False, f"分配监考教师出错: {e}", []
+
+        stats = assigner.last_stats
+        print(f"监考分配用时 {stats['seconds']:.3f} 秒，均衡调整 {stats['moves']} 次")
+        return not unfilled, format_invigilation_report(stats, unfilled), unfilled
+
+    def _resolve_dates(self, start_date, end_date):
+        """
+        如果没有指定日期，默认为下周一开始，持续一周
+        """
+        if not start_date:
+            start_date = self._get_next_monday().strftime("%Y-%m-%d")
+        if not end_date:
+            start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
+            end_date_obj = start_date_obj + timedelta(days=6)
+            end_date = end_date_obj.strftime("%Y-%m-%d")
+        return start_date, end_date
+
+    def _get_time_slots(self, slots_per_day, term=None):
+        """
+        根据每日场次获取考试时间段
+        学期配置了考试时间段时取前 slots_per_day 个，否则使用默认时间段
+        """
+        if term:
+            term_slots = self.db_manager.get_term_time_slots(term)
+            if term_slots:
+                return term_slots[:slots_per_day]
+        time_slots = self.default_time_slots
+        if slots_per_day == 5:
+            time_slots = time_slots + [self.extra_time_slot]
+        return time_slots
+
+    def _get_exam_dates(self, start_date, end_date):
+        """
+        生成考试日期列表
+        """
+        exam_dates = []
+        current_date = datetime.strptime(start_date, "%Y-%m-%d")
+        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
+        
+        while current_date <= end_date_obj:
+            exam_dates.append(current_date.strftime("%Y-%m-%d"))
+            current_date += timedelta(days=1)
+        return exam_dates
 
     def _generate_failure_report(self, failed_courses, exam_dates, slots_per_day):
         """
@@ -346,9 +561,24 @@ class ExamScheduler:
         report += f"每日考试场次: {slots_per_day}\n"
         report += f"总可用时间段: {total_slots}\n\n"
         
+        # 按诊断出的主要原因统计
+        cause_counts = {}
+        for course in failed_courses:
+            cause = course.get('cause')
+            if cause:
+                cause_counts[cause] = cause_counts.get(cause, 0) + 1
+        if cause_counts:
+            report += "失败原因统计:\n"
+            for cause, count in sorted(cause_counts.items(), key=lambda item: -item[1]):
+                report += f"  {FAILURE_CAUSES[cause]}: {count} 门\n"
+            report += "\n"
+        
         report += "失败课程详情:\n"
         for i, course in enumerate(failed_courses[:10], 1):  # 只显示前10个
             report += f"{i}. {course['course_name']} - {course['teacher']} ({course['class_name']}, {course['students_count']}人)\n"
+            if course.get('cause'):
+                report += f"   原因: {course['reason']}\n"
+                report += f"   最接近的方案: {format_alternative(course.get('alternative'))}\n"
         
         if total_failed > 10:
             report += f"... 还有 {total_failed - 10} 门课程未能安排\n"
@@ -362,57 +592,6 @@ class ExamScheduler:
         
         return report
 
-    def _arrange_exam(self, course_id, room_id, exam_date, exam_time, class_name, 
-                     students_count, department, major, teacher_type, teacher, course_name, 
-                     session=None, total_sessions=None):
-        """
-        安排一场考试
-        
-        :param session: 如果是多场次考试，当前是第几场
-        :param total_sessions: 如果是多场次考试，总共有几场
-        """
-        try:
-            # 构建考试场次说明（如果有多场）
-            session_info = ""
-            if session and total_sessions:
-                session_info = f"(第{session}场/共{total_sessions}场)"
-            
-            # 获取教室名称
-            self.cursor.execute('SELECT 教室名称 FROM exam_rooms WHERE 教室编号 = ?', (room_id,))
-            room_name_result = self.cursor.fetchone()
-            room_name = room_name_result[0] if room_name_result else "未知教室"
-            
-            # 记录考试安排
-            self.cursor.execute('''
-            INSERT INTO exam_arrangements (
-                教室号, 
-                教室编号, 
-                考试日期, 
-                考试时间, 
-                学院班级,
-                考试人数,
-                任课学院,
-                专业,
-                学历层次
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                course_id,  # 使用课程ID作为教室号字段（原代码使用的逻辑）
-                room_id,    # 实际的教室编号
-                exam_date,  # 考试日期
-                exam_time,  # 考试时间
-                class_name, # 学院班级
-                students_count, # 考试人数
-                department, # 任课学院
-                major,      # 专业
-                teacher_type # 学历层次
-            ))
-            
-            print(f"安排考试: {course_name} - {teacher} - {room_name} - {exam_date} {exam_time} {session_info}")
-            return True
-        except Exception as e:
-            print(f"安排考试出错: {e}")
-            return False
-
     def _get_next_monday(self):
         # 获取下周一的日期
         today = datetime.now()
@@ -424,34 +603,17 @@ class ExamScheduler:
     def _find_suitable_room(self, students_count, rooms, exam_date, exam_time, scheduled_rooms):
         """
         选择合适的教室，考虑容量和时间冲突
+        优先选择容量最接近的空闲教室
+        
+        :param rooms: 教室列表或已建好的 RoomIndex
+        :param scheduled_rooms: 已占用记录，键为 (日期, 时间段, 教室编号)
         """
         try:
-            suitable_rooms = []
-            for room in rooms:
-                room_id = room[0]  # 教室编号
-                room_capacity = int(room[2])  # 教室容量
-
-                # 检查容量是否满足
-                if room_capacity < int(students_count):
-                    print(f"教室 {room_id} 容量不足: {room_capacity} < {students_count}")
-                    continue
-                    
-                # 检查该时间段是否已被占用
-                if any(key[0] == exam_date and key[1] == exam_time and key[2] == room_id 
-                      for key in scheduled_rooms.keys()):
-                    print(f"教室 {room_id} 在 {exam_date} {exam_time} 已被占用")
-                    continue
-                    
-                suitable_rooms.append(room)
-
-            if suitable_rooms:
-                # 优先选择容量最接近的教室
-                suitable_rooms.sort(key=lambda x: int(x[2]) - int(students_count))
-                selected_room = suitable_rooms[0]
-                print(f"为考试人数 {students_count} 选择教室: {selected_room[1]}(容量:{selected_room[2]})")
-                return selected_room
-            
-            return None
+            room_index = rooms if isinstance(rooms, RoomIndex) else RoomIndex(rooms)
+            occupied = room_index.mask_of(
+                key[2] for key in scheduled_rooms if key[0] == exam_date and key[1] == exam_time
+            )
+            return room_index.select(int(students_count), occupied)
         except Exception as e:
             print(f"选择教室出错: {e}")
             return None
@@ -499,8 +661,9 @@ class ExamScheduler:
             # 构建完整的更新语句
             query = f"UPDATE exam_arrangements SET {', '.join(update_parts)} WHERE arrangement_id = ?"
             
-            # 执行更新
+            # 执行更新，并标记为手动调整，增量排考时保留
             self.cursor.execute(query, params)
+            self.cursor.execute(MARK_MANUAL_SQL, (arrangement_id,))
             self.conn.commit()
             
             print(f"成功调整考试安排 {arrangement_id}")
@@ -516,6 +679,7 @@ class ExamScheduler:
             return False
 
     def close(self):
+        self.db_manager.close()
         self.conn.close()
 
     def export_exam_arrangements(self):
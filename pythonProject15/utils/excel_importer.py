@@ -1,10 +1,22 @@
 import pandas as pd
 import sqlite3
+from utils.room_availability import normalize_room_availability
 
 class ExcelImporter:
     def __init__(self, db_path='exam_system.db'):
         self.db_path = db_path
 
+    @staticmethod
+    def _exam_minutes(value):
+        """
+        可选的考试时长列（分钟），为空或无法解析时返回 None，排考时按时段推算
+        """
+        try:
+            minutes = int(float(value))
+        except (TypeError, ValueError):
+            return None
+        return minutes if minutes > 0 else None
+
     def import_courses(self, excel_path):
         """
         导入课程数据，过滤掉课程名称为空的记录
@@ -41,8 +53,9 @@ class ExcelImporter:
                         学院班级,
                         考试人数,
                         考试地点,
-                        教师
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        教师,
+                        考试时长
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                     ''', (
                         str(row['教室号']),
                         str(row['课程名称']),
@@ -54,7 +67,8 @@ class ExcelImporter:
                         str(row['学院班级']),
                         int(row['考试人数']) if pd.notna(row['考试人数']) else 0,
                         str(row['考试地点']) if pd.notna(row['考试地点']) else '',
-                        str(row['教师']) if pd.notna(row['教师']) else ''
+                        str(row['教师']) if pd.notna(row['教师']) else '',
+                        self._exam_minutes(row.get('考试时长'))
                     ))
                 except sqlite3.IntegrityError as e:
                     print(f"跳过重复记录: 课程={row['课程名称']}, 时段={row['时段']}, 日期={row['日期']}")
@@ -72,6 +86,43 @@ class ExcelImporter:
             if conn:
                 conn.close()
 
+    def import_enrolments(self, excel_path):
+        """
+        导入学生选课数据（学号、课程名称、学院班级），替换原有选课记录
+        学院班级为开课班级，重修或选修其他班级课程的学生按实际参加考试的课程填写
+        """
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            # 读取Excel文件，学号按文字读取，避免丢失前导零
+            df = pd.read_excel(excel_path, dtype={'学号': str})
+            df = df.dropna(subset=['学号', '课程名称', '学院班级'])
+
+            # 删除原有数据
+            cursor.execute('DELETE FROM student_enrolments')
+
+            rows = [
+                (str(row['学号']).strip(), str(row['课程名称']).strip(), str(row['学院班级']).strip())
+                for _, row in df.iterrows()
+            ]
+            cursor.executemany('''
+            INSERT OR IGNORE INTO student_enrolments (学号, 课程名称, 学院班级) VALUES (?, ?, ?)
+            ''', rows)
+
+            conn.commit()
+            print(f"成功导入 {len(rows)} 条选课记录")
+            return True
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            print(f"导入选课数据出错: {e}")
+            return False
+        finally:
+            if conn:
+                conn.close()
+
     def import_labs(self, excel_path):
         """
         导入教室数据
@@ -90,8 +141,13 @@ class ExcelImporter:
             # 删除原有数据
             cursor.execute('DELETE FROM exam_rooms')
             
-            # 直接使用原始列名插入数据
+            # 直接使用原始列名插入数据，可用日期、可用时间规范化后保存，排考时按时间段网格编译为位图
             for _, row in df.iterrows():
+                available_days, available_times, invalid = normalize_room_availability(
+                    row.get('可用日期'), row.get('可用时间')
+                )
+                if invalid:
+                    print(f"教室 {row['教室编号']} 的可用日期/时间无法解析，已忽略: {', '.join(invalid)}")
                 cursor.execute('''
                 INSERT INTO exam_rooms (
                     教室编号, 
@@ -108,8 +164,8 @@ class ExcelImporter:
                     row['教室容量'],
                     row['教学楼'],
                     row['楼层'],
-                    row['可用日期'],
-                    row['可用时间']
+                    available_days,
+                    available_times
                 ))
             
             conn.commit()
@@ -0,0 +1,205 @@
+import time
+from utils.placement import sequential_plans, teacher_preferred_rooms
+from utils.room_availability import RoomAvailability
+from utils.room_index import RoomIndex
+from utils.time_slots import popcount
+
+
+class FeasibilityChecker:
+    """
+    排考前的可行性预检查
+    只做计数和位图运算，不尝试排考，用于在正式排考前提示考试窗口、教室或教师时间明显不足的情况。
+    检查项目：
+      - 座位总量：各教室容量 × 开放时间段数 与考试总人数
+      - 教室场次：各教室开放时间段数之和 与所需教室场次
+      - 教师：每位教师在窗口内可用的考试场数（受每日上限和约束位图限制）与所需场数
+      - 班级：每个班级的考试数与时间段数
+      - 超过最大教室容量的课程
+    同时给出完成排考所需考试天数的下界
+    """
+
+    def __init__(self, snapshot, exam_dates, time_slots, constraint_store, check_class=False,
+                 split_mode='sequential'):
+        """
+        :param snapshot: load_schedule_snapshot 返回的数据
+        :param constraint_store: 当前考试窗口的 TeacherConstraintStore
+        :param check_class: 是否强制避免同一班级同时考试（'dsatur' 模式）
+        :param split_mode: 分场方式，'sequential' 或 'concurrent'
+        """
+        self.courses = snapshot['courses']
+        self.rooms = snapshot['rooms']
+        self.exam_dates = list(exam_dates)
+        self.time_slots = list(time_slots)
+        self.constraint_store = constraint_store
+        self.check_class = check_class
+        self.split_mode = split_mode
+
+    def check(self):
+        """
+        :return: 报告字典 {'ok', 'errors', 'warnings', 'lower_bounds', 'stats', 'seconds'}，
+                 errors 中的问题会导致课程必然排考失败，warnings 中的问题可能导致失败或冲突
+        """
+        start_time = time.perf_counter()
+        n_days = len(self.exam_dates)
+        n_slots = len(self.time_slots)
+        n_cells = n_days * n_slots
+        capacities = {room[0]: int(room[2]) for room in self.rooms}
+        max_capacity = max(capacities.values(), default=0)
+        total_capacity = sum(capacities.values())
+
+        errors = []
+        warnings = []
+
+        # 每门课程的考试人数和所需考试场数（教师、班级各占用的时间段数）
+        # 依次分场与贪心排考相同，按教师常用教室的顺序尝试，场数取各常用教室中最少的
+        teacher_preferred = teacher_preferred_rooms(self.courses)
+        total_students = 0
+        room_slots_needed = 0
+        teacher_exams = {}
+        class_exams = {}
+        oversized = []
+        for course in self.courses:
+            students_count = max(10, course[9] or 0)
+            total_students += students_count
+            exams = 1
+            if students_count > max_capacity:
+                plans = sequential_plans(teacher_preferred[course[11]], capacities, students_count)
+                oversized.append((course, plans))
+                if self.split_mode == 'sequential' and plans:
+                    # 在常用教室按多个时间段依次考试
+                    exams = min(sessions for _, sessions in plans)
+                    room_slots_needed += exams
+                else:
+                    room_slots_needed += -(-students_count // max_capacity) if max_capacity else 1
+            else:
+                room_slots_needed += 1
+            teacher_exams[course[11]] = teacher_exams.get(course[11], 0) + exams
+            class_exams[course[8]] = class_exams.get(course[8], 0) + exams
+
+        # 超过最大教室容量的课程
+        for course, plans in oversized:
+            students_count = max(10, course[9] or 0)
+            if self.split_mode == 'concurrent':
+                if students_count > total_capacity:
+                    errors.append(self._issue('oversized', f"{course[2]}（{course[8]}）{students_count} 人，"
+                                                           f"超过全部教室总容量 {total_capacity}", course=course))
+                else:
+                    warnings.append(self._issue('oversized', f"{course[2]}（{course[8]}）{students_count} 人，"
+                                                             f"超过最大教室容量 {max_capacity}，将在多间教室同时考试",
+                                                course=course))
+            elif not plans:
+                errors.append(self._issue('oversized', f"{course[2]}（{course[8]}）{students_count} 人，"
+                                                       f"超过最大教室容量 {max_capacity}，且教师 {course[11]} 的常用教室"
+                                                       f"均不在考场列表中，无法分场", course=course))
+            else:
+                warnings.append(self._issue('oversized', f"{course[2]}（{course[8]}）{students_count} 人，"
+                                                         f"超过最大教室容量 {max_capacity}，将在常用教室 {plans[0][0]} "
+                                                         f"分 {plans[0][1]} 个时间段考试", course=course))
+
+        # 座位总量与教室场次，只计教室开放的时间段
+        availability = RoomAvailability(self.rooms, RoomIndex(self.rooms), self.exam_dates, self.time_slots)
+        seat_slots = 0
+        room_slots = 0
+        closed_rooms = 0
+        for room_id, capacity in capacities.items():
+            open_slots = availability.open_slot_count(room_id)
+            seat_slots += capacity * open_slots
+            room_slots += open_slots
+            if not open_slots:
+                closed_rooms += 1
+        if closed_rooms:
+            warnings.append(self._issue('rooms', f"{closed_rooms} 间教室在考试窗口内没有开放的时间段"))
+        if total_students > seat_slots:
+            errors.append(self._issue('seats', f"考试总人数 {total_students} 超过座位总量 {seat_slots}"
+                                               f"（{len(self.rooms)} 间教室在 {n_cells} 个时间段内的开放座位）"))
+        if room_slots_needed > room_slots:
+            errors.append(self._issue('rooms', f"至少需要 {room_slots_needed} 个教室场次，"
+                                               f"只有 {room_slots}（{len(self.rooms)} 间教室在 {n_cells} 个时间段内开放的场次）"))
+
+        # 教师可用考试场数
+        teacher_days_needed = 0
+        for teacher, exams in teacher_exams.items():
+            limit = self.constraint_store.limit(teacher)
+            available = 0
+            for mask in self.constraint_store.available_masks(teacher):
+                available += min(limit, popcount(mask))
+            if exams > available:
+                errors.append(self._issue('teacher', f"教师 {teacher} 需要 {exams} 场考试，"
+                                                     f"考试窗口内最多可安排 {available} 场", teacher=teacher))
+            if limit > 0:
+                teacher_days_needed = max(teacher_days_needed, -(-exams // min(limit, n_slots or 1)))
+
+        # 班级考试数
+        class_days_needed = 0
+        for class_name, exams in class_exams.items():
+            if n_slots:
+                class_days_needed = max(class_days_needed, -(-exams // n_slots))
+            if exams > n_cells:
+                issue = self._issue('class', f"班级 {class_name} 有 {exams} 场考试，"
+                                             f"只有 {n_cells} 个时间段", class_name=class_name)
+                (errors if self.check_class else warnings).append(issue)
+
+        # 考试天数下界
+        cells_per_day = max(1, n_slots)
+        lower_bounds = {
+            'seats': -(-total_students // (total_capacity * cells_per_day)) if total_capacity else None,
+            'rooms': -(-room_slots_needed // (len(self.rooms) * cells_per_day)) if self.rooms else None,
+            'teacher': teacher_days_needed,
+            'class': class_days_needed
+        }
+        known_bounds = [bound for bound in lower_bounds.values() if bound is not None]
+        lower_bounds['days'] = max(known_bounds) if known_bounds else 0
+        if lower_bounds['days'] > n_days:
+            warnings.append(self._issue('days', f"按当前每日 {n_slots} 场，至少需要 {lower_bounds['days']} 天，"
+                                                f"考试窗口只有 {n_days} 天"))
+
+        report = {
+            'ok': not errors,
+            'errors': errors,
+            'warnings': warnings,
+            'lower_bounds': lower_bounds,
+            'stats': {
+                'courses': len(self.courses),
+                'rooms': len(self.rooms),
+                'days': n_days,
+                'slots_per_day': n_slots,
+                'total_students': total_students,
+                'seat_slots': seat_slots,
+                'room_slots_needed': room_slots_needed,
+                'room_slots': room_slots
+            },
+            'seconds': time.perf_counter() - start_time
+        }
+        return report
+
+    @staticmethod
+    def _issue(kind, message, course=None, teacher=None, class_name=None):
+        issue = {'kind': kind, 'message': message}
+        if course is not None:
+            issue['course_id'] = course[0]
+        if teacher is not None:
+            issue['teacher'] = teacher
+        if class_name is not None:
+            issue['class_name'] = class_name
+        return issue
+
+
+def format_feasibility_report(report, limit=10):
+    """
+    将预检查报告格式化为提示文本
+
+    :param limit: 错误和警告各最多显示的条数
+    """
+    stats = report['stats']
+    text = f"课程 {stats['courses']} 门，教室 {stats['rooms']} 间，" \
+           f"考试窗口 {stats['days']} 天 × 每日 {stats['slots_per_day']} 场\n"
+    text += f"至少需要考试天数: {report['lower_bounds']['days']}\n"
+    for title, issues in (('问题', report['errors']), ('提示', report['warnings'])):
+        if not issues:
+            continue
+        text += f"\n{title}（{len(issues)} 项）:\n"
+        for i, issue in enumerate(issues[:limit], 1):
+            text += f"{i}. {issue['message']}\n"
+        if len(issues) > limit:
+            text += f"... 还有 {len(issues) - limit} 项\n"
+    return text
@@ -0,0 +1,202 @@
+import heapq
+from utils.room_index import BestFitStrategy
+from utils.time_slots import popcount
+
+
+class ConflictGraph:
+    """
+    课程冲突图
+    共享学院班级或教师的课程之间有边，不能安排在同一时间段。
+    边以分组（团）的形式存储：同一班级、同一教师的课程各为一组，避免显式保存 O(n^2) 条边；
+    有共同考生的课程（共同选课矩阵）另外按邻接表保存
+    """
+
+    def __init__(self, courses, enrolment=None):
+        """
+        :param courses: 课程列表，字段顺序与 courses 表查询一致
+        :param enrolment: 可选的 CoEnrolmentMatrix
+        """
+        self.courses = list(courses)
+        self.groups = []
+        # 每门课程所属的分组编号
+        self.vertex_groups = [[] for _ in self.courses]
+        # 每门课程在本批课程中有共同考生的课程
+        self.student_neighbours = [()] * len(self.courses)
+        if enrolment is not None:
+            vertex_of = {enrolment.position.get(course[0]): v for v, course in enumerate(self.courses)}
+            vertex_of.pop(None, None)
+            for v, course in enumerate(self.courses):
+                neighbours = [vertex_of[i] for i in enrolment.neighbours(course[0]).tolist() if i in vertex_of]
+                if neighbours:
+                    self.student_neighbours[v] = neighbours
+
+        for column in (8, 11):  # 学院班级, 教师
+            members = {}
+            for v, course in enumerate(self.courses):
+                key = course[column]
+                if key:
+                    members.setdefault(key, []).append(v)
+            for group in members.values():
+                if len(group) > 1:
+                    group_id = len(self.groups)
+                    self.groups.append(group)
+                    for v in group:
+                        self.vertex_groups[v].append(group_id)
+
+        self.degrees = [self._count_neighbours(v) for v in range(len(self.courses))]
+
+    def _count_neighbours(self, v):
+        groups = self.vertex_groups[v]
+        if len(groups) == 1 and not self.student_neighbours[v]:
+            return len(self.groups[groups[0]]) - 1
+        neighbours = set(self.student_neighbours[v])
+        for group_id in groups:
+            neighbours.update(self.groups[group_id])
+        neighbours.discard(v)
+        return len(neighbours)
+
+    def neighbours(self, v):
+        """
+        遍历相邻课程（同时共享班级和教师的课程可能出现两次）
+        """
+        for group_id in self.vertex_groups[v]:
+            for u in self.groups[group_id]:
+                if u != v:
+                    yield u
+        yield from self.student_neighbours[v]
+
+
+class DSaturScheduler:
+    """
+    基于 DSatur 图着色的排考
+    颜色为考试网格中的开始 (日期, 时间段)，长考试占用其时间内的全部时间段，
+    每次选择饱和度（相邻课程已占用的不同时间段数）最高的课程，
+    度数大的优先，用内存中的邻接位图检查冲突，保证同一班级、同一教师（以及有共同考生的课程）不会同时考试
+    """
+
+    def __init__(self, engine, room_strategy=None, progress=None, spread=None):
+        """
+        :param engine: OccupancyEngine
+        :param room_strategy: 教室选择策略，默认最佳适配
+        :param progress: ProgressReporter，每安排一门课程报告一次进度（失败的课程由重试阶段报告）
+        :param spread: SpreadingObjective，指定后在可用的颜色中选择班级分散度惩罚最小的
+        """
+        self.engine = engine
+        self.room_strategy = room_strategy or BestFitStrategy()
+        self.progress = progress
+        self.spread = spread
+        self.n_slots = engine.n_slots
+
+    def _cell_mask(self, day_masks):
+        """
+        将每日位图拼接为整个考试网格上的位图
+        """
+        mask = 0
+        for day, day_mask in enumerate(day_masks):
+            mask |= day_mask << (day * self.n_slots)
+        return mask
+
+    def schedule(self, courses):
+        """
+        :param courses: 待安排的课程列表
+        :return: (assignments, failed)，assignments 为 [(course, room_id, day, slot)]，failed 为课程列表
+        """
+        engine = self.engine
+        graph = ConflictGraph(courses, engine.enrolment)
+        n = len(graph.courses)
+
+        # 每门课程已被相邻课程（或已有安排）占用的时间段位图
+        blocked = []
+        for course in graph.courses:
+            mask = 0
+            if course[8] in engine.class_busy:
+                mask |= self._cell_mask(engine.class_busy[course[8]])
+            if course[11] in engine.teacher_busy:
+                mask |= self._cell_mask(engine.teacher_busy[course[11]])
+            student_masks = engine.student_busy_days(course[0])
+            if student_masks is not None:
+                mask |= self._cell_mask(student_masks.tolist())
+            blocked.append(mask)
+
+        heap = [(-popcount(blocked[v]), -graph.degrees[v], v) for v in range(n)]
+        heapq.heapify(heap)
+        done = [False] * n
+        assignments = []
+        failed = []
+
+        while heap:
+            neg_saturation, _, v = heapq.heappop(heap)
+            if done[v] or -neg_saturation != popcount(blocked[v]):
+                continue  # 已处理或饱和度已过期
+            done[v] = True
+            course = graph.courses[v]
+
+            result = self._assign(course, blocked[v])
+            if result is None:
+                failed.append(course)
+                continue
+
+            room_id, day, slot = result
+            duration = engine.course_duration(course)
+            engine.place(course[11], course[8], [room_id], day, slot, duration, course[0])
+            assignments.append((course, room_id, day, slot))
+            if self.progress is not None:
+                self.progress.update(teacher=course[11])
+
+            bit = engine.span(slot, duration) << (day * self.n_slots)
+            for u in graph.neighbours(v):
+                if not done[u] and blocked[u] & bit != bit:
+                    blocked[u] |= bit
+                    heapq.heappush(heap, (-popcount(blocked[u]), -graph.degrees[u], u))
+
+        return assignments, failed
+
+    def _assign(self, course, blocked):
+        """
+        按网格顺序为课程寻找第一个考试期间未被相邻课程占用、教师可用且有教室的开始时间段，
+        启用分散度时为其中分散度惩罚最小的第一个
+        """
+        engine = self.engine
+        teacher = course[11]
+        duration = engine.course_duration(course)
+        students_count = max(10, course[9])
+        preferred_room = engine.room_dict.get(course[1])
+        # 常用教室不可用或容量不足时，就近使用同一楼层、同一教学楼的教室
+        building, floor = engine.room_index.location(course[1])
+        if preferred_room is not None and int(preferred_room[2]) < students_count:
+            preferred_room = None
+        if students_count > engine.room_index.max_capacity:
+            return None  # 没有足够大的教室
+
+        best = None
+        for day in range(engine.n_days):
+            if not engine.teacher_day_open(teacher, day):
+                continue
+            free_slots = engine.teacher_free_slots(teacher, day) & ~(blocked >> (day * self.n_slots))
+            free_slots &= engine.full_day_mask
+            candidates = free_slots
+            while candidates:
+                slot = (candidates & -candidates).bit_length() - 1
+                candidates &= candidates - 1
+                span = engine.span(slot, duration)
+                if not span or free_slots & span != span:
+                    continue
+                cost = self.spread.cost(course[8], day, slot, duration) if self.spread is not None else 0
+                if best is not None and cost >= best[0]:
+                    continue
+                room_id = None
+                if preferred_room is not None and engine.room_free(preferred_room[0], day, slot, duration):
+                    room_id = preferred_room[0]
+                else:
+                    room = engine.room_index.select_near(
+                        students_count, engine.occupied_rooms(day, slot, duration), self.room_strategy,
+                        building, floor
+                    )
+                    if room is not None:
+                        room_id = room[0]
+                if room_id is None:
+                    continue
+                if cost == 0:
+                    return room_id, day, slot
+                best = (cost, room_id, day, slot)
+        return best[1:] if best is not None else None
@@ -0,0 +1,148 @@
+import hashlib
+from utils.time_slots import TimeSlotGrid, exam_duration
+
+
+def course_digest(course):
+    """
+    课程内容指纹（不含课程 id），重新导入后内容未变化的课程指纹相同
+    """
+    return hashlib.sha1('\x1f'.join(str(value) for value in course[1:]).encode('utf-8')).hexdigest()
+
+
+def room_digest(room):
+    """
+    教室内容指纹
+    """
+    return hashlib.sha1('\x1f'.join(str(value) for value in room).encode('utf-8')).hexdigest()
+
+
+class IncrementalPlanner:
+    """
+    增量排考
+    将当前课程、教室与上次排考时记录的指纹对比：
+    内容未变化且仍然有效的自动安排、以及手动调整过的安排保留不动，
+    其余安排删除，只有新增或失效的课程需要重新安排
+    """
+
+    def __init__(self, cursor, snapshot, exam_dates, time_slots, constraint_store):
+        """
+        :param cursor: 数据库游标，删除和更新在调用方的事务中进行
+        :param snapshot: load_schedule_snapshot 返回的数据
+        :param constraint_store: 当前考试窗口的 TeacherConstraintStore
+        """
+        self.cursor = cursor
+        self.snapshot = snapshot
+        self.date_index = {date: i for i, date in enumerate(exam_dates)}
+        self.slot_grid = TimeSlotGrid.of(time_slots)
+        self.constraint_store = constraint_store
+        self.last_stats = None
+        # prepare 的结果：{arrangement_id: 新课程 id}、失效的 arrangement_id 集合
+        self.remapped = {}
+        self.removed = set()
+
+    def prepare(self, apply=True):
+        """
+        删除失效的安排，并把重新导入后课程 id 变化的安排指向新的课程 id
+
+        :param apply: 为 False 时只计算结果、不修改数据库（试排时用 apply_to_snapshot 在内存中应用）
+        :return: 保留了考试安排的课程 id 集合
+        """
+        courses = {str(course[0]): course for course in self.snapshot['courses']}
+        self._courses = courses
+        course_keys = {course_id: course_digest(course) for course_id, course in courses.items()}
+        room_keys = {room[0]: room_digest(room) for room in self.snapshot['rooms']}
+
+        # 内容相同但 id 已变化的课程，按指纹查找
+        unclaimed = {}
+        for course_id, key in course_keys.items():
+            unclaimed.setdefault(key, []).append(course_id)
+
+        self.cursor.execute('''
+            SELECT ea.arrangement_id, ea.教室号, ea.教室编号, ea.考试日期, ea.考试时间,
+                   m.course_key, m.room_key, m.source
+            FROM exam_arrangements ea
+            LEFT JOIN exam_arrangement_meta m ON ea.arrangement_id = m.arrangement_id
+        ''')
+        groups = {}
+        for row in self.cursor.fetchall():
+            groups.setdefault(str(row[1]), []).append(row)
+
+        kept = set()
+        pending = []
+        # 第一轮：课程 id 未变化
+        for course_id, rows in groups.items():
+            manual = any(row[7] == 'manual' for row in rows)
+            course = courses.get(course_id)
+            if course is not None and (manual or (rows[0][5] == course_keys[course_id]
+                                                  and self._rows_valid(rows, course, room_keys))):
+                kept.add(course_id)
+                unclaimed[course_keys[course_id]].remove(course_id)
+            else:
+                pending.append((course_id, rows, manual))
+
+        # 第二轮：课程重新导入后 id 变化，按指纹映射到新的课程 id
+        remapped = []
+        removed = []
+        for course_id, rows, manual in pending:
+            candidates = unclaimed.get(rows[0][5]) if rows[0][5] else None
+            new_id = candidates[0] if candidates else None
+            if new_id is not None and new_id not in kept and (
+                    manual or self._rows_valid(rows, courses[new_id], room_keys)):
+                candidates.pop(0)
+                kept.add(new_id)
+                remapped.extend((new_id, row[0]) for row in rows)
+            else:
+                removed.extend((row[0],) for row in rows)
+
+        self.remapped = {arrangement_id: new_id for new_id, arrangement_id in remapped}
+        self.removed = {arrangement_id for arrangement_id, in removed}
+        if apply:
+            if remapped:
+                self.cursor.executemany('UPDATE exam_arrangements SET 教室号 = ? WHERE arrangement_id = ?', remapped)
+            if removed:
+                self.cursor.executemany('DELETE FROM exam_arrangements WHERE arrangement_id = ?', removed)
+            self.cursor.execute('''
+                DELETE FROM exam_arrangement_meta
+                WHERE arrangement_id NOT IN (SELECT arrangement_id FROM exam_arrangements)
+            ''')
+
+        self.last_stats = {'kept_courses': len(kept), 'remapped_rows': len(remapped), 'removed_rows': len(removed)}
+        print(f"增量排考: 保留 {len(kept)} 门课程的安排, 更新课程编号 {len(remapped)} 条, 删除失效安排 {len(removed)} 条")
+        return kept
+
+    def apply_to_snapshot(self, snapshot):
+        """
+        在内存中应用 prepare(apply=False) 的结果，返回已有安排调整后的 snapshot
+        """
+        arrangements = []
+        for row in snapshot['arrangements']:
+            if row[0] in self.removed:
+                continue
+            if row[0] in self.remapped:
+                # 原课程已删除，教师从映射到的新课程读取
+                course = self._courses[self.remapped[row[0]]]
+                row = (row[0], self.remapped[row[0]]) + tuple(row[2:7]) + (course[11],)
+            arrangements.append(row)
+        return dict(snapshot, arrangements=arrangements)
+
+    def _rows_valid(self, rows, course, room_keys):
+        """
+        自动安排仍然有效：教室未变化、时间在本次考试窗口内、考试时长未变化、教师约束仍允许
+        """
+        teacher_masks = self.constraint_store.available_masks(course[11])
+        duration = exam_duration(course[12] if len(course) > 12 else None, course[3])
+        for row in rows:
+            _, _, room_id, exam_date, exam_time, _, room_key, _ = row
+            if room_key is None or room_keys.get(room_id) != room_key:
+                return False
+            day = self.date_index.get(exam_date)
+            located = self.slot_grid.locate(exam_time)
+            if day is None or located is None:
+                return False
+            slot = located[0]
+            if exam_time != self.slot_grid.exam_time(slot, duration):
+                return False
+            span = self.slot_grid.span(slot, duration)
+            if not span or teacher_masks[day] & span != span:
+                return False
+        return True
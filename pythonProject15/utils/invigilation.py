@@ -0,0 +1,284 @@
+import heapq
+import time
+from utils.time_slots import TimeSlot, TimeSlotGrid, popcount
+
+
+INVIGILATOR_INSERT_SQL = 'INSERT OR IGNORE INTO exam_invigilators (arrangement_id, 监考教师) VALUES (?, ?)'
+
+
+def load_staff(cursor):
+    """
+    默认的监考教师名单：课程任课教师和设置了教师约束的教师
+    """
+    cursor.execute('''
+    SELECT 教师 FROM courses WHERE 教师 IS NOT NULL AND 教师 != ''
+    UNION
+    SELECT teacher_name FROM teacher_constraints
+    ''')
+    return sorted(row[0] for row in cursor.fetchall())
+
+
+def covering_time_slots(time_slots, exam_times):
+    """
+    在时间段网格中加入考试安排里与所有时间段都不重叠的考试时间（如按每日 4 场分配监考时，
+    每日 5 场排考留下的晚上考试），使这些考场也能分配监考
+
+    :param exam_times: 考试安排中的考试时间
+    :return: 按开始时间排列的时间段列表
+    """
+    grid = TimeSlotGrid.of(time_slots)
+    slots = list(grid.slots)
+    for exam_time in sorted(set(exam_times)):
+        slot = TimeSlot.parse(exam_time)
+        if slot is None or grid.mask_of(exam_time):
+            continue
+        if not any(slot.overlaps(other.start, other.end) for other in slots):
+            slots.append(slot)
+    if len(slots) == len(grid.slots):
+        return grid.labels
+    return [slot.label for slot in sorted(slots, key=lambda slot: slot.start)]
+
+
+class InvigilatorAssigner:
+    """
+    监考教师分配
+    在已有考试安排（exam_arrangements）上为每个考场分配监考教师，
+    使用与排考相同的教师约束位图（每日上限、不安排晚上/周末、不可用日期和时间），
+    任课教师在自己课程考试期间视为已占用，自己的考试计入每日场数。
+
+    按 (日期, 开始时间段) 分轮次依次分配：同一轮次的考场互相重叠，每位教师最多监考一场；
+    同一轮次考试时长不同的考场所需的时间段位图互相包含，按时长从长到短为考场匹配
+    当前监考场数最少的可用教师，这种嵌套结构下贪心匹配即为最大匹配。
+    全部分配后再把监考最多教师的场次移给少至少两场的空闲教师，使负担均衡
+    """
+
+    def __init__(self, snapshot, staff, exam_dates, time_slots, constraint_store,
+                 proctors_per_room=1, students_per_proctor=60):
+        """
+        :param snapshot: load_schedule_snapshot 返回的数据
+        :param staff: 可监考的教师名单
+        :param exam_dates: 考试日期列表，不在列表中的考试安排不分配监考
+        :param time_slots: 时间段字符串列表或 TimeSlotGrid
+        :param constraint_store: 考试窗口的 TeacherConstraintStore
+        :param proctors_per_room: 每个考场至少的监考人数
+        :param students_per_proctor: 每名监考教师负责的最多考生数，考生较多的考场相应增加监考人数
+        """
+        self.slot_grid = TimeSlotGrid.of(time_slots)
+        self.exam_dates = list(exam_dates)
+        self.date_index = {date: i for i, date in enumerate(self.exam_dates)}
+        self.constraint_store = constraint_store
+        self.proctors_per_room = proctors_per_room
+        self.students_per_proctor = students_per_proctor
+        self.staff = list(dict.fromkeys(staff))
+        self.last_stats = None
+
+        n_days = len(self.exam_dates)
+        self.staff_index = {name: i for i, name in enumerate(self.staff)}
+        # 每位教师每天已占用的时间段位图和当天的考试/监考场数
+        self.busy = [[0] * n_days for _ in self.staff]
+        self.day_counts = [[0] * n_days for _ in self.staff]
+        self.limits = [constraint_store.limit(name) for name in self.staff]
+        self.available = [constraint_store.available_masks(name) for name in self.staff]
+
+        self.sessions = []
+        # 日期或时间对应不到网格的考场无法分配监考，作为监考人数不足的考场报告
+        self.unmapped = []
+        own_exams = set()
+        for row in snapshot.get('arrangements', []):
+            arrangement_id, course_id, room_id, exam_date, exam_time, _, students_count, teacher = row
+            day = self.date_index.get(exam_date)
+            span = self.slot_grid.mask_of(exam_time)
+            if day is None or not span:
+                self.unmapped.append({
+                    'arrangement_id': arrangement_id,
+                    'room_id': room_id,
+                    'exam_date': exam_date,
+                    'exam_time': exam_time,
+                    'teacher': teacher,
+                    'required': self._required(students_count or 0)
+                })
+                continue
+            self.sessions.append({
+                'arrangement_id': arrangement_id,
+                'room_id': room_id,
+                'exam_date': exam_date,
+                'exam_time': exam_time,
+                'day': day,
+                'span': span,
+                'teacher': teacher,
+                'required': self._required(students_count or 0)
+            })
+            # 任课教师在自己课程的考试期间已占用，同时分场的多个考场按一场考试计数
+            s = self.staff_index.get(teacher)
+            if s is not None:
+                self.busy[s][day] |= span
+                if (course_id, day, exam_time) not in own_exams:
+                    own_exams.add((course_id, day, exam_time))
+                    self.day_counts[s][day] += 1
+
+        self.load = [0] * len(self.staff)
+        # 每位教师的监考场次（sessions 下标）
+        self.duties = [[] for _ in self.staff]
+        self.assigned = [[] for _ in self.sessions]
+
+    def _required(self, students_count):
+        if not self.students_per_proctor:
+            return self.proctors_per_room
+        return max(self.proctors_per_room, -(-students_count // self.students_per_proctor))
+
+    def _coverage(self, s, day, spans):
+        """
+        教师 s 能监考的最长考试在 spans（按时长从长到短排列）中的下标，不能监考时返回 None
+        """
+        if self.day_counts[s][day] >= self.limits[s]:
+            return None
+        free = self.available[s][day] & ~self.busy[s][day]
+        for level, span in enumerate(spans):
+            if free & span == span:
+                return level
+        return None
+
+    def _take(self, s, index):
+        session = self.sessions[index]
+        self.busy[s][session['day']] |= session['span']
+        self.day_counts[s][session['day']] += 1
+        self.load[s] += 1
+        self.duties[s].append(index)
+        self.assigned[index].append(s)
+
+    def _drop(self, s, index):
+        session = self.sessions[index]
+        self.busy[s][session['day']] &= ~session['span']
+        self.day_counts[s][session['day']] -= 1
+        self.load[s] -= 1
+        self.duties[s].remove(index)
+        self.assigned[index].remove(s)
+
+    def assign(self):
+        """
+        :return: (assignments, unfilled)，assignments 为 {arrangement_id: [监考教师]}，
+                 unfilled 为监考人数不足的考场列表 [(考试安排字典, 缺少人数)]
+        """
+        start_time = time.perf_counter()
+        rounds = {}
+        for index, session in enumerate(self.sessions):
+            start_slot = (session['span'] & -session['span']).bit_length() - 1
+            rounds.setdefault((session['day'], start_slot), []).append(index)
+
+        for day, start_slot in sorted(rounds):
+            self._assign_round(day, rounds[(day, start_slot)])
+        moves = self._rebalance()
+
+        assignments = {}
+        unfilled = []
+        for index, session in enumerate(self.sessions):
+            assignments[session['arrangement_id']] = [self.staff[s] for s in self.assigned[index]]
+            missing = session['required'] - len(self.assigned[index])
+            if missing > 0:
+                unfilled.append((session, missing))
+        for session in self.unmapped:
+            assignments[session['arrangement_id']] = []
+            unfilled.append((session, session['required']))
+
+        loads = [load for load in self.load if load]
+        self.last_stats = {
+            'sessions': len(self.sessions) + len(self.unmapped),
+            'duties': sum(self.load),
+            'unfilled': sum(missing for _, missing in unfilled),
+            'staff_used': len(loads),
+            'max_load': max(loads, default=0),
+            'min_load': min(self.load, default=0),
+            'moves': moves,
+            'seconds': time.perf_counter() - start_time
+        }
+        return assignments, unfilled
+
+    def _assign_round(self, day, indices):
+        """
+        为同一 (日期, 开始时间段) 的考场分配监考教师
+        """
+        spans = sorted({self.sessions[i]['span'] for i in indices}, key=lambda span: -popcount(span))
+        level_of = {span: level for level, span in enumerate(spans)}
+        seats = [[] for _ in spans]
+        for index in indices:
+            session = self.sessions[index]
+            seats[level_of[session['span']]].extend([index] * session['required'])
+
+        # 按能监考的最长考试分桶，处理较短的考试时较长一档的教师仍可用
+        buckets = [[] for _ in spans]
+        for s in range(len(self.staff)):
+            level = self._coverage(s, day, spans)
+            if level is not None:
+                buckets[level].append(s)
+
+        heap = []
+        for level, level_seats in enumerate(seats):
+            for s in buckets[level]:
+                heapq.heappush(heap, (self.load[s], s))
+            for index in level_seats:
+                if not heap:
+                    break
+                _, s = heapq.heappop(heap)
+                self._take(s, index)
+
+    def _can_take(self, s, index):
+        session = self.sessions[index]
+        day, span = session['day'], session['span']
+        if s in self.assigned[index] or self.day_counts[s][day] >= self.limits[s]:
+            return False
+        free = self.available[s][day] & ~self.busy[s][day]
+        return free & span == span
+
+    def _rebalance(self):
+        """
+        把监考较多教师的场次移给监考至少少两场且有空的教师，反复进行直到没有可移动的场次
+        教师按当前监考场数分桶，查找接收的教师时从场数最少的桶开始
+        """
+        buckets = {}
+        for s, load in enumerate(self.load):
+            buckets.setdefault(load, set()).add(s)
+
+        def move(s, index, to):
+            for t, step in ((s, -1), (to, 1)):
+                buckets[self.load[t]].discard(t)
+                buckets.setdefault(self.load[t] + step, set()).add(t)
+            self._drop(s, index)
+            self._take(to, index)
+
+        moves = 0
+        moved = True
+        while moved:
+            moved = False
+            for heavy in sorted(range(len(self.staff)), key=lambda s: -self.load[s]):
+                lightest = min(load for load, members in buckets.items() if members)
+                if self.load[heavy] < lightest + 2:
+                    break
+                for index in list(self.duties[heavy]):
+                    if self.load[heavy] < lightest + 2:
+                        break
+                    receiver = None
+                    for load in range(lightest, self.load[heavy] - 1):
+                        receiver = next((s for s in buckets.get(load, ()) if self._can_take(s, index)), None)
+                        if receiver is not None:
+                            break
+                    if receiver is not None:
+                        move(heavy, index, receiver)
+                        moves += 1
+                        moved = True
+                        lightest = min(load for load, members in buckets.items() if members)
+        return moves
+
+
+def format_invigilation_report(stats, unfilled, limit=10):
+    """
+    生成监考分配结果说明
+    """
+    report = (f"共 {stats['sessions']} 个考场，安排监考 {stats['duties']} 人次，"
+              f"参与监考教师 {stats['staff_used']} 人，每人监考 {stats['min_load']}-{stats['max_load']} 场")
+    if unfilled:
+        report += f"\n\n监考人数不足的考场 {len(unfilled)} 个（缺少 {stats['unfilled']} 人次）:\n"
+        for i, (session, missing) in enumerate(unfilled[:limit], 1):
+            report += f"{i}. {session['exam_date']} {session['exam_time']} {session['room_id']} 缺少 {missing} 人\n"
+        if len(unfilled) > limit:
+            report += f"... 还有 {len(unfilled) - limit} 个考场\n"
+    return report
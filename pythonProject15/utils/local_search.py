@@ -0,0 +1,590 @@
+import math
+import random
+import time
+
+from utils.placement import CoursePlacer
+
+
+class LocalSearchOptimizer:
+    """
+    排考结果局部搜索优化（模拟退火）
+    以贪心/着色排考结果为初始解，在内存中的 OccupancyEngine 上反复尝试以下邻域操作，
+    在给定的时间预算内降低目标函数：
+      - 插入：把失败课程放入空闲教室；没有空闲教室时挤出同一时间段的一门课程，
+        并尝试把被挤出的课程换到其他时间段
+      - 移动：把一场考试移到另一个时间段
+      - 交换：交换两场考试的时间段和教室
+      - 换教室：同一时间段改用附近（同一楼层、同一教学楼优先）容量更贴合的教室
+      - 合并场次：把分场次的课程合并到一间大教室，释放教师的时间段
+    目标函数 = 失败课程数、班级连续考试数、班级同时考试数（未强制检查班级冲突时）、教室空余座位数的加权和，
+    指定 SpreadingObjective 时再加上班级考试分散度惩罚（按班级每日计数增量计算）
+    """
+
+    DEFAULT_WEIGHTS = {
+        'failed': 1000.0,
+        'back_to_back': 10.0,
+        'clash': 30.0,
+        'over_provision': 0.1,
+        'spread': 1.0
+    }
+
+    def __init__(self, engine, placer=None, check_class=False, weights=None, seed=None, progress=None,
+                 spread=None):
+        """
+        :param engine: 已登记初始排考结果的 OccupancyEngine
+        :param placer: 用于重新安排超大课程的 CoursePlacer，默认新建
+        :param check_class: 是否强制避免同一班级同时考试
+        :param weights: 目标函数权重，缺省项使用 DEFAULT_WEIGHTS
+        :param seed: 随机种子
+        :param progress: ProgressReporter，按百分比报告优化进度并检查是否取消
+        :param spread: SpreadingObjective，班级考试分散度目标，为空时不计入
+        """
+        self.engine = engine
+        self.placer = placer or CoursePlacer(engine)
+        self.check_class = check_class
+        self.weights = dict(self.DEFAULT_WEIGHTS, **(weights or {}))
+        self.rng = random.Random(seed)
+        self.progress = progress
+        self.spread = spread
+        self.capacities = {room[0]: int(room[2]) for room in engine.rooms}
+        self.course_by_id = {course[0]: course for course in engine.courses}
+        self.last_stats = None
+
+    # ------------------------------------------------------------------
+    # 目标函数
+    # ------------------------------------------------------------------
+    def evaluate(self, placements, failed_courses):
+        """
+        计算完整的目标函数
+
+        :return: {'failed', 'back_to_back', 'clash', 'over_provision', 'spread', 'total'}
+        """
+        back_to_back = 0
+        clash = 0
+        n_slots = self.engine.n_slots
+        for cells in self.engine.class_cells.values():
+            for day in range(self.engine.n_days):
+                day_b2b, day_clash = self._class_day_counts(cells, day * n_slots, n_slots)
+                back_to_back += day_b2b
+                clash += day_clash
+        over_provision = sum(self._waste(p['room_id'], p['students_count']) for p in placements)
+        result = {
+            'failed': len(failed_courses),
+            'back_to_back': back_to_back,
+            'clash': 0 if self.check_class else clash,
+            'over_provision': over_provision,
+            'spread': self.spread.evaluate()['total'] if self.spread is not None else 0.0
+        }
+        result['total'] = sum(self.weights[key] * value for key, value in result.items())
+        return result
+
+    @staticmethod
+    def _class_day_counts(cells, base, n_slots):
+        back_to_back = 0
+        clash = 0
+        previous = 0
+        for slot in range(n_slots):
+            count = cells[base + slot]
+            if count > 1:
+                clash += count - 1
+            if count and previous:
+                back_to_back += 1
+            previous = count
+        return back_to_back, clash
+
+    def _class_cost(self, keys):
+        """
+        若干 (班级, 日期) 的班级惩罚之和
+        """
+        engine = self.engine
+        n_slots = engine.n_slots
+        clash_weight = 0 if self.check_class else self.weights['clash']
+        cost = 0.0
+        for class_name, day in keys:
+            cells = engine.class_cells.get(class_name)
+            if not cells:
+                continue
+            back_to_back, clash = self._class_day_counts(cells, day * n_slots, n_slots)
+            cost += self.weights['back_to_back'] * back_to_back + clash_weight * clash
+        return cost
+
+    def _spread_cost(self, placement, day, slot):
+        """
+        已登记在 (day, slot) 的一场考试的分散度惩罚（撤销时目标值减少的量）
+        """
+        if self.spread is None:
+            return 0.0
+        return self.weights['spread'] * self.spread.cost(
+            placement['class_name'], day, slot, placement.get('duration'), placed=True)
+
+    def _waste(self, room_id, students_count):
+        return max(0, self.capacities.get(room_id, 0) - students_count)
+
+    # ------------------------------------------------------------------
+    # 搜索
+    # ------------------------------------------------------------------
+    def optimize(self, placements, failed_courses, time_budget=30.0, max_iterations=None):
+        """
+        在时间预算内优化排考结果，placements 中的记录会被原地修改
+
+        :param placements: 初始考试安排记录（已登记到 engine）
+        :param failed_courses: 初始失败课程
+        :param time_budget: 时间预算（秒），指定 max_iterations 时不使用
+        :param max_iterations: 最大迭代次数；指定后不受时间预算限制，温度按迭代进度下降，
+                               结果只取决于随机种子，可复现
+        :return: (placements, failed_courses)，目标值不高于初始解
+        """
+        start_time = time.perf_counter()
+        self._items = list(placements)
+        self._cell_items = {}
+        self._course_items = {}
+        for index, placement in enumerate(self._items):
+            self._cell_items.setdefault(self._cell(placement), set()).add(index)
+            self._course_items.setdefault(placement['course_id'], set()).add(index)
+        self._failed = {item['course_id']: item for item in failed_courses}
+
+        initial = self.evaluate(placements, failed_courses)
+        # 模拟退火会接受变差的操作，记录检查点上目标值最小的解，结束时不比它差
+        best_total = initial['total']
+        best = self._save()
+        t_start = self.weights['back_to_back']
+        t_end = t_start * 0.01
+        temperature = t_start
+        deadline = start_time + time_budget
+        iterations = 0
+        accepted = 0
+        rng = self.rng
+
+        while self._items or self._failed:
+            if max_iterations is not None and iterations >= max_iterations:
+                break
+            if iterations & 255 == 0:
+                if iterations:
+                    total = self._current_total()
+                    if total < best_total:
+                        best_total = total
+                        best = self._save()
+                if max_iterations is not None:
+                    progress = iterations / max_iterations
+                else:
+                    now = time.perf_counter()
+                    if now >= deadline:
+                        break
+                    progress = (now - start_time) / time_budget
+                temperature = t_start * (t_end / t_start) ** progress
+                if self.progress is not None:
+                    self.progress.update(done=int(progress * 100))
+            iterations += 1
+
+            r = rng.random()
+            if self._failed and r < 0.3:
+                moved = self._try_insert(temperature)
+            elif r < 0.65:
+                moved = self._try_move(temperature)
+            elif r < 0.85:
+                moved = self._try_swap(temperature)
+            elif r < 0.925:
+                moved = self._try_room(temperature)
+            else:
+                moved = self._try_merge(temperature)
+            if moved:
+                accepted += 1
+
+        final = self.evaluate(*self._current())
+        if final['total'] > best_total:
+            self._restore(best)
+            final = self.evaluate(*self._current())
+        placements, failed_courses = self._current()
+        self.last_stats = {
+            'iterations': iterations,
+            'accepted': accepted,
+            'seconds': time.perf_counter() - start_time,
+            'initial': initial,
+            'final': final
+        }
+        print(f"局部搜索优化: {iterations} 次迭代, 接受 {accepted} 次, "
+              f"失败课程 {initial['failed']} -> {final['failed']}, "
+              f"班级连续考试 {initial['back_to_back']} -> {final['back_to_back']}, "
+              f"目标值 {initial['total']:.1f} -> {final['total']:.1f}")
+        return placements, failed_courses
+
+    def _current(self):
+        return [item for item in self._items if item is not None], list(self._failed.values())
+
+    def _current_total(self):
+        return self.evaluate(*self._current())['total']
+
+    def _save(self):
+        """
+        复制当前解：(安排记录, 失败课程)
+        """
+        placements, failed_courses = self._current()
+        return [dict(item) for item in placements], failed_courses
+
+    def _registrations(self, placements):
+        """
+        按 (课程, 时间段) 合并安排记录，同时分场的多间教室作为一场考试登记
+        """
+        cells = {}
+        for item in placements:
+            key = (item['course_id'], item['day'], item['slot'])
+            if key not in cells:
+                cells[key] = (item, [])
+            cells[key][1].append(item['room_id'])
+        return cells.values()
+
+    def _restore(self, saved):
+        """
+        撤销当前解在 engine 上的登记，恢复 _save 保存的解
+        """
+        engine = self.engine
+        for item, room_ids in self._registrations(self._current()[0]):
+            engine.release(item['teacher'], item['class_name'], room_ids, item['day'], item['slot'],
+                           item.get('duration'), item['course_id'])
+        placements, failed_courses = saved
+        for item, room_ids in self._registrations(placements):
+            engine.place(item['teacher'], item['class_name'], room_ids, item['day'], item['slot'],
+                         item.get('duration'), item['course_id'])
+        self._items = [dict(item) for item in placements]
+        self._failed = {item['course_id']: item for item in failed_courses}
+
+    def _accept(self, delta, temperature):
+        return delta <= 0 or self.rng.random() < math.exp(-delta / temperature)
+
+    def _cell(self, placement):
+        return placement['day'] * self.engine.n_slots + placement['slot']
+
+    def _can_take(self, placement, day, slot):
+        engine = self.engine
+        duration = placement.get('duration')
+        if not engine.teacher_can_take(placement['teacher'], day, slot, duration):
+            return False
+        if self.check_class and not engine.class_free(placement['class_name'], day, slot, duration):
+            return False
+        return engine.students_free(placement['course_id'], day, slot, duration)
+
+    def _release(self, placement):
+        self.engine.release(placement['teacher'], placement['class_name'], [placement['room_id']],
+                            placement['day'], placement['slot'], placement.get('duration'), placement['course_id'])
+
+    def _place(self, placement):
+        self.engine.place(placement['teacher'], placement['class_name'], [placement['room_id']],
+                          placement['day'], placement['slot'], placement.get('duration'), placement['course_id'])
+
+    def _relocate(self, index, room_id, day, slot):
+        """
+        更新一条安排记录的教室和时间（engine 已登记新位置）
+        """
+        placement = self._items[index]
+        self._cell_items[self._cell(placement)].discard(index)
+        placement['room_id'] = room_id
+        placement['day'] = day
+        placement['slot'] = slot
+        placement['exam_date'] = self.engine.exam_dates[day]
+        placement['exam_time'] = self.engine.exam_time(slot, placement.get('duration'))
+        self._cell_items.setdefault(self._cell(placement), set()).add(index)
+
+    def _add(self, placement):
+        index = len(self._items)
+        self._items.append(placement)
+        self._cell_items.setdefault(self._cell(placement), set()).add(index)
+        self._course_items.setdefault(placement['course_id'], set()).add(index)
+
+    def _remove(self, index):
+        placement = self._items[index]
+        self._cell_items[self._cell(placement)].discard(index)
+        self._course_items[placement['course_id']].discard(index)
+        self._items[index] = None
+
+    def _random_index(self):
+        index = self.rng.randrange(len(self._items))
+        return index if self._items[index] is not None else None
+
+    def _try_move(self, temperature):
+        """
+        把一场考试移到随机的另一个时间段，原教室空闲时保留原教室，否则就近选择最贴合的教室
+        """
+        engine = self.engine
+        index = self._random_index()
+        if index is None:
+            return False
+        placement = self._items[index]
+        if placement['concurrent']:
+            return False  # 同时分场的多间教室只能整体合并，不单独移动
+        day = self.rng.randrange(engine.n_days)
+        slot = self.rng.randrange(engine.n_slots)
+        old_day, old_slot, old_room = placement['day'], placement['slot'], placement['room_id']
+        if (day, slot) == (old_day, old_slot):
+            return False
+
+        duration = placement.get('duration')
+        keys = {(placement['class_name'], old_day), (placement['class_name'], day)}
+        before = self._class_cost(keys) + self.weights['over_provision'] * self._waste(
+            old_room, placement['students_count']) + self._spread_cost(placement, old_day, old_slot)
+        self._release(placement)
+        room_id = None
+        if self._can_take(placement, day, slot):
+            if engine.room_free(old_room, day, slot, duration):
+                room_id = old_room
+            else:
+                room = engine.room_index.select_near(placement['students_count'],
+                                                     engine.occupied_rooms(day, slot, duration), None,
+                                                     *engine.room_index.location(old_room))
+                room_id = room[0] if room else None
+        if room_id is None:
+            self._place(placement)
+            return False
+
+        engine.place(placement['teacher'], placement['class_name'], [room_id], day, slot, duration,
+                     placement['course_id'])
+        after = self._class_cost(keys) + self.weights['over_provision'] * self._waste(
+            room_id, placement['students_count']) + self._spread_cost(placement, day, slot)
+        if self._accept(after - before, temperature):
+            self._relocate(index, room_id, day, slot)
+            return True
+        engine.release(placement['teacher'], placement['class_name'], [room_id], day, slot, duration,
+                       placement['course_id'])
+        self._place(placement)
+        return False
+
+    def _try_swap(self, temperature):
+        """
+        交换两场考试的时间段和教室
+        """
+        first_index = self._random_index()
+        second_index = self._random_index()
+        if first_index is None or second_index is None:
+            return False
+        first = self._items[first_index]
+        second = self._items[second_index]
+        if self._cell(first) == self._cell(second) or first['concurrent'] or second['concurrent']:
+            return False
+        if (self.capacities.get(second['room_id'], 0) < first['students_count']
+                or self.capacities.get(first['room_id'], 0) < second['students_count']):
+            return False
+
+        keys = {(first['class_name'], first['day']), (first['class_name'], second['day']),
+                (second['class_name'], first['day']), (second['class_name'], second['day'])}
+        waste_before = (self._waste(first['room_id'], first['students_count'])
+                        + self._waste(second['room_id'], second['students_count']))
+        waste_after = (self._waste(second['room_id'], first['students_count'])
+                       + self._waste(first['room_id'], second['students_count']))
+        before = self._class_cost(keys) + self.weights['over_provision'] * waste_before
+
+        engine = self.engine
+        first_duration, second_duration = first.get('duration'), second.get('duration')
+        # 依次撤销两场考试，分散度惩罚按撤销时的占用计算，两场之间的惩罚只计一次
+        before += self._spread_cost(first, first['day'], first['slot'])
+        self._release(first)
+        before += self._spread_cost(second, second['day'], second['slot'])
+        self._release(second)
+        # 考试时长不同时，教室在较长考试的全部时间段内都要空闲
+        if not (self._can_take(first, second['day'], second['slot'])
+                and self._can_take(second, first['day'], first['slot'])
+                and engine.room_free(second['room_id'], second['day'], second['slot'], first_duration)):
+            self._place(first)
+            self._place(second)
+            return False
+        # 先登记 first 的新位置，再检查 second（同一教师时每日上限要一并计算）
+        engine.place(first['teacher'], first['class_name'], [second['room_id']],
+                     second['day'], second['slot'], first_duration, first['course_id'])
+        spread_after = self._spread_cost(first, second['day'], second['slot'])
+        if not (self._can_take(second, first['day'], first['slot'])
+                and engine.room_free(first['room_id'], first['day'], first['slot'], second_duration)):
+            engine.release(first['teacher'], first['class_name'], [second['room_id']],
+                           second['day'], second['slot'], first_duration, first['course_id'])
+            self._place(first)
+            self._place(second)
+            return False
+        engine.place(second['teacher'], second['class_name'], [first['room_id']],
+                     first['day'], first['slot'], second_duration, second['course_id'])
+
+        after = (self._class_cost(keys) + self.weights['over_provision'] * waste_after + spread_after
+                 + self._spread_cost(second, first['day'], first['slot']))
+        if self._accept(after - before, temperature):
+            first_cell = (first['room_id'], first['day'], first['slot'])
+            self._relocate(first_index, second['room_id'], second['day'], second['slot'])
+            self._relocate(second_index, *first_cell)
+            return True
+        engine.release(first['teacher'], first['class_name'], [second['room_id']],
+                       second['day'], second['slot'], first_duration, first['course_id'])
+        engine.release(second['teacher'], second['class_name'], [first['room_id']],
+                       first['day'], first['slot'], second_duration, second['course_id'])
+        self._place(first)
+        self._place(second)
+        return False
+
+    def _try_room(self, temperature):
+        """
+        同一时间段就近换用容量更贴合的空闲教室，减少空余座位
+        """
+        engine = self.engine
+        index = self._random_index()
+        if index is None:
+            return False
+        placement = self._items[index]
+        day, slot, duration = placement['day'], placement['slot'], placement.get('duration')
+        room = engine.room_index.select_near(placement['students_count'], engine.occupied_rooms(day, slot, duration),
+                                             None, *engine.room_index.location(placement['room_id']))
+        if room is None:
+            return False
+        delta = self.weights['over_provision'] * (
+            self._waste(room[0], placement['students_count'])
+            - self._waste(placement['room_id'], placement['students_count']))
+        if not self._accept(delta, temperature):
+            return False
+        self._release(placement)
+        engine.place(placement['teacher'], placement['class_name'], [room[0]], day, slot, duration,
+                     placement['course_id'])
+        self._relocate(index, room[0], day, slot)
+        return True
+
+    def _try_merge(self, temperature):
+        """
+        把一门分场次考试的课程合并为一场，安排在能容纳全部学生的教室中
+        依次尝试原场次的时间段和一个随机时间段
+        """
+        engine = self.engine
+        index = self._random_index()
+        if index is None or self._items[index]['session'] is None:
+            return False
+        indices = list(self._course_items[self._items[index]['course_id']])
+        sessions = [self._items[i] for i in indices]
+        students_count = sum(item['students_count'] for item in sessions)
+        if students_count > engine.room_index.max_capacity:
+            return False
+
+        first = sessions[0]
+        duration = first.get('duration')
+        # 同一时间段的多间教室（同时分场）作为一场考试撤销和恢复
+        cell_rooms = {}
+        for item in sessions:
+            cell_rooms.setdefault((item['day'], item['slot']), []).append(item['room_id'])
+        cells = list(cell_rooms)
+        cells.append((self.rng.randrange(engine.n_days), self.rng.randrange(engine.n_slots)))
+        keys = {(first['class_name'], day) for day, _ in cells}
+        before = self._class_cost(keys) + self.weights['over_provision'] * sum(
+            self._waste(item['room_id'], item['students_count']) for item in sessions)
+
+        for (day, slot), room_ids in cell_rooms.items():
+            before += self._spread_cost(first, day, slot)
+            engine.release(first['teacher'], first['class_name'], room_ids, day, slot, duration, first['course_id'])
+        for day, slot in cells:
+            if not self._can_take(first, day, slot):
+                continue
+            room = engine.room_index.select_near(students_count, engine.occupied_rooms(day, slot, duration),
+                                                 None, *engine.room_index.location(first['room_id']))
+            if room is None:
+                continue
+            engine.place(first['teacher'], first['class_name'], [room[0]], day, slot, duration, first['course_id'])
+            after = (self._class_cost(keys) + self.weights['over_provision'] * self._waste(room[0], students_count)
+                     + self._spread_cost(first, day, slot))
+            if self._accept(after - before, temperature):
+                for i in indices:
+                    self._remove(i)
+                course = self.course_by_id[first['course_id']]
+                self._add(self.placer._make_placement(course, room[0], day, slot, students_count))
+                return True
+            engine.release(first['teacher'], first['class_name'], [room[0]], day, slot, duration, first['course_id'])
+            break
+        for (day, slot), room_ids in cell_rooms.items():
+            engine.place(first['teacher'], first['class_name'], room_ids, day, slot, duration, first['course_id'])
+        return False
+
+    def _try_insert(self, temperature):
+        """
+        安排一门失败课程：有空闲教室时直接安排；否则挤出同一时间段占用合适教室的一门课程，
+        并尝试把被挤出的课程换到其他有空闲教室的时间段
+        """
+        engine = self.engine
+        course_id = self.rng.choice(list(self._failed))
+        failure = self._failed[course_id]
+        course = self.course_by_id[course_id]
+        students_count = failure['students_count']
+
+        if students_count > engine.room_index.max_capacity:
+            # 超过最大教室容量的课程需要分场次，交给贪心算法按常用教室重新安排
+            placements, failed = self.placer.place_greedy([course], self.check_class)
+            if failed:
+                return False
+            del self._failed[course_id]
+            for placement in placements:
+                self._add(placement)
+            return True
+
+        day = self.rng.randrange(engine.n_days)
+        slot = self.rng.randrange(engine.n_slots)
+        duration = engine.course_duration(course)
+        probe = {'teacher': course[11], 'class_name': course[8], 'duration': duration, 'course_id': course_id}
+        if not self._can_take(probe, day, slot):
+            return False
+
+        room = engine.room_index.select_near(students_count, engine.occupied_rooms(day, slot, duration),
+                                             None, *engine.room_index.location(course[1]))
+        if room is not None:
+            del self._failed[course_id]
+            engine.place(course[11], course[8], [room[0]], day, slot, duration, course_id)
+            self._add(self.placer._make_placement(course, room[0], day, slot, students_count))
+            return True
+
+        # 挤出同一时间段的一门单场次课程
+        candidates = [
+            index for index in self._cell_items.get(day * engine.n_slots + slot, ())
+            if self._items[index]['session'] is None
+            and self.capacities.get(self._items[index]['room_id'], 0) >= students_count
+        ]
+        if not candidates:
+            return False
+        victim_index = self.rng.choice(candidates)
+        victim = self._items[victim_index]
+        room_id = victim['room_id']
+
+        keys = {(course[8], day), (victim['class_name'], day)}
+        before = self._class_cost(keys) + self.weights['over_provision'] * self._waste(
+            room_id, victim['students_count']) + self._spread_cost(victim, day, slot)
+        self._release(victim)
+        if not (self._can_take(probe, day, slot) and engine.room_free(room_id, day, slot, duration)):
+            self._place(victim)
+            return False
+        engine.place(course[11], course[8], [room_id], day, slot, duration, course_id)
+        after = self._class_cost(keys) + self.weights['over_provision'] * self._waste(room_id, students_count)
+        after += self._spread_cost(probe, day, slot)
+        if not self._accept(after - before, temperature):
+            engine.release(course[11], course[8], [room_id], day, slot, duration, course_id)
+            self._place(victim)
+            return False
+
+        del self._failed[course_id]
+        self._remove(victim_index)
+        self._add(self.placer._make_placement(course, room_id, day, slot, students_count))
+        if not self._reinsert(victim):
+            victim_course = self.course_by_id[victim['course_id']]
+            self._failed[victim['course_id']] = self.placer._make_failure(victim_course, victim['students_count'])
+        return True
+
+    def _reinsert(self, placement, attempts=8):
+        """
+        为被挤出的课程随机尝试若干个有空闲教室的时间段
+        """
+        engine = self.engine
+        for _ in range(attempts):
+            day = self.rng.randrange(engine.n_days)
+            slot = self.rng.randrange(engine.n_slots)
+            if not self._can_take(placement, day, slot):
+                continue
+            duration = placement.get('duration')
+            room = engine.room_index.select_near(placement['students_count'],
+                                                 engine.occupied_rooms(day, slot, duration), None,
+                                                 *engine.room_index.location(placement['room_id']))
+            if room is None:
+                continue
+            engine.place(placement['teacher'], placement['class_name'], [room[0]], day, slot, duration,
+                         placement['course_id'])
+            placement['room_id'] = room[0]
+            placement['day'] = day
+            placement['slot'] = slot
+            placement['exam_date'] = engine.exam_dates[day]
+            placement['exam_time'] = engine.exam_time(slot, duration)
+            self._add(placement)
+            return True
+        return False
@@ -0,0 +1,376 @@
+import numpy as np
+from utils.teacher_constraints import TeacherConstraintStore
+from utils.room_index import RoomIndex
+from utils.room_availability import RoomAvailability
+from utils.time_slots import TimeSlotGrid, exam_duration
+from utils.enrolment import CoEnrolmentMatrix, load_enrolments
+
+
+def load_schedule_snapshot(cursor):
+    """
+    一次性读取排考所需的全部数据
+
+    :param cursor: 数据库游标
+    :return: 包含 courses, rooms, constraints, arrangements 的字典
+    """
+    cursor.execute('''
+    SELECT
+        id, 教室号, 课程名称, 时段, 日期, 教师类型,
+        任课学院, 专业, 学院班级, 考试人数, 考试地点, 教师, 考试时长
+    FROM courses
+    ''')
+    courses = cursor.fetchall()
+
+    cursor.execute('SELECT 教室编号, 教室名称, 教室容量, 教学楼, 楼层, 可用日期, 可用时间 FROM exam_rooms')
+    rooms = cursor.fetchall()
+
+    cursor.execute('''
+    SELECT teacher_name, max_exams_per_day, no_evening_exams, no_weekend_exams,
+           unavailable_dates, unavailable_times
+    FROM teacher_constraints
+    ''')
+    constraints = cursor.fetchall()
+
+    cursor.execute('''
+    SELECT ea.arrangement_id, ea.教室号, ea.教室编号, ea.考试日期, ea.考试时间,
+           ea.学院班级, ea.考试人数, c.教师
+    FROM exam_arrangements ea
+    LEFT JOIN courses c ON ea.教室号 = c.id
+    ''')
+    arrangements = cursor.fetchall()
+
+    # 可选的学生选课记录，编译为课程共同选课矩阵（按全部课程编号，含增量排考保留的课程）
+    enrolment_rows = load_enrolments(cursor)
+    enrolment = CoEnrolmentMatrix.from_snapshot(courses, enrolment_rows) if enrolment_rows else None
+
+    return {
+        'courses': courses,
+        'rooms': rooms,
+        'constraints': constraints,
+        'arrangements': arrangements,
+        'enrolment': enrolment
+    }
+
+
+class OccupancyEngine:
+    """
+    排考占用引擎
+    一次性加载课程、教室、教师约束和已有考试安排，
+    用每日位图（每一位对应一个考试时间段）记录教室、教师、班级的占用，
+    考试按课程的考试时长占用从开始时间段起与之重叠的全部时间段，
+    排考循环中判断"能否安排"时不再访问数据库。
+    导入了学生选课记录时，还按课程记录每日占用位图，
+    有共同考生的课程不能安排在重叠的时间
+    """
+
+    def __init__(self, snapshot, exam_dates, time_slots, constraint_store=None):
+        """
+        :param snapshot: load_schedule_snapshot 返回的数据
+        :param exam_dates: 考试日期列表 (YYYY-MM-DD)
+        :param time_slots: 每日考试时间段列表 (HH:MM-HH:MM) 或 TimeSlotGrid
+        :param constraint_store: 已编译的 TeacherConstraintStore，为空时根据 snapshot 编译
+        """
+        self.exam_dates = list(exam_dates)
+        self.slot_grid = TimeSlotGrid.of(time_slots)
+        self.time_slots = list(self.slot_grid.labels)
+        self.n_days = len(self.exam_dates)
+        self.n_slots = len(self.time_slots)
+        self.date_index = {date: i for i, date in enumerate(self.exam_dates)}
+        self.slot_index = self.slot_grid.slot_index
+        self.full_day_mask = self.slot_grid.full_day_mask
+
+        self.courses = list(snapshot.get('courses', []))
+        self.rooms = list(snapshot.get('rooms', []))
+        self.room_dict = {room[0]: room for room in self.rooms}
+        self.room_index = RoomIndex(self.rooms)
+        # 教室开放时间位图，未开放的 (日期, 时间段) 视为已占用
+        self.room_availability = RoomAvailability(self.rooms, self.room_index, self.exam_dates, self.slot_grid)
+
+        # 占用位图，格式: {名称: [第0天位图, 第1天位图, ...]}
+        self.room_busy = {}
+        self.teacher_busy = {}
+        self.class_busy = {}
+        # 教师每天的考试场数（长考试占用多个时间段，不能用位图计数）
+        self.teacher_exams = {}
+        # 班级在每个 (日期, 时间段) 的考试场数，贪心模式允许同一班级同时考试，撤销时按计数清除位图
+        self.class_cells = {}
+        # 班级每天的考试场数、每个 (日期, 时间段) 开始和结束的考试场数，用于班级考试分散度的增量计算
+        self.class_exams = {}
+        self.class_starts = {}
+        self.class_ends = {}
+        # 每个 (日期, 时间段) 已占用教室位图，位序与 room_index 的容量排序一致
+        self.cell_rooms = [0] * (self.n_days * self.n_slots)
+
+        # 教师约束位图
+        if constraint_store is None:
+            constraint_store = TeacherConstraintStore(self.exam_dates, self.slot_grid)
+            constraint_store.build(snapshot.get('constraints', []))
+        self.constraint_store = constraint_store
+
+        # 学生选课冲突：课程 × 日期 的占用位图，按共同选课矩阵的行号存储
+        enrolment = snapshot.get('enrolment')
+        self.enrolment = enrolment if enrolment is not None and enrolment.nnz else None
+        if self.enrolment is not None:
+            self.course_masks = np.zeros((len(self.enrolment.course_ids), self.n_days), dtype=np.int64)
+            # 课程占用变化时递增，使缓存的相邻课程占用失效
+            self._course_version = 0
+            self._student_cache = {}
+        self._load_arrangements(snapshot.get('arrangements', []))
+
+    # ------------------------------------------------------------------
+    # 初始化
+    # ------------------------------------------------------------------
+    def _load_arrangements(self, arrangement_rows):
+        """
+        将数据库中已有的考试安排登记到占用位图
+        考试时间按实际起止时间登记，占用所有与之重叠的时间段（如手动调整为 09:00-11:00、180 分钟的考试）
+        """
+        # 同一课程在同一时间的多间教室（同时分场）作为一场考试登记
+        exams = {}
+        for row in arrangement_rows:
+            _, course_id, room_id, exam_date, exam_time, class_name, _, teacher = row
+            day = self.date_index.get(exam_date)
+            if day is None:
+                continue
+            exam = exams.setdefault((course_id, day, exam_time), (teacher, class_name, []))
+            exam[2].append(room_id)
+        for (course_id, day, exam_time), (teacher, class_name, room_ids) in exams.items():
+            span = self.slot_grid.mask_of(exam_time)
+            if span:
+                self._occupy(teacher, class_name, room_ids, day, span)
+                self._mark_course(course_id, day, span, True)
+
+    def _masks(self, table, key):
+        masks = table.get(key)
+        if masks is None:
+            masks = [0] * self.n_days
+            table[key] = masks
+        return masks
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def course_duration(self, course):
+        """
+        课程的考试时长（分钟），为 None 时占用一个完整时间段
+        """
+        return exam_duration(course[12] if len(course) > 12 else None, course[3])
+
+    def span(self, slot, duration=None):
+        """
+        从 slot 开始、持续 duration 分钟的考试占用的时间段位图，超出当天考试时间时为 0
+        """
+        if duration is None:
+            return 1 << slot
+        return self.slot_grid.span(slot, duration)
+
+    def exam_time(self, slot, duration=None):
+        return self.slot_grid.exam_time(slot, duration)
+
+    def teacher_limit(self, teacher):
+        return self.constraint_store.limit(teacher)
+
+    def teacher_daily_count(self, teacher, day):
+        counts = self.teacher_exams.get(teacher)
+        return counts[day] if counts else 0
+
+    def teacher_day_open(self, teacher, day):
+        """
+        教师当天是否还能再安排考试（未达到每日上限且有可用时间段）
+        """
+        if self.teacher_daily_count(teacher, day) >= self.teacher_limit(teacher):
+            return False
+        return self.teacher_free_slots(teacher, day) != 0
+
+    def teacher_free_slots(self, teacher, day):
+        """
+        教师当天可用且尚未占用的时间段位图
+        """
+        mask = self.constraint_store.available_masks(teacher)[day]
+        busy = self.teacher_busy.get(teacher)
+        if busy:
+            mask &= ~busy[day]
+        return mask
+
+    def teacher_can_take(self, teacher, day, slot, duration=None):
+        span = self.span(slot, duration)
+        if not span or self.teacher_free_slots(teacher, day) & span != span:
+            return False
+        return self.teacher_daily_count(teacher, day) < self.teacher_limit(teacher)
+
+    def room_free(self, room_id, day, slot, duration=None):
+        span = self.span(slot, duration)
+        if not span:
+            return False
+        masks = self.room_busy.get(room_id)
+        if masks and masks[day] & span:
+            return False
+        if not self.room_availability.is_open_span(room_id, day, span):
+            return False
+        return duration is None or self.room_availability.is_open_during(room_id, day, slot, duration)
+
+    def occupied_rooms(self, day, slot, duration=None):
+        """
+        考试期间已占用或未开放的教室位图，供 RoomIndex.select 使用
+        """
+        cell = day * self.n_slots + slot
+        if duration is None:
+            return self.cell_rooms[cell] | self.room_availability.closed_cells[cell]
+        span = self.span(slot, duration)
+        if not span:
+            return self.room_index.all_mask
+        occupied = self.room_availability.closed_during(day, slot, duration)
+        base = day * self.n_slots
+        while span:
+            cell = base + (span & -span).bit_length() - 1
+            span &= span - 1
+            occupied |= self.cell_rooms[cell] | self.room_availability.closed_cells[cell]
+        return occupied
+
+    def class_free(self, class_name, day, slot, duration=None):
+        masks = self.class_busy.get(class_name)
+        return not masks or not masks[day] & self.span(slot, duration)
+
+    def student_busy_days(self, course_id):
+        """
+        与课程有共同考生的课程每天已占用的时间段位图（numpy 数组），没有选课记录时返回 None
+        """
+        if self.enrolment is None:
+            return None
+        cached = self._student_cache.get(course_id)
+        if cached is not None and cached[0] == self._course_version:
+            return cached[1]
+        neighbours = self.enrolment.neighbours(course_id)
+        if len(neighbours):
+            masks = np.bitwise_or.reduce(self.course_masks[neighbours], axis=0)
+        else:
+            masks = np.zeros(self.n_days, dtype=np.int64)
+        self._student_cache[course_id] = (self._course_version, masks)
+        return masks
+
+    def student_busy(self, course_id, day):
+        masks = self.student_busy_days(course_id)
+        return 0 if masks is None else int(masks[day])
+
+    def students_free(self, course_id, day, slot, duration=None):
+        """
+        课程的考生在考试期间没有其他考试（未导入选课记录时总是成立）
+        """
+        if self.enrolment is None or course_id is None:
+            return True
+        return not self.student_busy(course_id, day) & self.span(slot, duration)
+
+    def is_feasible(self, teacher, class_name, room_ids, day, slot, check_class=False, duration=None,
+                    course_id=None):
+        """
+        判断从 (day, slot) 开始、持续 duration 分钟，使用 room_ids 安排考试是否可行
+
+        :param check_class: 是否同时检查班级时间冲突
+        :param course_id: 课程 id，导入了选课记录时检查学生冲突
+        """
+        if not self.teacher_can_take(teacher, day, slot, duration):
+            return False
+        if check_class and not self.class_free(class_name, day, slot, duration):
+            return False
+        if not self.students_free(course_id, day, slot, duration):
+            return False
+        for room_id in room_ids:
+            if not self.room_free(room_id, day, slot, duration):
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    # 修改
+    # ------------------------------------------------------------------
+    def place(self, teacher, class_name, room_ids, day, slot, duration=None, course_id=None):
+        """
+        登记一场考试，同一场考试可占用多个教室，长考试占用其时间内的全部时间段
+        """
+        span = self.span(slot, duration)
+        self._occupy(teacher, class_name, room_ids, day, span)
+        self._mark_course(course_id, day, span, True)
+
+    def release(self, teacher, class_name, room_ids, day, slot, duration=None, course_id=None):
+        """
+        撤销一场考试的占用登记
+        """
+        span = self.span(slot, duration)
+        self._vacate(teacher, class_name, room_ids, day, span)
+        self._mark_course(course_id, day, span, False)
+
+    def _mark_course(self, course_id, day, span, occupied):
+        if self.enrolment is None or course_id is None:
+            return
+        i = self.enrolment.position.get(course_id)
+        if i is None:
+            return
+        if occupied:
+            self.course_masks[i, day] |= span
+        else:
+            self.course_masks[i, day] &= ~span
+        self._course_version += 1
+
+    def _occupy(self, teacher, class_name, room_ids, day, span):
+        for room_id in room_ids:
+            self._masks(self.room_busy, room_id)[day] |= span
+        room_mask = self.room_index.mask_of(room_ids)
+        base = day * self.n_slots
+        cells = None
+        if class_name:
+            self._masks(self.class_busy, class_name)[day] |= span
+            cells = self.class_cells.get(class_name)
+            if cells is None:
+                cells = [0] * (self.n_days * self.n_slots)
+                self.class_cells[class_name] = cells
+                self.class_exams[class_name] = [0] * self.n_days
+                self.class_starts[class_name] = [0] * (self.n_days * self.n_slots)
+                self.class_ends[class_name] = [0] * (self.n_days * self.n_slots)
+            if span:
+                self.class_exams[class_name][day] += 1
+                self.class_starts[class_name][base + (span & -span).bit_length() - 1] += 1
+                self.class_ends[class_name][base + span.bit_length() - 1] += 1
+        bits = span
+        while bits:
+            cell = base + (bits & -bits).bit_length() - 1
+            bits &= bits - 1
+            self.cell_rooms[cell] |= room_mask
+            if cells is not None:
+                cells[cell] += 1
+        if teacher:
+            self._masks(self.teacher_busy, teacher)[day] |= span
+            counts = self.teacher_exams.get(teacher)
+            if counts is None:
+                counts = [0] * self.n_days
+                self.teacher_exams[teacher] = counts
+            counts[day] += 1
+
+    def _vacate(self, teacher, class_name, room_ids, day, span):
+        clear = ~span
+        for room_id in room_ids:
+            self._masks(self.room_busy, room_id)[day] &= clear
+        room_mask = ~self.room_index.mask_of(room_ids)
+        base = day * self.n_slots
+        cells = self.class_cells.get(class_name) if class_name else None
+        if cells is not None and span and self.class_exams[class_name][day] > 0:
+            self.class_exams[class_name][day] -= 1
+            self.class_starts[class_name][base + (span & -span).bit_length() - 1] -= 1
+            self.class_ends[class_name][base + span.bit_length() - 1] -= 1
+        class_clear = 0
+        bits = span
+        while bits:
+            bit = bits & -bits
+            bits &= bits - 1
+            cell = base + bit.bit_length() - 1
+            self.cell_rooms[cell] &= room_mask
+            if class_name:
+                if cells and cells[cell] > 0:
+                    cells[cell] -= 1
+                if not cells or cells[cell] == 0:
+                    class_clear |= bit
+        if class_clear:
+            self._masks(self.class_busy, class_name)[day] &= ~class_clear
+        if teacher:
+            self._masks(self.teacher_busy, teacher)[day] &= clear
+            counts = self.teacher_exams.get(teacher)
+            if counts and counts[day] > 0:
+                counts[day] -= 1
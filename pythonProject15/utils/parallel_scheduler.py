@@ -0,0 +1,261 @@
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.occupancy import OccupancyEngine
+from utils.placement import CoursePlacer
+from utils.room_index import make_room_strategy
+from utils.course_order import make_course_order
+from utils.spreading import SpreadingObjective
+
+
+PARTITION_MODES = ('college', 'building', 'component')
+
+
+def partition_courses(courses, rooms, by='component', enrolment=None):
+    """
+    将课程拆分为相互独立的分区
+
+    :param courses: 课程列表
+    :param rooms: 教室列表
+    :param by: 'college' 按任课学院；'building' 按常用教室所在教学楼；
+               'component' 按教师/班级冲突图的连通分量（分区之间只共享教室）
+    :param enrolment: 可选的 CoEnrolmentMatrix，'component' 分区时有共同考生的课程也划入同一分区
+    :return: 课程列表的列表
+    """
+    if by == 'college':
+        keys = [course[6] for course in courses]
+    elif by == 'building':
+        room_buildings = {room[0]: room[3] for room in rooms}
+        keys = [room_buildings.get(course[1], '') for course in courses]
+    elif by == 'component':
+        keys = _conflict_components(courses, enrolment)
+    else:
+        raise ValueError(f"未知的分区方式: {by}")
+
+    partitions = {}
+    for key, course in zip(keys, courses):
+        partitions.setdefault(key, []).append(course)
+    return list(partitions.values())
+
+
+def _conflict_components(courses, enrolment=None):
+    """
+    用并查集计算共享教师、学院班级或有共同考生的课程所在的连通分量
+    """
+    parent = list(range(len(courses)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    first_seen = {}
+    for i, course in enumerate(courses):
+        for key in (('teacher', course[11]), ('class', course[8])):
+            if not key[1]:
+                continue
+            j = first_seen.setdefault(key, i)
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_i] = root_j
+    if enrolment is not None:
+        index_of = {enrolment.position.get(course[0]): i for i, course in enumerate(courses)}
+        for i, course in enumerate(courses):
+            for neighbour in enrolment.neighbours(course[0]).tolist():
+                j = index_of.get(neighbour)
+                if j is None:
+                    continue
+                root_i, root_j = find(i), find(j)
+                if root_i != root_j:
+                    parent[root_i] = root_j
+    return [find(i) for i in range(len(courses))]
+
+
+def _balance(partitions, bins):
+    """
+    将大量小分区按课程数合并为 bins 个任务，减少进程间调度开销
+    """
+    if len(partitions) <= bins:
+        return partitions
+    tasks = [[] for _ in range(bins)]
+    for partition in sorted(partitions, key=len, reverse=True):
+        min(tasks, key=len).extend(partition)
+    return [task for task in tasks if task]
+
+
+# 工作进程内共享的只读数据（教室、约束、已有安排），由 _init_worker 设置
+_worker_state = {}
+
+
+def _init_worker(snapshot, exam_dates, time_slots):
+    _worker_state['snapshot'] = snapshot
+    _worker_state['exam_dates'] = exam_dates
+    _worker_state['time_slots'] = time_slots
+
+
+def _task_rng(seed, index):
+    """
+    每个任务使用由种子派生的独立随机数生成器，结果与任务在哪个进程中执行无关
+    """
+    return random.Random(f'{seed}:{index}') if seed is not None else None
+
+
+def _make_spread(engine, spread):
+    return SpreadingObjective.from_settings(engine, spread) if spread else None
+
+
+def _schedule_partition(courses, mode, room_strategy, split_mode='sequential', seed=None, index=0, spread=None,
+                        course_order='teacher'):
+    """
+    在工作进程中安排一个分区的课程
+    """
+    snapshot = dict(_worker_state['snapshot'], courses=courses)
+    engine = OccupancyEngine(snapshot, _worker_state['exam_dates'], _worker_state['time_slots'])
+    placer = CoursePlacer(engine, make_room_strategy(room_strategy, _task_rng(seed, index)), split_mode,
+                          spread=_make_spread(engine, spread),
+                          course_order=make_course_order(course_order, _task_rng(seed, f'order:{index}')))
+    return placer.place(courses, mode)
+
+
+class ParallelScheduler:
+    """
+    并行排考
+    按学院、教学楼或冲突图连通分量拆分课程，在进程池中分别排考，
+    合并时在全局占用引擎上重放各分区结果，修复共享教室上的冲突
+    """
+
+    def __init__(self, snapshot, exam_dates, time_slots, constraint_store=None, max_workers=None):
+        """
+        :param snapshot: load_schedule_snapshot 返回的数据
+        :param constraint_store: 合并阶段使用的 TeacherConstraintStore
+        :param max_workers: 进程数，默认为 CPU 核数
+        """
+        self.snapshot = snapshot
+        self.exam_dates = list(exam_dates)
+        self.time_slots = list(time_slots)
+        self.constraint_store = constraint_store
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.last_stats = None
+
+    def schedule(self, partition_by='component', mode='greedy', room_strategy='best_fit', split_mode='sequential',
+                 seed=None, progress=None, spread=None, course_order='teacher'):
+        """
+        :param seed: 随机种子，'random' 教室选择策略使用
+        :param spread: 班级考试分散度参数（见 SpreadingObjective.from_settings），为空时不考虑分散度
+        :param course_order: 分区内的课程排序策略名称，随机重启在分区内只使用一次随机顺序
+        :param progress: ProgressReporter，每完成一个任务报告一次进度，取消时放弃尚未开始的任务
+        :return: (placements, failed_courses)
+        """
+        courses = self.snapshot['courses']
+        partitions = partition_courses(courses, self.snapshot['rooms'], partition_by,
+                                       self.snapshot.get('enrolment'))
+        tasks = _balance(partitions, self.max_workers * 4)
+        shared = dict(self.snapshot, courses=[])
+
+        if progress is not None:
+            progress.begin('并行排考', len(tasks))
+        results = []
+        if self.max_workers == 1 or len(tasks) <= 1:
+            _init_worker(shared, self.exam_dates, self.time_slots)
+            for index, task in enumerate(tasks):
+                results.append(_schedule_partition(task, mode, room_strategy, split_mode, seed, index, spread,
+                                                   course_order))
+                if progress is not None:
+                    progress.update()
+        else:
+            pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker,
+                                       initargs=(shared, self.exam_dates, self.time_slots))
+            try:
+                futures = [pool.submit(_schedule_partition, task, mode, room_strategy, split_mode, seed, index,
+                                       spread, course_order)
+                           for index, task in enumerate(tasks)]
+                for future in futures:
+                    results.append(future.result())
+                    if progress is not None:
+                        progress.update()
+            finally:
+                pool.shutdown(cancel_futures=True)
+
+        placements, failed_courses = self._merge(results, mode, room_strategy, split_mode, seed, spread)
+        self.last_stats['partitions'] = len(partitions)
+        self.last_stats['tasks'] = len(tasks)
+        print(f"并行排考: {len(partitions)} 个分区, {len(tasks)} 个任务, "
+              f"换教室修复 {self.last_stats['room_repairs']} 场, 重新安排 {self.last_stats['replanned']} 门课程")
+        return placements, failed_courses
+
+    def _merge(self, results, mode, room_strategy, split_mode='sequential', seed=None, spread=None):
+        """
+        在全局占用引擎上合并各分区结果
+        同一场考试的教室被其他分区占用时，先在同一时间段换一间教室，仍冲突的课程整体重新安排
+        """
+        engine = OccupancyEngine(self.snapshot, self.exam_dates, self.time_slots, self.constraint_store)
+        placer = CoursePlacer(engine, make_room_strategy(room_strategy, _task_rng(seed, 'merge')), split_mode,
+                              spread=_make_spread(engine, spread))
+        check_class = mode == 'dsatur'
+        course_by_id = {course[0]: course for course in engine.courses}
+
+        merged = []
+        replan = []
+        room_repairs = 0
+        for placements, failed in results:
+            groups = {}
+            for placement in placements:
+                groups.setdefault(placement['course_id'], []).append(placement)
+            for course_id, group in groups.items():
+                repairs = self._accept_group(engine, group, check_class)
+                if repairs is None:
+                    replan.append(course_by_id[course_id])
+                else:
+                    room_repairs += repairs
+                    merged.extend(group)
+            replan.extend(course_by_id[item['course_id']] for item in failed)
+
+        replanned, failed_courses = placer.place_greedy(replan, check_class)
+        self.last_stats = {'room_repairs': room_repairs, 'replanned': len(replan)}
+        return merged + replanned, failed_courses
+
+    def _accept_group(self, engine, group, check_class):
+        """
+        登记一门课程的全部场次，返回换教室的次数；无法登记时撤销并返回 None
+        同一时间段的多间教室（同时分场）作为一场考试登记
+        """
+        cells = {}
+        for placement in group:
+            cells.setdefault((placement['day'], placement['slot']), []).append(placement)
+
+        accepted = []
+        repairs = 0
+        teacher, class_name = group[0]['teacher'], group[0]['class_name']
+        duration, course_id = group[0].get('duration'), group[0]['course_id']
+        for (day, slot), cell_placements in cells.items():
+            ok = engine.teacher_can_take(teacher, day, slot, duration)
+            if ok and check_class:
+                ok = engine.class_free(class_name, day, slot, duration)
+            if ok:
+                ok = engine.students_free(course_id, day, slot, duration)
+            room_ids = []
+            if ok:
+                occupied = engine.occupied_rooms(day, slot, duration)
+                for placement in cell_placements:
+                    room_id = placement['room_id']
+                    if not engine.room_free(room_id, day, slot, duration) or room_id in room_ids:
+                        room = engine.room_index.select_near(placement['students_count'], occupied, None,
+                                                             *engine.room_index.location(room_id))
+                        if room is None:
+                            ok = False
+                            break
+                        room_id = room[0]
+                        repairs += 1
+                    room_ids.append(room_id)
+                    occupied |= engine.room_index.mask_of([room_id])
+            if not ok:
+                for cell_day, cell_slot, cell_rooms in accepted:
+                    engine.release(teacher, class_name, cell_rooms, cell_day, cell_slot, duration, course_id)
+                return None
+            for placement, room_id in zip(cell_placements, room_ids):
+                placement['room_id'] = room_id
+            engine.place(teacher, class_name, room_ids, day, slot, duration, course_id)
+            accepted.append((day, slot, room_ids))
+        return repairs
@@ -0,0 +1,391 @@
+from utils.course_order import TeacherGroupOrder
+from utils.graph_coloring import DSaturScheduler
+from utils.room_index import BestFitStrategy
+
+
+SPLIT_MODES = ('sequential', 'concurrent')
+
+
+def teacher_preferred_rooms(courses):
+    """
+    教师的常用教室：该教师各门课程的教室号按使用次数从多到少排列，
+    贪心排考按这个顺序为教师的课程尝试教室，确保同一教师的课程尽量安排在同一教室
+
+    :return: {教师: [(教室号, 使用次数)]}
+    """
+    teacher_rooms = {}
+    for course in courses:
+        rooms = teacher_rooms.setdefault(course[11], {})
+        rooms[course[1]] = rooms.get(course[1], 0) + 1
+    return {
+        teacher: sorted(rooms.items(), key=lambda x: x[1], reverse=True)
+        for teacher, rooms in teacher_rooms.items()
+    }
+
+
+def sequential_plans(preferred_rooms, capacities, students_count):
+    """
+    依次分场时贪心排考尝试的方案：按常用教室的顺序，每间存在的常用教室需要的考试场次数
+
+    :param preferred_rooms: teacher_preferred_rooms 中一位教师的常用教室
+    :param capacities: {教室编号: 容量}
+    :return: [(教室编号, 场次数)]，人数不超过教室容量时场次数为 1
+    """
+    plans = []
+    for room_id, _ in preferred_rooms:
+        capacity = capacities.get(room_id)
+        if capacity:
+            plans.append((room_id, -(-students_count // capacity)))
+    return plans
+
+
+class CoursePlacer:
+    """
+    内存排考算法
+    只读写 OccupancyEngine，不访问数据库，可在工作进程中独立运行
+    """
+
+    def __init__(self, engine, room_strategy=None, split_mode='sequential', progress=None, spread=None,
+                 course_order=None):
+        """
+        :param engine: OccupancyEngine
+        :param room_strategy: 常用教室不可用时的教室选择策略，默认最佳适配
+        :param split_mode: 人数超过教室容量时的分场方式，'sequential' 在常用教室按多个时间段依次考试；
+                           'concurrent' 在同一时间段使用多间教室（优先同一教学楼）同时考试
+        :param progress: ProgressReporter，每处理一门课程报告一次进度并检查是否取消
+        :param spread: SpreadingObjective，指定后在可行的时间段中选择班级分散度惩罚最小的，
+                       为空时选择第一个可行的时间段
+        :param course_order: CourseOrderStrategy，贪心排考安排课程的顺序，默认按教师分组
+        """
+        self.engine = engine
+        self.room_strategy = room_strategy or BestFitStrategy()
+        if split_mode not in SPLIT_MODES:
+            raise ValueError(f"未知的分场方式: {split_mode}")
+        self.split_mode = split_mode
+        self.progress = progress
+        self.spread = spread
+        self.course_order = course_order or TeacherGroupOrder()
+
+    def place(self, courses, mode='greedy'):
+        """
+        按排考模式安排课程
+
+        :param mode: 'greedy' 或 'dsatur'
+        :return: (placements, failed_courses)
+        """
+        if mode == 'dsatur':
+            return self.place_dsatur(courses)
+        return self.place_greedy(courses)
+
+    def place_greedy(self, courses, check_class=False):
+        """
+        按课程排序策略的顺序贪心安排考试（默认按教师分组），优先使用教师常用教室
+        
+        :param courses: 待安排的课程列表
+        :param check_class: 是否避免同一班级同时考试
+        :return: (placements, failed_courses)
+        """
+        engine = self.engine
+        room_strategy = self.room_strategy
+        room_index = engine.room_index
+        room_dict = engine.room_dict
+        placements = []
+        failed_courses = []
+        
+        # 优先使用教师最常用的教室
+        teacher_preferred = teacher_preferred_rooms(courses)
+        
+        # 按排序策略的顺序为每个课程安排考试
+        for course in self.course_order.order(courses, engine):
+            teacher = course[11]
+            preferred_rooms = teacher_preferred[teacher]
+            # 常用教室不可用时就近查找：先同一楼层，再同一教学楼
+            near = self._near(preferred_rooms)
+            class_name = course[8]  # 学院班级
+            students_count = course[9]  # 考试人数
+            
+            # 如果考试人数超过一个合理值（如10人），则使用实际的考试教室
+            actual_students_count = max(10, students_count)
+            # 考试时长，长考试占用多个时间段
+            duration = engine.course_duration(course)
+            
+            # 标记是否成功安排
+            course_scheduled = False
+            
+            # 尝试使用教师常用的教室（按使用频率排序）
+            for preferred_room_id, _ in preferred_rooms:
+                if course_scheduled:
+                    break
+                    
+                # 如果该教室号在room_dict中有对应信息
+                if preferred_room_id not in room_dict:
+                    continue
+                room_capacity = int(room_dict[preferred_room_id][2])
+                
+                # 同时分场：以常用教室为主，同一时间段内拼凑多间教室
+                if actual_students_count > room_capacity and self.split_mode == 'concurrent':
+                    found = self._find_concurrent(teacher, class_name, actual_students_count,
+                                                  preferred_room_id, check_class, duration, course[0])
+                    if found is not None:
+                        placements.extend(self._place_concurrent(course, actual_students_count, *found))
+                        course_scheduled = True
+                # 如果学生人数超过教室容量，需要分场次考试
+                elif actual_students_count > room_capacity:
+                    # 计算需要多少场次
+                    sessions_needed = (actual_students_count + room_capacity - 1) // room_capacity
+                    
+                    # 每场安排的学生数量
+                    students_per_session = (actual_students_count + sessions_needed - 1) // sessions_needed
+                    
+                    # 为每场次安排教室和时间
+                    session_placements = []
+                    for session in range(sessions_needed):
+                        # 分配学生数量
+                        session_students = min(students_per_session, actual_students_count - session * students_per_session)
+                        cell = self._find_slot(teacher, class_name, [preferred_room_id], check_class, duration,
+                                               course[0])
+                        if cell is None:
+                            break
+                        day, slot = cell
+                        engine.place(teacher, class_name, [preferred_room_id], day, slot, duration, course[0])
+                        session_placements.append(self._make_placement(
+                            course, preferred_room_id, day, slot,
+                            session_students, session + 1, sessions_needed
+                        ))
+                    
+                    # 如果所有场次都成功安排，标记课程为已安排；否则撤销已占用的场次
+                    if len(session_placements) == sessions_needed:
+                        placements.extend(session_placements)
+                        course_scheduled = True
+                    else:
+                        for placement in session_placements:
+                            engine.release(teacher, class_name, [placement['room_id']],
+                                           placement['day'], placement['slot'], duration, course[0])
+                else:
+                    # 学生人数不超过教室容量，直接安排一场考试
+                    cell = self._find_slot(teacher, class_name, [preferred_room_id], check_class, duration,
+                                           course[0])
+                    if cell is not None:
+                        day, slot = cell
+                        engine.place(teacher, class_name, [preferred_room_id], day, slot, duration, course[0])
+                        placements.append(self._make_placement(
+                            course, preferred_room_id, day, slot, actual_students_count
+                        ))
+                        course_scheduled = True
+            
+            # 如果使用常用教室失败，从容量索引中就近查找其他教室
+            if not course_scheduled and actual_students_count <= room_index.max_capacity:
+                # 找到的时间段及其分散度惩罚，惩罚为 0 或未启用分散度时不再继续查找
+                best = None
+                for day in range(engine.n_days):
+                    if best is not None and best[0] == 0:
+                        break
+                    
+                    # 检查教师每日考试限制
+                    if not engine.teacher_day_open(teacher, day):
+                        continue
+                        
+                    for slot in range(engine.n_slots):
+                        # 验证教师时间约束
+                        if not engine.teacher_can_take(teacher, day, slot, duration):
+                            continue
+                        if check_class and not engine.class_free(class_name, day, slot, duration):
+                            continue
+                        if not engine.students_free(course[0], day, slot, duration):
+                            continue
+                        cost = self._spread_cost(class_name, day, slot, duration)
+                        if best is not None and cost >= best[0]:
+                            continue
+                        
+                        room = room_index.select_near(
+                            actual_students_count, engine.occupied_rooms(day, slot, duration), room_strategy,
+                            *near
+                        )
+                        if room is not None:
+                            best = (cost, day, slot, room)
+                            if cost == 0:
+                                break
+                if best is not None:
+                    _, day, slot, room = best
+                    engine.place(teacher, class_name, [room[0]], day, slot, duration, course[0])
+                    placements.append(self._make_placement(
+                        course, room[0], day, slot, actual_students_count
+                    ))
+                    course_scheduled = True
+            
+            # 单间教室无法容纳时，在同一时间段拼凑多间教室
+            if not course_scheduled and self.split_mode == 'concurrent':
+                found = self._find_concurrent(teacher, class_name, actual_students_count, None, check_class,
+                                              duration, course[0], near)
+                if found is not None:
+                    placements.extend(self._place_concurrent(course, actual_students_count, *found))
+                    course_scheduled = True
+            
+            # 如果课程仍未安排，记录为失败
+            if not course_scheduled:
+                failed_courses.append(self._make_failure(course, actual_students_count))
+            
+            if self.progress is not None:
+                self.progress.update(teacher=teacher)
+    
+        return placements, failed_courses
+
+    def place_dsatur(self, courses):
+        """
+        按冲突图着色（DSatur）安排考试，同一班级、同一教师的课程不会安排在同一时间段
+        着色失败的课程（如人数超过所有教室容量）再交给贪心算法分场次安排，仍检查班级冲突
+        
+        :return: (placements, failed_courses)
+        """
+        assignments, failed = DSaturScheduler(self.engine, self.room_strategy, self.progress,
+                                              self.spread).schedule(courses)
+        placements = [
+            self._make_placement(course, room_id, day, slot, max(10, course[9]))
+            for course, room_id, day, slot in assignments
+        ]
+        retry_placements, failed_courses = self.place_greedy(failed, check_class=True)
+        return placements + retry_placements, failed_courses
+
+    def _spread_cost(self, class_name, day, slot, duration=None):
+        if self.spread is None:
+            return 0
+        return self.spread.cost(class_name, day, slot, duration)
+
+    def _find_slot(self, teacher, class_name, room_ids, check_class=False, duration=None, course_id=None):
+        """
+        按日期、时间段顺序查找可行的开始 (day, slot)：未启用分散度时为第一个，
+        否则为分散度惩罚最小的第一个
+        """
+        engine = self.engine
+        best = None
+        for day in range(engine.n_days):
+            # 检查教师每日考试限制
+            if not engine.teacher_day_open(teacher, day):
+                continue
+            for slot in range(engine.n_slots):
+                if engine.is_feasible(teacher, class_name, room_ids, day, slot, check_class, duration, course_id):
+                    cost = self._spread_cost(class_name, day, slot, duration)
+                    if cost == 0:
+                        return day, slot
+                    if best is None or cost < best[0]:
+                        best = (cost, day, slot)
+        return best[1:] if best is not None else None
+
+    def _near(self, preferred_rooms):
+        """
+        就近查找教室的参照位置：教师最常用且存在的教室所在的 (教学楼, 楼层)
+        """
+        for room_id, _ in preferred_rooms:
+            if room_id in self.engine.room_dict:
+                return self.engine.room_index.location(room_id)
+        return None, None
+
+    def _find_concurrent(self, teacher, class_name, students_count, preferred_room_id, check_class=False,
+                         duration=None, course_id=None, near=None):
+        """
+        查找能在同一时间段用多间教室容纳全部学生的 (day, slot)
+        常用教室空闲时优先使用，其余人数优先安排在常用教室所在楼层、教学楼，使同一课程的考场集中；
+        优先选择全部考场在同一教学楼内的时间段，没有时才跨教学楼安排
+
+        :param near: 没有常用教室时的参照位置 (教学楼, 楼层)
+        :return: (day, slot, 教室记录列表)，找不到时返回 None
+        """
+        engine = self.engine
+        room_index = engine.room_index
+        preferred_room = engine.room_dict.get(preferred_room_id)
+        if preferred_room:
+            building, floor = room_index.location(preferred_room_id)
+        else:
+            building, floor = near or (None, None)
+        best = None
+        for day in range(engine.n_days):
+            if not engine.teacher_day_open(teacher, day):
+                continue
+            for slot in range(engine.n_slots):
+                if not engine.is_feasible(teacher, class_name, [], day, slot, check_class, duration, course_id):
+                    continue
+                cost = self._spread_cost(class_name, day, slot, duration)
+                if best is not None and (cost, 0) >= best[0]:
+                    continue
+                free_occupied = occupied = engine.occupied_rooms(day, slot, duration)
+                rooms = []
+                remaining = students_count
+                if preferred_room and engine.room_free(preferred_room[0], day, slot, duration):
+                    rooms.append(preferred_room)
+                    remaining -= int(preferred_room[2])
+                    occupied |= room_index.mask_of([preferred_room[0]])
+                if remaining > 0:
+                    others = room_index.select_many(remaining, occupied, building, floor)
+                    if others is None:
+                        continue
+                    rooms.extend(others)
+                    if rooms[0] is preferred_room and any(room[3] != building for room in others):
+                        # 常用教室所在教学楼容纳不下其余人数时，改为整体安排在同一教学楼
+                        clustered = room_index.select_many(students_count, free_occupied, building, floor)
+                        if clustered is not None and len({room[3] for room in clustered}) == 1:
+                            rooms = clustered
+                # 分散度惩罚相同时，考场集中在一个教学楼的时间段优先
+                score = (cost, 0 if len({room[3] for room in rooms}) == 1 else 1)
+                if score == (0, 0):
+                    return day, slot, rooms
+                if best is None or score < best[0]:
+                    best = (score, day, slot, rooms)
+        return best[1:] if best is not None else None
+
+    def _place_concurrent(self, course, students_count, day, slot, rooms):
+        """
+        登记同一时间段的多间教室，按教室容量依次分配学生
+        """
+        self.engine.place(course[11], course[8], [room[0] for room in rooms], day, slot,
+                          self.engine.course_duration(course), course[0])
+        if len(rooms) == 1:
+            return [self._make_placement(course, rooms[0][0], day, slot, students_count)]
+        placements = []
+        remaining = students_count
+        for session, room in enumerate(rooms, 1):
+            session_students = min(int(room[2]), remaining)
+            remaining -= session_students
+            placements.append(self._make_placement(
+                course, room[0], day, slot, session_students, session, len(rooms), concurrent=True
+            ))
+        return placements
+
+    def _make_placement(self, course, room_id, day, slot, students_count,
+                        session=None, total_sessions=None, concurrent=False):
+        """
+        构建一条内存中的考试安排记录，slot 为开始时间段，exam_time 为实际起止时间
+        """
+        engine = self.engine
+        duration = engine.course_duration(course)
+        return {
+            'course_id': course[0],
+            'room_id': room_id,
+            'exam_date': engine.exam_dates[day],
+            'exam_time': engine.exam_time(slot, duration),
+            'day': day,
+            'slot': slot,
+            'duration': duration,
+            'class_name': course[8],
+            'students_count': students_count,
+            'department': course[6],
+            'major': course[7],
+            'teacher_type': course[5],
+            'teacher': course[11],
+            'course_name': course[2],
+            'session': session,
+            'total_sessions': total_sessions,
+            'concurrent': concurrent
+        }
+
+    def _make_failure(self, course, students_count, reason='无法找到合适的时间和教室'):
+        """
+        构建一条排考失败记录
+        """
+        return {
+            'course_id': course[0],
+            'course_name': course[2],
+            'teacher': course[11],
+            'class_name': course[8],
+            'students_count': students_count,
+            'reason': reason
+        }
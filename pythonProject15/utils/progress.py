@@ -0,0 +1,86 @@
+import threading
+import time
+
+
+class ScheduleCancelled(Exception):
+    """
+    排考被用户取消
+    """
+
+
+class CancellationToken:
+    """
+    取消令牌
+    界面线程调用 cancel()，排考线程在进度回调处检查，可跨线程使用
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ScheduleCancelled("排考已取消")
+
+
+class ProgressReporter:
+    """
+    排考进度报告
+    排考各阶段调用 update()，按时间间隔节流后调用回调函数，并在每次更新时检查取消令牌
+    回调参数为字典: {'stage': 阶段, 'done': 已完成数, 'total': 总数, 'teacher': 当前教师, 'elapsed': 已用秒数}
+    """
+
+    def __init__(self, callback=None, cancel_token=None, interval=0.1):
+        """
+        :param callback: 进度回调函数，为空时只检查取消
+        :param cancel_token: CancellationToken
+        :param interval: 两次回调之间的最短间隔（秒）
+        """
+        self.callback = callback
+        self.cancel_token = cancel_token
+        self.interval = interval
+        self.start_time = time.perf_counter()
+        self._last_report = 0.0
+        self.stage = ''
+        self.total = 0
+        self.done = 0
+
+    def begin(self, stage, total=0):
+        """
+        开始一个新阶段并立即报告
+        """
+        self.stage = stage
+        self.total = total
+        self.done = 0
+        self._report(None, force=True)
+
+    def update(self, done=None, teacher=None, step=1):
+        """
+        :param done: 已完成数，为空时在原值上加 step
+        :param teacher: 当前处理的教师
+        """
+        self.done = self.done + step if done is None else done
+        self._report(teacher)
+
+    def _report(self, teacher, force=False):
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        self.callback({
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'teacher': teacher,
+            'elapsed': now - self.start_time
+        })
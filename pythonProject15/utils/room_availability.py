@@ -0,0 +1,226 @@
+from datetime import datetime
+from functools import lru_cache
+from utils.time_slots import TimeSlotGrid, format_minutes, parse_time_range, popcount
+
+
+ALL_WEEKDAYS = (1 << 7) - 1
+
+
+def _is_blank(text):
+    return text is None or str(text).strip().lower() in ('', 'nan', 'none')
+
+
+@lru_cache(maxsize=1024)
+def parse_room_availability(dates_str, times_str):
+    """
+    解析教室的可用日期和可用时间
+
+    :param dates_str: 可用星期，如 "1,2,3,4,5" 或 "1-5"，1 为周一、7 为周日；为空表示每天可用
+    :param times_str: 可用时间，如 "08:00-22:00"，多个时间段用逗号分隔；为空表示全天可用
+    :return: (星期位图, 可用时间段列表, 无法解析的内容列表)，
+             星期位图第 0 位为周一；可用时间段为 (开始分钟, 结束分钟)，None 表示不限
+    """
+    invalid = []
+    weekdays = ALL_WEEKDAYS
+    if not _is_blank(dates_str):
+        weekdays = 0
+        for token in str(dates_str).replace('，', ',').split(','):
+            token = token.strip()
+            if not token:
+                continue
+            try:
+                if '-' in token:
+                    first, last = (int(part) for part in token.split('-'))
+                else:
+                    first = last = int(float(token))
+                if not 1 <= first <= last <= 7:
+                    raise ValueError(token)
+            except ValueError:
+                invalid.append(token)
+                continue
+            for weekday in range(first, last + 1):
+                weekdays |= 1 << (weekday - 1)
+        if not weekdays and invalid:
+            # 全部无法解析时按不限处理，避免教室被整体关闭
+            weekdays = ALL_WEEKDAYS
+
+    windows = None
+    if not _is_blank(times_str):
+        windows = []
+        for token in str(times_str).replace('，', ',').split(','):
+            if not token.strip():
+                continue
+            time_range = parse_time_range(token)
+            if time_range is None or time_range[1] <= time_range[0]:
+                invalid.append(token.strip())
+            else:
+                windows.append(time_range)
+        if not windows:
+            windows = None
+    return weekdays, (tuple(sorted(windows)) if windows else None), tuple(invalid)
+
+
+def normalize_room_availability(dates_str, times_str):
+    """
+    导入教室时规范化可用日期和可用时间
+
+    :return: (可用日期, 可用时间, 无法解析的内容列表)，不限时为空字符串
+    """
+    weekdays, windows, invalid = parse_room_availability(dates_str, times_str)
+    dates_text = '' if weekdays == ALL_WEEKDAYS else ','.join(
+        str(weekday + 1) for weekday in range(7) if (weekdays >> weekday) & 1
+    )
+    times_text = '' if windows is None else ','.join(
+        f"{format_minutes(start)}-{format_minutes(end)}" for start, end in windows
+    )
+    return dates_text, times_text, invalid
+
+
+class RoomAvailability:
+    """
+    教室开放时间位图
+    教室记录解析一次后，按考试时间段网格编译为每间教室的 星期 × 时间段 位图，
+    以及每个 (日期, 时间段) 关闭的教室位图（位序与 RoomIndex 一致），
+    排考查找教室时与占用位图按位或即可排除未开放的教室
+    """
+
+    def __init__(self, rooms, room_index, exam_dates, time_slots):
+        """
+        :param rooms: 教室记录，第 6、7 个字段为可用日期、可用时间（缺少时视为不限）
+        :param room_index: RoomIndex
+        :param time_slots: 时间段字符串列表或 TimeSlotGrid
+        """
+        grid = TimeSlotGrid.of(time_slots)
+        self.grid = grid
+        self.n_slots = len(grid)
+        full_day_mask = grid.full_day_mask
+
+        # 一个时间段完全落在某个开放时间段内才可用
+        def open_slots(windows):
+            if windows is None:
+                return full_day_mask
+            mask = 0
+            for i, slot in enumerate(grid.slots):
+                if any(start <= slot.start and slot.end <= end for start, end in windows):
+                    mask |= 1 << i
+            return mask
+
+        # 格式: {教室编号: [周一可用时间段位图, ..., 周日]}，只记录有限制的教室
+        self.weekday_masks = {}
+        # 有限制的教室的 (星期位图, 可用时间段, 教室位图)，按实际考试时间检查长考试
+        self.rules = {}
+        # {(星期, 开始时间段, 时长): 考试期间未开放的教室位图}
+        self._closed_during = {}
+        # closed_by_weekday[星期][时间段] = 关闭的教室位图
+        closed_by_weekday = [[0] * self.n_slots for _ in range(7)]
+        for room in rooms:
+            if len(room) < 7:
+                continue
+            weekdays, windows, _ = parse_room_availability(room[5], room[6])
+            if weekdays == ALL_WEEKDAYS and windows is None:
+                continue
+            day_mask = open_slots(windows)
+            masks = [day_mask if (weekdays >> weekday) & 1 else 0 for weekday in range(7)]
+            if all(mask == full_day_mask for mask in masks):
+                continue
+            self.weekday_masks[room[0]] = masks
+            bit = room_index.mask_of([room[0]])
+            self.rules[room[0]] = (weekdays, windows, bit)
+            for weekday, mask in enumerate(masks):
+                closed = full_day_mask & ~mask
+                while closed:
+                    slot = (closed & -closed).bit_length() - 1
+                    closed &= closed - 1
+                    closed_by_weekday[weekday][slot] |= bit
+
+        self.day_weekdays = []
+        for date in exam_dates:
+            try:
+                self.day_weekdays.append(datetime.strptime(date, '%Y-%m-%d').weekday())
+            except ValueError:
+                self.day_weekdays.append(None)
+        # 每个 (日期, 时间段) 关闭的教室位图
+        self.closed_cells = []
+        for weekday in self.day_weekdays:
+            if weekday is None:
+                self.closed_cells.extend([0] * self.n_slots)
+            else:
+                self.closed_cells.extend(closed_by_weekday[weekday])
+
+    def closed_rooms(self, day, slot):
+        return self.closed_cells[day * self.n_slots + slot]
+
+    def is_open(self, room_id, day, slot):
+        masks = self.weekday_masks.get(room_id)
+        if masks is None:
+            return True
+        weekday = self.day_weekdays[day]
+        return weekday is None or bool((masks[weekday] >> slot) & 1)
+
+    def is_open_span(self, room_id, day, span):
+        """
+        教室在 day 是否开放 span 中的全部时间段
+        """
+        masks = self.weekday_masks.get(room_id)
+        if masks is None:
+            return True
+        weekday = self.day_weekdays[day]
+        return weekday is None or masks[weekday] & span == span
+
+    def closed_during(self, day, slot, duration):
+        """
+        从第 slot 个时间段开始、持续 duration 分钟的考试期间未开放的教室位图。
+        长考试可能延伸到时间段之间的空隙（如 10:30 开始的 180 分钟考试到 13:30 结束），
+        除了所占时间段外，实际考试时间也要落在教室的某个开放时间段内
+        """
+        weekday = self.day_weekdays[day]
+        if weekday is None or not self.rules:
+            return 0
+        key = (weekday, slot, duration)
+        closed = self._closed_during.get(key)
+        if closed is None:
+            start = self.grid.slots[slot].start
+            end = start + duration
+            closed = 0
+            for weekdays, windows, bit in self.rules.values():
+                if not (weekdays >> weekday) & 1 or (
+                        windows is not None and not any(w_start <= start and end <= w_end
+                                                         for w_start, w_end in windows)):
+                    closed |= bit
+            self._closed_during[key] = closed
+        return closed
+
+    def is_open_during(self, room_id, day, slot, duration):
+        """
+        教室在从第 slot 个时间段开始、持续 duration 分钟的考试期间是否开放（见 closed_during）
+        """
+        rule = self.rules.get(room_id)
+        return rule is None or not self.closed_during(day, slot, duration) & rule[2]
+
+    def open_slot_count(self, room_id):
+        """
+        教室在考试窗口内开放的时间段数
+        """
+        masks = self.weekday_masks.get(room_id)
+        if masks is None:
+            return len(self.day_weekdays) * self.n_slots
+        return sum(self.n_slots if weekday is None else popcount(masks[weekday])
+                   for weekday in self.day_weekdays)
+
+
+def room_open_at(dates_str, times_str, exam_date, exam_time):
+    """
+    教室在指定日期、时间是否开放（单条记录的检查，用于手动调整和冲突检测）
+    日期或时间无法解析时视为开放
+    """
+    weekdays, windows, _ = parse_room_availability(dates_str, times_str)
+    try:
+        weekday = datetime.strptime(exam_date, '%Y-%m-%d').weekday()
+        if not (weekdays >> weekday) & 1:
+            return False
+    except (ValueError, TypeError):
+        pass
+    time_range = parse_time_range(exam_time)
+    if windows is None or time_range is None:
+        return True
+    return any(start <= time_range[0] and time_range[1] <= end for start, end in windows)
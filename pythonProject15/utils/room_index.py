@@ -0,0 +1,242 @@
+import random
+from bisect import bisect_left
+from utils.time_slots import popcount
+
+
+ROOM_STRATEGIES = ('best_fit', 'first_fit', 'random')
+
+
+class RoomSelectionStrategy:
+    """
+    教室选择策略基类
+    候选教室以位图表示，第 i 位对应 RoomIndex 中按容量排序的第 i 间教室
+    """
+
+    def pick(self, room_index, candidates):
+        """
+        :param room_index: RoomIndex
+        :param candidates: 容量足够且空闲的教室位图（非零）
+        :return: 选中教室在容量排序中的位置
+        """
+        raise NotImplementedError
+
+
+class BestFitStrategy(RoomSelectionStrategy):
+    """
+    最佳适配：选择容量最小的合适教室（位图最低位）
+    """
+
+    def pick(self, room_index, candidates):
+        return (candidates & -candidates).bit_length() - 1
+
+
+class FirstFitStrategy(RoomSelectionStrategy):
+    """
+    首次适配：按导入顺序选择第一个合适教室
+    """
+
+    def pick(self, room_index, candidates):
+        best = None
+        while candidates:
+            position = (candidates & -candidates).bit_length() - 1
+            candidates &= candidates - 1
+            if best is None or room_index.import_order[position] < room_index.import_order[best]:
+                best = position
+        return best
+
+
+class RandomStrategy(RoomSelectionStrategy):
+    """
+    随机选择：在合适教室中随机选择一间，避免总是选择同一个教室
+    """
+
+    def __init__(self, rng=None):
+        self.rng = rng or random
+
+    def pick(self, room_index, candidates):
+        skip = self.rng.randrange(popcount(candidates))
+        for _ in range(skip):
+            candidates &= candidates - 1
+        return (candidates & -candidates).bit_length() - 1
+
+
+def make_room_strategy(name='best_fit', rng=None):
+    """
+    根据名称创建教室选择策略
+
+    :param name: 'best_fit'、'first_fit' 或 'random'
+    :param rng: 随机策略使用的随机数生成器
+    """
+    if name == 'best_fit':
+        return BestFitStrategy()
+    if name == 'first_fit':
+        return FirstFitStrategy()
+    if name == 'random':
+        return RandomStrategy(rng)
+    raise ValueError(f"未知的教室选择策略: {name}")
+
+
+class RoomIndex:
+    """
+    教室容量索引
+    全部教室按容量升序排列，教学楼、楼层分区用位图表示（教学楼 -> 楼层 -> 按容量排序的教室）。
+    查找时二分定位最小容量，与分区位图、空闲位图做按位与后由策略选出教室，
+    不需要逐个检查已占用的教室；就近查找依次使用同一楼层、同一教学楼、全部教室的分区位图
+    """
+
+    def __init__(self, rooms):
+        """
+        :param rooms: 教室记录，字段顺序为 (教室编号, 教室名称, 教室容量, 教学楼, 楼层, ...)
+        """
+        self.rooms = sorted(rooms, key=lambda room: int(room[2]))
+        self.capacities = [int(room[2]) for room in self.rooms]
+        self.max_capacity = self.capacities[-1] if self.rooms else 0
+        self.all_mask = (1 << len(self.rooms)) - 1
+        # 教室编号 -> 容量排序中的位置
+        self.position = {room[0]: i for i, room in enumerate(self.rooms)}
+        # 教室编号 -> (教学楼, 楼层)
+        self.locations = {room[0]: (room[3], room[4]) for room in self.rooms}
+        # 容量排序中的位置 -> 导入顺序
+        order = {room[0]: i for i, room in enumerate(rooms)}
+        self.import_order = [order[room[0]] for room in self.rooms]
+
+        self.building_masks = {}
+        self.floor_masks = {}
+        for i, room in enumerate(self.rooms):
+            bit = 1 << i
+            self.building_masks[room[3]] = self.building_masks.get(room[3], 0) | bit
+            floor_key = (room[3], room[4])
+            self.floor_masks[floor_key] = self.floor_masks.get(floor_key, 0) | bit
+
+    def capacity_mask(self, min_capacity):
+        """
+        容量不小于 min_capacity 的教室位图，O(log n)
+        """
+        start = bisect_left(self.capacities, min_capacity)
+        return self.all_mask & ~((1 << start) - 1)
+
+    def partition_mask(self, building=None, floor=None):
+        """
+        指定教学楼（及楼层）的教室位图，不指定时返回全部教室
+        """
+        if building is None:
+            return self.all_mask
+        if floor is None:
+            return self.building_masks.get(building, 0)
+        return self.floor_masks.get((building, floor), 0)
+
+    def location(self, room_id):
+        """
+        教室所在的 (教学楼, 楼层)，未知教室返回 (None, None)
+        """
+        return self.locations.get(room_id, (None, None))
+
+    def nearby_masks(self, building=None, floor=None):
+        """
+        由近及远的分区位图：同一楼层、同一教学楼、全部教室
+        """
+        masks = []
+        if building is not None:
+            if floor is not None and (building, floor) in self.floor_masks:
+                masks.append(self.floor_masks[(building, floor)])
+            if building in self.building_masks:
+                masks.append(self.building_masks[building])
+        masks.append(self.all_mask)
+        return masks
+
+    def mask_of(self, room_ids):
+        """
+        将教室编号集合转换为位图，忽略未知教室
+        """
+        mask = 0
+        for room_id in room_ids:
+            position = self.position.get(room_id)
+            if position is not None:
+                mask |= 1 << position
+        return mask
+
+    def select(self, min_capacity, occupied=0, strategy=None, building=None, floor=None):
+        """
+        选择一个容量足够的空闲教室
+
+        :param min_capacity: 最小容量
+        :param occupied: 已占用教室位图
+        :param strategy: RoomSelectionStrategy，默认最佳适配
+        :param building: 限定教学楼
+        :param floor: 限定楼层（需同时指定教学楼）
+        :return: 教室记录，没有时返回 None
+        """
+        candidates = self.capacity_mask(min_capacity) & self.partition_mask(building, floor) & ~occupied
+        if not candidates:
+            return None
+        strategy = strategy or BestFitStrategy()
+        return self.rooms[strategy.pick(self, candidates)]
+
+    def select_near(self, min_capacity, occupied=0, strategy=None, building=None, floor=None):
+        """
+        就近选择一个容量足够的空闲教室：依次在同一楼层、同一教学楼、全部教室中由策略选择
+
+        :param building: 参照位置的教学楼，为空时等同于 select
+        :param floor: 参照位置的楼层
+        :return: 教室记录，没有时返回 None
+        """
+        candidates = self.capacity_mask(min_capacity) & ~occupied
+        if not candidates:
+            return None
+        strategy = strategy or BestFitStrategy()
+        for partition in self.nearby_masks(building, floor):
+            if candidates & partition:
+                return self.rooms[strategy.pick(self, candidates & partition)]
+        return None
+
+    def select_many(self, min_capacity, occupied=0, building=None, floor=None):
+        """
+        用同一时间段的多间空闲教室容纳 min_capacity 人
+        优先在指定楼层、指定教学楼内拼凑，其次按空闲容量从大到小尝试其他教学楼，最后跨教学楼拼凑
+
+        :param min_capacity: 总人数
+        :param occupied: 已占用教室位图
+        :param building: 优先使用的教学楼
+        :param floor: 优先使用的楼层（需同时指定教学楼）
+        :return: 教室记录列表，无法容纳时返回 None
+        """
+        free = self.all_mask & ~occupied
+        others = sorted(
+            (name for name in self.building_masks if name != building),
+            key=lambda name: self._total_capacity(free & self.building_masks[name]),
+            reverse=True
+        )
+        partitions = self.nearby_masks(building, floor)[:-1]
+        partitions += [self.building_masks[name] for name in others] + [self.all_mask]
+        for partition in partitions:
+            candidates = free & partition
+            if self._total_capacity(candidates) < min_capacity:
+                continue
+            positions = self._pack(min_capacity, candidates)
+            if positions:
+                return [self.rooms[position] for position in positions]
+        return None
+
+    def _total_capacity(self, mask):
+        total = 0
+        while mask:
+            position = (mask & -mask).bit_length() - 1
+            mask &= mask - 1
+            total += self.capacities[position]
+        return total
+
+    def _pack(self, need, candidates):
+        """
+        先用最大的教室，剩余人数能被一间教室容纳时选最小的合适教室
+        """
+        positions = []
+        while candidates:
+            fit = self.capacity_mask(need) & candidates
+            if fit:
+                positions.append((fit & -fit).bit_length() - 1)
+                return positions
+            position = candidates.bit_length() - 1
+            positions.append(position)
+            need -= self.capacities[position]
+            candidates &= ~(1 << position)
+        return None
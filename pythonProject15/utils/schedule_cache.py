@@ -0,0 +1,93 @@
+import hashlib
+import json
+from datetime import datetime
+from utils.schedule_result import ScheduleResult
+
+
+# 排考算法或结果格式变化时修改版本号，使旧缓存失效
+CACHE_VERSION = 7
+
+
+def schedule_fingerprint(snapshot, settings, arrangement_meta=None):
+    """
+    计算排考输入的内容指纹
+    覆盖课程、教室、教师约束、学生选课、排考参数（含随机种子）；增量排考时还包括已有安排及其元数据
+
+    :param snapshot: load_schedule_snapshot 返回的数据
+    :param settings: 排考参数字典
+    :param arrangement_meta: exam_arrangement_meta 的全部记录，增量排考时提供
+    :return: 十六进制指纹字符串
+    """
+    digest = hashlib.sha256()
+
+    def feed(label, rows):
+        digest.update(label.encode('utf-8'))
+        for row in sorted(repr(tuple(row)) for row in rows):
+            digest.update(row.encode('utf-8'))
+            digest.update(b'\n')
+
+    feed(f'version:{CACHE_VERSION}', [])
+    feed('courses', snapshot['courses'])
+    feed('rooms', snapshot['rooms'])
+    feed('constraints', snapshot['constraints'])
+    if snapshot.get('enrolment') is not None:
+        feed('enrolment', [(snapshot['enrolment'].digest(),)])
+    feed('settings', sorted(settings.items()))
+    if settings.get('incremental'):
+        feed('arrangements', snapshot['arrangements'])
+        feed('meta', arrangement_meta or [])
+    return digest.hexdigest()
+
+
+class ScheduleCache:
+    """
+    排考结果缓存
+    以输入指纹为键，把试排结果以 JSON 保存到数据库的 schedule_cache 表，只保留最近的若干条；
+    数据库可能被多人共用，不使用 pickle，读取时只重建 ScheduleResult
+    """
+
+    def __init__(self, conn, max_entries=20):
+        """
+        :param conn: 数据库连接
+        :param max_entries: 最多保留的缓存条数
+        """
+        self.conn = conn
+        self.max_entries = max_entries
+
+    def get(self, fingerprint):
+        """
+        :return: 缓存的 ScheduleResult，没有或无法读取时返回 None
+        """
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute('SELECT result FROM schedule_cache WHERE fingerprint = ?', (fingerprint,))
+            row = cursor.fetchone()
+            return ScheduleResult.from_dict(json.loads(row[0])) if row else None
+        except Exception as e:
+            print(f"读取排考缓存失败: {e}")
+            return None
+
+    def put(self, fingerprint, result):
+        """
+        保存结果并清理最早的缓存
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                'INSERT OR REPLACE INTO schedule_cache (fingerprint, created_at, result) VALUES (?, ?, ?)',
+                (fingerprint, datetime.now().isoformat(), json.dumps(result.to_dict(), ensure_ascii=False))
+            )
+            cursor.execute('''
+                DELETE FROM schedule_cache WHERE fingerprint NOT IN (
+                    SELECT fingerprint FROM schedule_cache ORDER BY created_at DESC LIMIT ?
+                )
+            ''', (self.max_entries,))
+            self.conn.commit()
+        except Exception as e:
+            print(f"保存排考缓存失败: {e}")
+            self.conn.rollback()
+
+    def clear(self):
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM schedule_cache')
+        self.conn.commit()
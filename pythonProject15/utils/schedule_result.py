@@ -0,0 +1,164 @@
+from utils.time_slots import TimeSlot
+
+
+class ScheduleResult:
+    """
+    试排结果
+    保存一次排考在内存中的全部结果（考试安排、失败课程、统计指标），不写入数据库，
+    可在进程间传递，选定后由 ExamScheduler.commit_schedule 一次性写入
+    """
+
+    def __init__(self, settings, exam_dates, time_slots, placements, failed_courses, total_courses,
+                 pinned=None, course_keys=None, room_keys=None, seconds=0.0, optimizer_stats=None,
+                 fingerprint=None, spread_stats=None):
+        """
+        :param settings: 排考参数（与 schedule_exams 的参数相同，日期已补全）
+        :param placements: 内存中的考试安排记录
+        :param failed_courses: 排考失败的课程
+        :param total_courses: 课程总数（含增量排考保留的课程）
+        :param pinned: 增量排考保留原有安排的课程 id 集合
+        :param course_keys: {课程 id: 课程指纹}，写入时记录到 exam_arrangement_meta
+        :param room_keys: {教室编号: 教室指纹}
+        :param seconds: 试排用时
+        :param optimizer_stats: 局部搜索优化的统计信息
+        :param fingerprint: 输入指纹，结果可复现时用于缓存
+        :param spread_stats: 班级考试分散度惩罚（SpreadingObjective.evaluate 的结果）
+        """
+        self.settings = dict(settings)
+        self.exam_dates = list(exam_dates)
+        self.time_slots = list(time_slots)
+        self.placements = placements
+        self.failed_courses = failed_courses
+        self.total_courses = total_courses
+        self.pinned = set(pinned or ())
+        self.course_keys = course_keys or {}
+        self.room_keys = room_keys or {}
+        self.seconds = seconds
+        self.optimizer_stats = optimizer_stats
+        self.fingerprint = fingerprint
+        self.spread_stats = spread_stats
+        # 是否取自缓存
+        self.from_cache = False
+        self.metrics = self._compute_metrics()
+
+    def to_dict(self):
+        """
+        转换为只含 JSON 基本类型的字典，用于缓存；课程 id 可能是整数，课程指纹按 [id, 指纹] 列表保存
+        """
+        return {
+            'settings': self.settings,
+            'exam_dates': self.exam_dates,
+            'time_slots': self.time_slots,
+            'placements': self.placements,
+            'failed_courses': self.failed_courses,
+            'total_courses': self.total_courses,
+            'pinned': sorted(self.pinned, key=str),
+            'course_keys': [[course_id, key] for course_id, key in self.course_keys.items()],
+            'room_keys': self.room_keys,
+            'seconds': self.seconds,
+            'optimizer_stats': self.optimizer_stats,
+            'fingerprint': self.fingerprint,
+            'spread_stats': self.spread_stats
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        由 to_dict 的结果重建试排结果
+        """
+        return cls(
+            data['settings'], data['exam_dates'], data['time_slots'], data['placements'],
+            data['failed_courses'], data['total_courses'], pinned=data['pinned'],
+            course_keys={course_id: key for course_id, key in data['course_keys']},
+            room_keys=data['room_keys'], seconds=data['seconds'], optimizer_stats=data['optimizer_stats'],
+            fingerprint=data['fingerprint'], spread_stats=data['spread_stats']
+        )
+
+    @property
+    def success(self):
+        return not self.failed_courses
+
+    @property
+    def objectives(self):
+        """
+        多目标比较使用的指标，均为越小越好：(失败课程数, 使用天数, 晚间考试场数, 分散度惩罚)
+        """
+        metrics = self.metrics
+        return (metrics['failed'], metrics['days_used'], metrics['evening_exams'],
+                metrics.get('spread_penalty', 0.0))
+
+    @staticmethod
+    def _is_evening(exam_time):
+        # 长考试的考试时间不一定是网格中的时间段，按开始时刻判断
+        slot = TimeSlot.parse(exam_time)
+        return slot is not None and slot.is_evening
+
+    def _compute_metrics(self):
+        scheduled = self.total_courses - len(self.failed_courses)
+        return {
+            'total_courses': self.total_courses,
+            'scheduled': scheduled,
+            'failed': len(self.failed_courses),
+            'success_rate': scheduled / self.total_courses * 100 if self.total_courses else 0,
+            'exams': len(self.placements),
+            'days_used': len({p['exam_date'] for p in self.placements}),
+            'rooms_used': len({p['room_id'] for p in self.placements}),
+            'evening_exams': sum(1 for p in self.placements if self._is_evening(p['exam_time'])),
+            'spread_penalty': self.spread_stats['total'] if self.spread_stats else 0.0,
+            'seconds': self.seconds
+        }
+
+    def summary(self):
+        """
+        一行文字描述，用于方案比较
+        """
+        settings = self.settings
+        metrics = self.metrics
+        return (f"{settings['start_date']} 至 {settings['end_date']}, 每天 {settings['slots_per_day']} 场, "
+                f"{settings.get('mode', 'greedy')}: 成功 {metrics['scheduled']}/{metrics['total_courses']} "
+                f"({metrics['success_rate']:.1f}%), 失败 {metrics['failed']}, 考试 {metrics['exams']} 场, "
+                f"使用 {metrics['days_used']} 天, 晚间 {metrics['evening_exams']} 场, "
+                f"分散度惩罚 {metrics['spread_penalty']:.0f}, 用时 {metrics['seconds']:.2f} 秒")
+
+
+def pareto_front(results):
+    """
+    Pareto 前沿：没有被其他结果支配（各项目标都不差且至少一项更好）的结果下标，
+    目标完全相同的结果只保留第一个，忽略试排出错的 None
+
+    :return: 下标列表，按失败课程数、使用天数、晚间考试场数、分散度惩罚排序
+    """
+    candidates = sorted(
+        (result.objectives, index) for index, result in enumerate(results) if result is not None
+    )
+    front = []
+    for objectives, index in candidates:
+        # 按字典序排序后，支配当前结果的只可能是排在前面且已在前沿上的结果
+        if any(all(a <= b for a, b in zip(results[kept].objectives, objectives)) for kept in front):
+            continue
+        front.append(index)
+    return front
+
+
+def format_pareto_front(results, front):
+    """
+    将 Pareto 前沿格式化为文本
+    """
+    lines = [f"Pareto 前沿: {len(front)} 个方案（共 {sum(1 for r in results if r is not None)} 次试排）"]
+    for index in front:
+        result = results[index]
+        lines.append(f"方案 {index + 1}（种子 {result.settings.get('seed')}）: {result.summary()}")
+    return '\n'.join(lines)
+
+
+def format_comparison(results):
+    """
+    将多个试排结果格式化为对比文本，无法完成的试排（None）单独标出
+    """
+    lines = []
+    for i, result in enumerate(results, 1):
+        if result is None:
+            lines.append(f"方案 {i}: 试排出错")
+        else:
+            lines.append(f"方案 {i}: {result.summary()}")
+    return '\n'.join(lines)
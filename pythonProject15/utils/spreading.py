@@ -0,0 +1,106 @@
+class SpreadingObjective:
+    """
+    班级考试分散度目标
+    惩罚同一班级的三种考试安排：同一天的两场考试、紧挨着的两场考试（前一场结束的下一个时间段开始）、
+    间隔少于 min_gap_days 天的两场考试。
+    直接读取 OccupancyEngine 维护的班级每日考试场数和每个时间段开始、结束的考试场数，
+    一场考试的惩罚只查看当天和前后 min_gap_days 天的计数，与已安排的考试数量无关，
+    贪心排考选择时间段和局部搜索计算移动前后的差值都不需要重新扫描排考结果
+    """
+
+    DEFAULT_WEIGHTS = {
+        'same_day': 20.0,
+        'back_to_back': 10.0,
+        'min_gap': 5.0
+    }
+
+    def __init__(self, engine, min_gap_days=1, weights=None):
+        """
+        :param engine: OccupancyEngine
+        :param min_gap_days: 同一班级两场考试之间最少间隔的天数，为 1 时只惩罚同一天的考试
+        :param weights: 各项惩罚的权重，缺省项使用 DEFAULT_WEIGHTS
+        """
+        self.engine = engine
+        self.min_gap_days = max(1, int(min_gap_days))
+        self.weights = dict(self.DEFAULT_WEIGHTS, **(weights or {}))
+
+    @classmethod
+    def from_settings(cls, engine, spread):
+        """
+        根据排考参数构建，spread 为 {'min_gap_days', 'same_day', 'back_to_back', 'min_gap'} 中的若干项
+        """
+        spread = dict(spread or {})
+        min_gap_days = spread.pop('min_gap_days', 1)
+        unknown = set(spread) - set(cls.DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"未知的分散度参数: {', '.join(sorted(unknown))}")
+        return cls(engine, min_gap_days, spread)
+
+    def _counts(self, class_name, day, first, last, own):
+        """
+        与 (day, first..last) 这场考试构成惩罚的其他考试数：(同一天, 紧挨着, 间隔不足)
+        own 为 1 表示这场考试已登记，需要从计数中去掉
+        """
+        engine = self.engine
+        days = engine.class_exams.get(class_name)
+        if not days:
+            return 0, 0, 0
+        same_day = days[day] - own
+        base = day * engine.n_slots
+        back_to_back = 0
+        if first > 0:
+            back_to_back += engine.class_ends[class_name][base + first - 1]
+        if last < engine.n_slots - 1:
+            back_to_back += engine.class_starts[class_name][base + last + 1]
+        near = 0
+        for other in range(max(0, day - self.min_gap_days + 1), min(engine.n_days, day + self.min_gap_days)):
+            if other != day:
+                near += days[other]
+        return same_day, back_to_back, near
+
+    def cost(self, class_name, day, slot, duration=None, placed=False):
+        """
+        一场考试与同一班级其他考试之间的惩罚
+        placed 为 False 时为在 (day, slot) 新增这场考试使目标值增加的量；
+        为 True 时为撤销已登记的这场考试使目标值减少的量
+
+        :return: 惩罚值，考试超出当天考试时间时为 0
+        """
+        if not class_name:
+            return 0.0
+        span = self.engine.span(slot, duration)
+        if not span:
+            return 0.0
+        first = (span & -span).bit_length() - 1
+        last = span.bit_length() - 1
+        same_day, back_to_back, near = self._counts(class_name, day, first, last, 1 if placed else 0)
+        weights = self.weights
+        return (weights['same_day'] * same_day + weights['back_to_back'] * back_to_back
+                + weights['min_gap'] * near)
+
+    def evaluate(self):
+        """
+        按当前占用计算完整的分散度惩罚，每对考试计一次
+
+        :return: {'same_day', 'back_to_back', 'min_gap', 'total'}
+        """
+        engine = self.engine
+        n_slots = engine.n_slots
+        same_day = 0
+        back_to_back = 0
+        near = 0
+        for class_name, days in engine.class_exams.items():
+            starts = engine.class_starts[class_name]
+            ends = engine.class_ends[class_name]
+            for day, count in enumerate(days):
+                if not count:
+                    continue
+                same_day += count * (count - 1) // 2
+                base = day * n_slots
+                for slot in range(n_slots - 1):
+                    back_to_back += ends[base + slot] * starts[base + slot + 1]
+                for other in range(day + 1, min(engine.n_days, day + self.min_gap_days)):
+                    near += count * days[other]
+        result = {'same_day': same_day, 'back_to_back': back_to_back, 'min_gap': near}
+        result['total'] = sum(self.weights[key] * value for key, value in result.items())
+        return result
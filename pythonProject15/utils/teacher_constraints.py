@@ -1,5 +1,136 @@
 from datetime import datetime, timedelta
+import numpy as np
 from models.database import DatabaseManager
+from utils.time_slots import STANDARD_TIME_SLOTS, TimeSlot, TimeSlotGrid, parse_time_range, times_overlap
+
+
+DEFAULT_MAX_EXAMS_PER_DAY = 3
+
+# 批量验证的结果代码，按 validate_teacher_schedule 的检查顺序取第一个不满足的条件
+BATCH_OK = 0
+BATCH_DAILY_LIMIT = 1
+BATCH_UNAVAILABLE = 2
+BATCH_CONFLICT = 3
+BATCH_REASONS = {
+    BATCH_OK: "可以安排",
+    BATCH_DAILY_LIMIT: "超过每日考试场次限制",
+    BATCH_UNAVAILABLE: "教师约束不允许",
+    BATCH_CONFLICT: "已有其他考试安排"
+}
+
+
+def compile_constraint_row(row):
+    """
+    将 teacher_constraints 表中的一行解析为约束字典
+    不可用日期解析为集合，不可用时间段解析为分钟区间
+    """
+    _, max_per_day, no_evening, no_weekend, dates_str, times_str = row
+    unavailable_times = []
+    for text in (times_str or '').split(','):
+        time_range = parse_time_range(text)
+        if time_range:
+            unavailable_times.append((time_range[0], time_range[1], text.strip()))
+    return {
+        'max_exams_per_day': max_per_day if max_per_day is not None else DEFAULT_MAX_EXAMS_PER_DAY,
+        'no_evening_exams': bool(no_evening),
+        'no_weekend_exams': bool(no_weekend),
+        'unavailable_dates': {d.strip() for d in (dates_str or '').split(',') if d.strip()},
+        'unavailable_times': unavailable_times
+    }
+
+
+DEFAULT_CONSTRAINTS = compile_constraint_row((None, DEFAULT_MAX_EXAMS_PER_DAY, False, False, '', ''))
+
+
+class TeacherConstraintStore:
+    """
+    教师约束编译存储
+    一次遍历 teacher_constraints 表，为每位教师生成考试窗口 (日期, 时间段) 网格上的可用位图，
+    每天一个整数，第 i 位为 1 表示第 i 个时间段可用
+    """
+
+    def __init__(self, exam_dates, time_slots):
+        """
+        :param time_slots: 时间段字符串列表或 TimeSlotGrid
+        """
+        self.exam_dates = list(exam_dates)
+        self.slot_grid = TimeSlotGrid.of(time_slots)
+        self.time_slots = list(self.slot_grid.labels)
+        self.date_index = {date: i for i, date in enumerate(self.exam_dates)}
+        self.slot_index = self.slot_grid.slot_index
+        self.full_day_mask = self.slot_grid.full_day_mask
+        self.evening_bits = self.slot_grid.evening_bits
+
+        self.weekend_days = set()
+        for day, date in enumerate(self.exam_dates):
+            try:
+                if datetime.strptime(date, '%Y-%m-%d').weekday() >= 5:
+                    self.weekend_days.add(day)
+            except ValueError:
+                pass
+
+        # 格式: {教师: 约束字典}, {教师: [每日可用位图]}
+        self.constraints = {}
+        self.masks = {}
+        self._default_masks = [self.full_day_mask] * len(self.exam_dates)
+
+    def build(self, constraint_rows):
+        """
+        一次遍历约束记录，编译所有教师
+        """
+        self.constraints = {}
+        self.masks = {}
+        for row in constraint_rows:
+            self.refresh(row[0], row)
+        return self
+
+    def refresh(self, teacher_name, row):
+        """
+        只重新编译一位教师的约束，row 为 None 表示该教师已无约束记录
+        """
+        if row is None:
+            self.constraints.pop(teacher_name, None)
+            self.masks.pop(teacher_name, None)
+            return
+        constraints = compile_constraint_row(row)
+        self.constraints[teacher_name] = constraints
+        self.masks[teacher_name] = self._compile_masks(constraints)
+
+    def _compile_masks(self, constraints):
+        day_mask = self.full_day_mask
+        if constraints['no_evening_exams']:
+            day_mask &= ~self.evening_bits
+        for u_start, u_end, _ in constraints['unavailable_times']:
+            day_mask &= ~self.slot_grid.overlap_mask(u_start, u_end)
+
+        masks = []
+        for day, date in enumerate(self.exam_dates):
+            if date in constraints['unavailable_dates']:
+                masks.append(0)
+            elif constraints['no_weekend_exams'] and day in self.weekend_days:
+                masks.append(0)
+            else:
+                masks.append(day_mask)
+        return masks
+
+    def get(self, teacher_name):
+        return self.constraints.get(teacher_name, DEFAULT_CONSTRAINTS)
+
+    def limit(self, teacher_name):
+        return self.get(teacher_name)['max_exams_per_day']
+
+    def available_masks(self, teacher_name):
+        return self.masks.get(teacher_name, self._default_masks)
+
+    def is_available(self, teacher_name, exam_date, exam_time):
+        """
+        查询考试时间占用的全部时间段是否都在教师可用位图内；不在考试窗口网格中时返回 None
+        """
+        day = self.date_index.get(exam_date)
+        span = self.slot_grid.mask_of(exam_time)
+        if day is None or not span:
+            return None
+        return self.available_masks(teacher_name)[day] & span == span
 
 class TeacherConstraintsManager:
     """
@@ -9,7 +140,104 @@ class TeacherConstraintsManager:
     
     def __init__(self, db_manager=None):
         self.db_manager = db_manager or DatabaseManager()
-        
+        # 已解析的教师约束，格式: {教师: 约束字典}，首次使用时一次性加载
+        self._constraints = None
+        # 当前考试窗口的约束位图
+        self.store = None
+        # 编译约束位图时数据库的 PRAGMA data_version，其他连接提交修改后变化；
+        # 本连接的修改通过 set_teacher_constraints / invalidate 更新缓存
+        self._store_version = None
+
+    def _data_version(self):
+        """
+        数据库的修改版本，其他连接每提交一次修改就会变化
+        """
+        self.db_manager.cursor.execute('PRAGMA data_version')
+        return self.db_manager.cursor.fetchone()[0]
+
+    def _load_constraints(self):
+        """
+        一次读取并解析全部教师约束
+        """
+        self.db_manager.cursor.execute('''
+            SELECT teacher_name, max_exams_per_day, no_evening_exams, no_weekend_exams,
+                   unavailable_dates, unavailable_times
+            FROM teacher_constraints
+        ''')
+        rows = self.db_manager.cursor.fetchall()
+        self._constraints = {row[0]: compile_constraint_row(row) for row in rows}
+        return rows
+
+    def get_constraints(self, teacher_name):
+        """
+        获取已解析的教师约束，没有约束记录时返回默认约束
+        """
+        if self._constraints is None:
+            self._load_constraints()
+        return self._constraints.get(teacher_name, DEFAULT_CONSTRAINTS)
+
+    def compile_window(self, exam_dates, time_slots):
+        """
+        为考试窗口编译教师约束位图，窗口不变且其他连接没有提交修改时直接复用；
+        只在编译时查询数据库版本，逐个查询约束时不访问数据库。
+        其他连接修改约束后，解析缓存也在这里随位图一起重新加载
+
+        :return: TeacherConstraintStore
+        """
+        version = self._data_version()
+        if (self.store is not None and self.store.exam_dates == list(exam_dates)
+                and self.store.slot_grid is TimeSlotGrid.of(time_slots) and version == self._store_version):
+            return self.store
+        self._store_version = version
+        rows = self._load_constraints()
+        self.store = TeacherConstraintStore(exam_dates, time_slots).build(rows)
+        return self.store
+
+    def set_teacher_constraints(self, teacher_name, max_exams_per_day=3,
+                                no_evening_exams=False, no_weekend_exams=False,
+                                unavailable_dates=None, unavailable_times=None):
+        """
+        设置教师约束，并只重新编译该教师的约束
+        """
+        success = self.db_manager.set_teacher_constraints(
+            teacher_name, max_exams_per_day, no_evening_exams, no_weekend_exams,
+            unavailable_dates, unavailable_times
+        )
+        if success:
+            self.invalidate(teacher_name)
+        return success
+
+    def invalidate(self, teacher_name=None):
+        """
+        重新读取一位教师的约束记录，更新解析缓存和约束位图；
+        teacher_name 为空时（如批量导入或直接修改约束表后）丢弃全部缓存，下次使用时重新加载
+        """
+        if teacher_name is None:
+            self._constraints = None
+            self.store = None
+            return
+        try:
+            self.db_manager.cursor.execute('''
+                SELECT teacher_name, max_exams_per_day, no_evening_exams, no_weekend_exams,
+                       unavailable_dates, unavailable_times
+                FROM teacher_constraints
+                WHERE teacher_name = ?
+            ''', (teacher_name,))
+            row = self.db_manager.cursor.fetchone()
+        except Exception as e:
+            print(f"刷新教师约束失败: {e}")
+            self._constraints = None
+            self.store = None
+            return
+
+        if self._constraints is not None:
+            if row:
+                self._constraints[teacher_name] = compile_constraint_row(row)
+            else:
+                self._constraints.pop(teacher_name, None)
+        if self.store is not None:
+            self.store.refresh(teacher_name, row)
+
     def validate_teacher_schedule(self, teacher_name, exam_date, exam_time):
         """
         验证教师在指定时间是否可以安排考试
@@ -21,29 +249,19 @@ class TeacherConstraintsManager:
         """
         try:
             # 获取教师约束
-            constraints = self.db_manager.get_teacher_constraints(teacher_name)
+            constraints = self.get_constraints(teacher_name)
             
             # 检查每日考试场次限制
             daily_exams = self._get_teacher_daily_exams(teacher_name, exam_date)
             if len(daily_exams) >= constraints['max_exams_per_day']:
                 return False, f"教师 {teacher_name} 在 {exam_date} 已安排 {len(daily_exams)} 场考试，超过每日限制 {constraints['max_exams_per_day']} 场"
             
-            # 检查晚上考试约束
-            if constraints['no_evening_exams'] and self._is_evening_time(exam_time):
-                return False, f"教师 {teacher_name} 不接受晚上考试安排"
-            
-            # 检查周末考试约束
-            if constraints['no_weekend_exams'] and self._is_weekend(exam_date):
-                return False, f"教师 {teacher_name} 不接受周末考试安排"
-            
-            # 检查不可用日期
-            if exam_date in constraints['unavailable_dates']:
-                return False, f"教师 {teacher_name} 在 {exam_date} 不可用"
-            
-            # 检查不可用时间段
-            for unavailable_time in constraints['unavailable_times']:
-                if self._time_overlap(exam_time, unavailable_time):
-                    return False, f"教师 {teacher_name} 在时间段 {unavailable_time} 不可用"
+            # 考试窗口内的时间段直接查约束位图，可用时跳过逐项检查
+            available = self.store.is_available(teacher_name, exam_date, exam_time) if self.store else None
+            if not available:
+                is_valid, reason = self._check_static_constraints(teacher_name, constraints, exam_date, exam_time)
+                if not is_valid:
+                    return False, reason
             
             # 检查时间冲突
             if self._has_time_conflict(teacher_name, exam_date, exam_time):
@@ -54,6 +272,161 @@ class TeacherConstraintsManager:
         except Exception as e:
             return False, f"验证教师时间约束时出错: {e}"
     
+    def validate_batch(self, checks, time_slots=None):
+        """
+        批量验证教师能否在指定时间安排考试，结果与逐个调用 validate_teacher_schedule 相同
+        约束表和考试安排表各查询一次，每日场次、约束位图和时间冲突对全部请求一次判断；
+        考试时间不在时间段网格中时（可能落在时间段之间的空隙），只对这些请求逐项复核
+
+        :param checks: [(教师姓名, 考试日期, 考试时间)]
+        :param time_slots: 时间段网格，默认为标准考试时间段
+        :return: [(is_valid, reason)]，与 checks 顺序相同
+        """
+        checks = list(checks)
+        if not checks:
+            return []
+        try:
+            grid = TimeSlotGrid.of(time_slots or STANDARD_TIME_SLOTS)
+            teachers = list(dict.fromkeys(check[0] for check in checks))
+            exam_dates = sorted({check[1] for check in checks})
+            teacher_index = {teacher: i for i, teacher in enumerate(teachers)}
+            date_index = {date: i for i, date in enumerate(exam_dates)}
+            span_of = {exam_time: grid.mask_of(exam_time) for exam_time in {check[2] for check in checks}}
+
+            teacher_idx = np.fromiter((teacher_index[check[0]] for check in checks), dtype=np.int64, count=len(checks))
+            day_idx = np.fromiter((date_index[check[1]] for check in checks), dtype=np.int64, count=len(checks))
+            spans = np.fromiter((span_of[check[2]] for check in checks), dtype=np.int64, count=len(checks))
+            codes, counts, store, times = self._batch_codes(teachers, exam_dates, grid, teacher_idx, day_idx, spans)
+        except Exception as e:
+            return [(False, f"验证教师时间约束时出错: {e}")] * len(checks)
+
+        results = []
+        for i, (teacher_name, exam_date, exam_time) in enumerate(checks):
+            code = codes[i]
+            on_grid = exam_time in grid.slot_index
+            if code == BATCH_OK and on_grid:
+                results.append((True, "可以安排"))
+                continue
+            t, d = teacher_idx[i], day_idx[i]
+            constraints = store.get(teacher_name)
+            if code == BATCH_DAILY_LIMIT:
+                results.append((False, f"教师 {teacher_name} 在 {exam_date} 已安排 {counts[t, d]} 场考试，"
+                                       f"超过每日限制 {constraints['max_exams_per_day']} 场"))
+                continue
+
+            # 位图判为不可用或不在网格中时，逐项检查得到具体原因
+            if code == BATCH_UNAVAILABLE or not on_grid:
+                is_valid, reason = self._check_static_constraints(teacher_name, constraints, exam_date, exam_time)
+                if not is_valid:
+                    results.append((False, reason))
+                    continue
+
+            # 网格中的时间段与已有考试的重叠即为位图相交；其他考试时间按实际时间复核
+            if on_grid:
+                conflict = code == BATCH_CONFLICT
+            else:
+                conflict = any(times_overlap(other, exam_time) for other in times.get((t, d), ()))
+            if conflict:
+                results.append((False, f"教师 {teacher_name} 在 {exam_date} {exam_time} 已有其他考试安排"))
+            else:
+                results.append((True, "可以安排"))
+        return results
+
+    def validate_grid(self, teachers, exam_dates, time_slots=None):
+        """
+        验证 教师 × 考试窗口 网格上每个 (教师, 日期, 时间段) 能否安排考试
+
+        :param teachers: 教师姓名列表
+        :param exam_dates: 考试日期列表 (YYYY-MM-DD)
+        :param time_slots: 时间段网格，默认为标准考试时间段
+        :return: (valid, codes)，形状均为 (教师数, 日期数, 时间段数)，codes 的含义见 BATCH_REASONS；出错时返回 (None, None)
+        """
+        try:
+            grid = TimeSlotGrid.of(time_slots or STANDARD_TIME_SLOTS)
+            teachers = list(teachers)
+            exam_dates = list(exam_dates)
+            # 三个下标数组按 (教师, 日期, 时间段) 广播，不需要展开全部组合
+            teacher_idx = np.arange(len(teachers), dtype=np.int64)[:, None, None]
+            day_idx = np.arange(len(exam_dates), dtype=np.int64)[None, :, None]
+            spans = (np.int64(1) << np.arange(len(grid), dtype=np.int64))[None, None, :]
+            codes = self._batch_codes(teachers, exam_dates, grid, teacher_idx, day_idx, spans)[0]
+            codes = np.broadcast_to(codes, (len(teachers), len(exam_dates), len(grid)))
+            return codes == BATCH_OK, codes
+        except Exception as e:
+            print(f"批量验证教师时间约束失败: {e}")
+            return None, None
+
+    def _batch_codes(self, teachers, exam_dates, grid, teacher_idx, day_idx, spans):
+        """
+        批量验证的位图判断：读取一次约束表、按 (教师, 日期, 时间) 分组读取一次考试安排，
+        构建 (教师, 日期) 的可用位图、已安排场数和已占用位图数组后对全部请求一起判断
+
+        :param teacher_idx: 请求的教师下标数组
+        :param day_idx: 请求的日期下标数组
+        :param spans: 请求的考试时间在网格上占用的时间段位图数组
+        :return: (codes, counts, store, times)，codes 为每个请求的结果代码，
+                 times 为 {(教师下标, 日期下标): [已安排的考试时间]}
+        """
+        store = TeacherConstraintStore(exam_dates, grid).build(self._load_constraints())
+        teacher_index = {teacher: i for i, teacher in enumerate(teachers)}
+        shape = (len(teachers), len(exam_dates))
+        available = np.array([store.available_masks(teacher) for teacher in teachers],
+                             dtype=np.int64).reshape(shape)
+        limits = np.array([store.limit(teacher) for teacher in teachers], dtype=np.int64)
+        counts = np.zeros(shape, dtype=np.int64)
+        busy = np.zeros(shape, dtype=np.int64)
+        times = {}
+
+        if exam_dates:
+            self.db_manager.cursor.execute('''
+                SELECT c.教师, ea.考试日期, ea.考试时间, COUNT(*)
+                FROM exam_arrangements ea
+                JOIN courses c ON ea.教室号 = c.id
+                WHERE ea.考试日期 BETWEEN ? AND ?
+                GROUP BY c.教师, ea.考试日期, ea.考试时间
+            ''', (min(exam_dates), max(exam_dates)))
+            for teacher_name, exam_date, exam_time, count in self.db_manager.cursor.fetchall():
+                t = teacher_index.get(teacher_name)
+                d = store.date_index.get(exam_date)
+                if t is None or d is None:
+                    continue
+                counts[t, d] += count
+                busy[t, d] |= grid.mask_of(exam_time)
+                times.setdefault((t, d), []).append(exam_time)
+
+        over_limit = counts[teacher_idx, day_idx] >= limits[teacher_idx]
+        unavailable = (available[teacher_idx, day_idx] & spans) != spans
+        conflict = (busy[teacher_idx, day_idx] & spans) != 0
+        codes = np.where(over_limit, BATCH_DAILY_LIMIT,
+                         np.where(unavailable, BATCH_UNAVAILABLE,
+                                  np.where(conflict, BATCH_CONFLICT, BATCH_OK)))
+        return codes, counts, store, times
+
+    def _check_static_constraints(self, teacher_name, constraints, exam_date, exam_time):
+        """
+        逐项检查晚上、周末、不可用日期和不可用时间段约束，返回具体原因
+        """
+        # 检查晚上考试约束
+        if constraints['no_evening_exams'] and self._is_evening_time(exam_time):
+            return False, f"教师 {teacher_name} 不接受晚上考试安排"
+        
+        # 检查周末考试约束
+        if constraints['no_weekend_exams'] and self._is_weekend(exam_date):
+            return False, f"教师 {teacher_name} 不接受周末考试安排"
+        
+        # 检查不可用日期
+        if exam_date in constraints['unavailable_dates']:
+            return False, f"教师 {teacher_name} 在 {exam_date} 不可用"
+        
+        # 检查不可用时间段
+        exam_range = parse_time_range(exam_time)
+        if exam_range:
+            for u_start, u_end, unavailable_time in constraints['unavailable_times']:
+                if not (exam_range[1] <= u_start or u_end <= exam_range[0]):
+                    return False, f"教师 {teacher_name} 在时间段 {unavailable_time} 不可用"
+        
+        return True, "可以安排"
+
     def _get_teacher_daily_exams(self, teacher_name, exam_date):
         """
         获取教师在指定日期的考试安排
@@ -75,12 +448,8 @@ class TeacherConstraintsManager:
         """
         判断是否为晚上时间 (19:00之后)
         """
-        try:
-            start_time = exam_time.split('-')[0]
-            hour = int(start_time.split(':')[0])
-            return hour >= 19
-        except:
-            return False
+        slot = TimeSlot.parse(exam_time)
+        return slot is not None and slot.is_evening
     
     def _is_weekend(self, exam_date):
         """
@@ -97,34 +466,23 @@ class TeacherConstraintsManager:
         检查两个时间段是否重叠
         时间格式: HH:MM-HH:MM
         """
-        try:
-            def parse_time(time_str):
-                start, end = time_str.split('-')
-                start_hour, start_min = map(int, start.split(':'))
-                end_hour, end_min = map(int, end.split(':'))
-                return start_hour * 60 + start_min, end_hour * 60 + end_min
-            
-            start1, end1 = parse_time(time1)
-            start2, end2 = parse_time(time2)
-            
-            return not (end1 <= start2 or end2 <= start1)
-        except:
+        if parse_time_range(time1) is None or parse_time_range(time2) is None:
             return False
+        return times_overlap(time1, time2)
     
     def _has_time_conflict(self, teacher_name, exam_date, exam_time):
         """
-        检查教师在指定时间是否已有考试安排
+        检查教师在指定时间是否已有考试安排，时间段重叠即算冲突
         """
         try:
             query = '''
-                SELECT COUNT(*)
+                SELECT DISTINCT ea.考试时间
                 FROM exam_arrangements ea
                 JOIN courses c ON ea.教室号 = c.id
-                WHERE c.教师 = ? AND ea.考试日期 = ? AND ea.考试时间 = ?
+                WHERE c.教师 = ? AND ea.考试日期 = ?
             '''
-            self.db_manager.cursor.execute(query, (teacher_name, exam_date, exam_time))
-            count = self.db_manager.cursor.fetchone()[0]
-            return count > 0
+            self.db_manager.cursor.execute(query, (teacher_name, exam_date))
+            return any(times_overlap(row[0], exam_time) for row in self.db_manager.cursor.fetchall())
         except Exception as e:
             print(f"检查教师时间冲突失败: {e}")
             return True  # 出错时保守处理，认为有冲突
@@ -161,30 +519,21 @@ class TeacherConstraintsManager:
             print(f"获取教师考试安排摘要失败: {e}")
             return {}
     
-    def suggest_alternative_times(self, teacher_name, exam_date, duration_hours=2):
+    def suggest_alternative_times(self, teacher_name, exam_date, duration_hours=2, time_slots=None):
         """
         为教师建议可用的考试时间段
+
+        :param time_slots: 候选时间段，默认为标准考试时间段
         """
         try:
-            # 标准考试时间段
-            standard_slots = [
-                "08:00-10:00", "10:30-12:30", "14:00-16:00", "16:30-18:30", "19:00-21:00"
-            ]
-            
-            constraints = self.db_manager.get_teacher_constraints(teacher_name)
-            available_slots = []
-            
-            for slot in standard_slots:
-                # 检查晚上约束
-                if constraints['no_evening_exams'] and self._is_evening_time(slot):
-                    continue
-                
-                # 检查是否可以安排
-                is_valid, reason = self.validate_teacher_schedule(teacher_name, exam_date, slot)
-                if is_valid:
-                    available_slots.append(slot)
+            standard_slots = TimeSlotGrid.of(time_slots or STANDARD_TIME_SLOTS).labels
             
-            return available_slots
+            constraints = self.get_constraints(teacher_name)
+            # 跳过晚上时间段，其余时间段一次批量验证
+            checks = [(teacher_name, exam_date, slot) for slot in standard_slots
+                      if not (constraints['no_evening_exams'] and self._is_evening_time(slot))]
+            results = self.validate_batch(checks, standard_slots)
+            return [slot for (_, _, slot), (is_valid, _) in zip(checks, results) if is_valid]
         except Exception as e:
             print(f"建议可用时间失败: {e}")
             return [] 
\ No newline at end of file
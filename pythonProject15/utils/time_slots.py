@@ -0,0 +1,314 @@
+from functools import lru_cache
+
+
+EVENING_START_MINUTES = 19 * 60
+
+# 默认考试时间段，以及每天五场考试时增加的晚间时间段
+DEFAULT_TIME_SLOTS = ("08:00-10:00", "10:30-12:30", "14:00-16:00", "16:30-18:30")
+EXTRA_TIME_SLOT = "19:00-21:00"
+STANDARD_TIME_SLOTS = DEFAULT_TIME_SLOTS + (EXTRA_TIME_SLOT,)
+
+# 常用考试时长（分钟），按课程时段推算时向上取到其中之一，更长的考试按 30 分钟取整并跨多个时间段
+EXAM_DURATIONS = (90, 120, 180)
+
+
+@lru_cache(maxsize=4096)
+def parse_time_range(time_str):
+    """
+    解析 HH:MM-HH:MM，返回开始、结束分钟数；无法解析时返回 None
+    结果按字符串缓存，同一时间段只解析一次
+    """
+    try:
+        start, end = time_str.split('-')
+        start_hour, start_min = map(int, start.strip().split(':'))
+        end_hour, end_min = map(int, end.strip().split(':'))
+        return start_hour * 60 + start_min, end_hour * 60 + end_min
+    except (ValueError, AttributeError):
+        return None
+
+
+def popcount(mask):
+    """
+    位图中为 1 的位数（int.bit_count 需要 Python 3.10，这里兼容更早的版本）
+    """
+    return bin(mask).count('1')
+
+
+def format_minutes(minutes):
+    """
+    分钟数格式化为 HH:MM
+    """
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def times_overlap(time1, time2):
+    """
+    判断两个 HH:MM-HH:MM 时间段是否重叠（首尾相接不算重叠）
+    无法解析时退化为字符串相等比较
+    """
+    range1 = parse_time_range(time1)
+    range2 = parse_time_range(time2)
+    if range1 is None or range2 is None:
+        return time1 == time2
+    return range1[0] < range2[1] and range2[0] < range1[1]
+
+
+@lru_cache(maxsize=4096)
+def exam_duration(minutes=None, period=None):
+    """
+    课程的考试时长（分钟）
+
+    :param minutes: courses.考试时长，指定时直接使用
+    :param period: courses.时段（如 "8:00 - 9:50"），未指定考试时长时按时段长度推算
+    :return: 分钟数，都无法确定时返回 None（占用一个完整时间段）
+    """
+    try:
+        if minutes is not None and int(minutes) > 0:
+            return int(minutes)
+    except (TypeError, ValueError):
+        pass
+    time_range = parse_time_range(period)
+    if time_range is None or time_range[1] <= time_range[0]:
+        return None
+    length = time_range[1] - time_range[0]
+    for duration in EXAM_DURATIONS:
+        if length <= duration:
+            return duration
+    return -(-length // 30) * 30
+
+
+class TimeSlot:
+    """
+    考试时间段，半开区间 [start, end)，单位为当天的分钟数
+    """
+
+    __slots__ = ('start', 'end', 'label')
+
+    def __init__(self, start, end, label=None):
+        if end <= start:
+            raise ValueError(f"无效的时间段: {format_minutes(start)}-{format_minutes(end)}")
+        self.start = start
+        self.end = end
+        self.label = label or f"{format_minutes(start)}-{format_minutes(end)}"
+
+    @classmethod
+    def parse(cls, text):
+        """
+        :param text: HH:MM-HH:MM
+        :return: TimeSlot，无法解析或结束不晚于开始时返回 None
+        """
+        time_range = parse_time_range(text)
+        if time_range is None or time_range[1] <= time_range[0]:
+            return None
+        return cls(time_range[0], time_range[1], text.strip())
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    @property
+    def is_evening(self):
+        return self.start >= EVENING_START_MINUTES
+
+    def overlaps(self, start, end):
+        return self.start < end and start < self.end
+
+    def __eq__(self, other):
+        return isinstance(other, TimeSlot) and (self.start, self.end) == (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"TimeSlot({self.label})"
+
+
+class IntervalIndex:
+    """
+    静态区间索引（中心区间树）
+    每个节点保存跨过中心点的区间（分别按开始升序、结束降序排列），
+    左子树为完全在中心点之前的区间，右子树为完全在中心点之后的区间。
+    查询与 [start, end) 重叠的区间为 O(log n + k)，k 为结果数
+    """
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right', 'size')
+
+    def __init__(self, items=()):
+        """
+        :param items: (开始分钟, 结束分钟, 值) 序列，结束不晚于开始的区间忽略
+        """
+        items = [item for item in items if item[1] > item[0]]
+        self.size = len(items)
+        self.left = self.right = None
+        self.by_start = self.by_end = ()
+        self.center = None
+        if not items:
+            return
+        points = sorted(point for item in items for point in item[:2])
+        # 取下中位数，保证至少有一个区间不进入左子树
+        self.center = points[(len(points) - 1) // 2]
+        left, right, here = [], [], []
+        for item in items:
+            if item[1] <= self.center:
+                left.append(item)
+            elif item[0] > self.center:
+                right.append(item)
+            else:
+                here.append(item)
+        self.by_start = sorted(here, key=lambda item: item[0])
+        self.by_end = sorted(here, key=lambda item: item[1], reverse=True)
+        if left:
+            self.left = IntervalIndex(left)
+        if right:
+            self.right = IntervalIndex(right)
+
+    def __len__(self):
+        return self.size
+
+    def query(self, start, end):
+        """
+        :return: 与 [start, end) 重叠的区间的值列表
+        """
+        result = []
+        if end > start:
+            self._query(start, end, result)
+        return result
+
+    def _query(self, start, end, result):
+        node = self
+        while node is not None and node.center is not None:
+            center = node.center
+            if end <= center:
+                # 本节点区间都跨过中心点，结束晚于查询开始，只需比较开始
+                for item in node.by_start:
+                    if item[0] >= end:
+                        break
+                    result.append(item[2])
+                node = node.left
+            elif start >= center:
+                for item in node.by_end:
+                    if item[1] <= start:
+                        break
+                    result.append(item[2])
+                node = node.right
+            else:
+                result.extend(item[2] for item in node.by_start)
+                if node.left is not None:
+                    node.left._query(start, end, result)
+                node = node.right
+
+
+class TimeSlotGrid:
+    """
+    一个学期每天的考试时间段网格
+    时间段按开始时间排列，第 i 位对应第 i 个时间段；
+    任意时间区间（如手动调整的 09:00-11:00）通过区间索引映射为重叠时间段的位图。
+    同一组时间段只构建一次，排考引擎、教师约束和冲突检测共用
+    """
+
+    _cache = {}
+
+    def __init__(self, time_slots):
+        """
+        :param time_slots: HH:MM-HH:MM 字符串或 TimeSlot 序列
+        """
+        slots = []
+        for slot in time_slots:
+            parsed = slot if isinstance(slot, TimeSlot) else TimeSlot.parse(slot)
+            if parsed is None:
+                raise ValueError(f"无效的考试时间段: {slot}")
+            slots.append(parsed)
+        self.slots = slots
+        self.labels = [slot.label for slot in slots]
+        self.slot_index = {label: i for i, label in enumerate(self.labels)}
+        self.full_day_mask = (1 << len(slots)) - 1
+        self.evening_bits = 0
+        for i, slot in enumerate(slots):
+            if slot.is_evening:
+                self.evening_bits |= 1 << i
+        self._index = IntervalIndex((slot.start, slot.end, i) for i, slot in enumerate(slots))
+        self.day_end = max((slot.end for slot in slots), default=0)
+        self.slot_by_start = {slot.start: i for i, slot in enumerate(slots)}
+        # {(开始时间段, 时长): 占用位图}
+        self._spans = {}
+
+    @classmethod
+    def of(cls, time_slots):
+        """
+        取得时间段网格，相同的时间段列表共用同一个网格
+        """
+        if isinstance(time_slots, TimeSlotGrid):
+            return time_slots
+        key = tuple(slot.label if isinstance(slot, TimeSlot) else slot for slot in time_slots)
+        grid = cls._cache.get(key)
+        if grid is None:
+            grid = cls(key)
+            cls._cache[key] = grid
+        return grid
+
+    def __len__(self):
+        return len(self.slots)
+
+    def overlap_mask(self, start, end):
+        """
+        与 [start, end) 重叠的时间段位图
+        """
+        mask = 0
+        for i in self._index.query(start, end):
+            mask |= 1 << i
+        return mask
+
+    def span(self, slot, duration=None):
+        """
+        从第 slot 个时间段开始、持续 duration 分钟的考试占用的时间段位图
+        考试从时间段开始时刻开始且时间段互不重叠，因此两场考试的位图相交当且仅当实际时间重叠。
+        超出当天最后一个时间段时返回 0
+
+        :param duration: 分钟数，为空时占用一个完整时间段
+        """
+        if duration is None:
+            return 1 << slot
+        key = (slot, duration)
+        mask = self._spans.get(key)
+        if mask is None:
+            start = self.slots[slot].start
+            mask = self.overlap_mask(start, start + duration) if start + duration <= self.day_end else 0
+            self._spans[key] = mask
+        return mask
+
+    def exam_time(self, slot, duration=None):
+        """
+        考试时间文字，如 08:00-09:30；时长为空时为时间段本身
+        """
+        if duration is None:
+            return self.labels[slot]
+        start = self.slots[slot].start
+        return f"{format_minutes(start)}-{format_minutes(start + duration)}"
+
+    def locate(self, exam_time):
+        """
+        :return: (开始时间段, 时长)，时长为空表示与时间段相同；开始时刻不在网格上时返回 None
+        """
+        slot = self.slot_index.get(exam_time)
+        if slot is not None:
+            return slot, None
+        time_range = parse_time_range(exam_time)
+        if time_range is None or time_range[1] <= time_range[0]:
+            return None
+        slot = self.slot_by_start.get(time_range[0])
+        if slot is None:
+            return None
+        return slot, time_range[1] - time_range[0]
+
+    def mask_of(self, exam_time):
+        """
+        考试时间占用的时间段位图：与网格中时间段相同时为单个位，
+        否则为所有重叠时间段；无法解析时为 0
+        """
+        slot = self.slot_index.get(exam_time)
+        if slot is not None:
+            return 1 << slot
+        time_range = parse_time_range(exam_time)
+        if time_range is None:
+            return 0
+        return self.overlap_mask(*time_range)
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import sqlite3
+from datetime import datetime, timedelta
+import pandas as pd
+
+
+def _key(course_name, teacher, class_name):
+    return (str(course_name).strip(), str(teacher).strip(), str(class_name).strip())
+
+
+def load_previous_arrangements(source, rooms=()):
+    """
+    读取上学期的考试安排，source 为上学期的数据库文件或导出的考场安排 Excel
+    Excel 需要 课程名称、教师、学院班级、考试日期、考试时间 列，教室用 教室编号 列，
+    没有时按 教室名称 对应到当前的教室
+
+    :param rooms: 当前教室列表，用于把教室名称对应到教室编号
+    :return: [(课程名称, 教师, 学院班级, 教室编号, 考试日期, 考试时间)]
+    """
+    if str(source).lower().endswith(('.xlsx', '.xls')):
+        df = pd.read_excel(source, dtype=str)
+        if '教室编号' in df.columns:
+            room_ids = df['教室编号']
+        else:
+            by_name = {str(room[1]).strip(): room[0] for room in rooms}
+            room_ids = df['教室名称'].map(lambda name: by_name.get(str(name).strip()))
+        rows = []
+        for row, room_id in zip(df.to_dict('records'), room_ids):
+            if pd.isna(room_id) or pd.isna(row['考试日期']) or pd.isna(row['考试时间']):
+                continue
+            rows.append((row['课程名称'], row['教师'], row['学院班级'], str(room_id).strip(),
+                         str(row['考试日期']).strip()[:10], str(row['考试时间']).strip()))
+        return rows
+
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"找不到上学期的考试安排: {source}")
+    conn = sqlite3.connect(source)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT c.课程名称, c.教师, c.学院班级, ea.教室编号, ea.考试日期, ea.考试时间
+            FROM exam_arrangements ea
+            JOIN courses c ON ea.教室号 = c.id
+        ''')
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def previous_digest(rows):
+    """
+    上学期考试安排的内容指纹，用于排考结果缓存
+    """
+    digest = hashlib.sha256()
+    for row in sorted(repr(tuple(row)) for row in rows):
+        digest.update(row.encode('utf-8'))
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+class WarmStartPlanner:
+    """
+    沿用上学期考试安排的热启动排考
+    按 (课程名称, 教师, 学院班级) 建立哈希索引，每门课程一次查找得到上学期的考试场次，
+    按上学期考试窗口内的第几天映射到本学期的日期，时间按开始时刻映射到时间段网格，
+    在占用位图上验证教室、教师、班级和学生均可用后直接登记。
+    每门课程只做常数次位运算，映射不到或已被占用的课程留给正常的排考算法
+    """
+
+    def __init__(self, engine, placer, previous_rows, check_class=False):
+        """
+        :param engine: OccupancyEngine
+        :param placer: CoursePlacer，用于构建考试安排记录
+        :param previous_rows: load_previous_arrangements 返回的记录
+        :param check_class: 是否避免同一班级同时考试
+        """
+        self.engine = engine
+        self.placer = placer
+        self.check_class = check_class
+        self.last_stats = None
+
+        # 上学期的日期按与第一天的间隔映射到本学期
+        dates = sorted({row[4] for row in previous_rows if self._parse_date(row[4])})
+        self.previous_start = self._parse_date(dates[0]) if dates else None
+        self.current_start = self._parse_date(engine.exam_dates[0]) if engine.exam_dates else None
+
+        # {(课程名称, 教师, 学院班级): {(考试日期, 考试时间): [教室编号]}}，同一课程的多条安排为分场次考试
+        self.index = {}
+        for course_name, teacher, class_name, room_id, exam_date, exam_time in previous_rows:
+            key = _key(course_name, teacher, class_name)
+            self.index.setdefault(key, {}).setdefault((exam_date, exam_time), []).append(room_id)
+
+    @staticmethod
+    def _parse_date(value):
+        try:
+            return datetime.strptime(str(value)[:10], "%Y-%m-%d")
+        except ValueError:
+            return None
+
+    def _map_day(self, exam_date):
+        date = self._parse_date(exam_date)
+        if date is None or self.previous_start is None or self.current_start is None:
+            return None
+        target = (self.current_start + timedelta(days=(date - self.previous_start).days)).strftime("%Y-%m-%d")
+        return self.engine.date_index.get(target)
+
+    def place(self, courses):
+        """
+        按上学期的安排登记能够沿用的课程
+
+        :return: (placements, remaining)，remaining 为需要正常排考的课程
+        """
+        placements = []
+        remaining = []
+        mapped = 0
+        for course in courses:
+            # 每条上学期的安排只对应一门课程
+            exams = self.index.pop(_key(course[2], course[11], course[8]), None)
+            if exams is None:
+                remaining.append(course)
+                continue
+            mapped += 1
+            placed = self._place_course(course, exams)
+            if placed is None:
+                remaining.append(course)
+            else:
+                placements.extend(placed)
+        self.last_stats = {
+            'courses': len(courses), 'mapped': mapped,
+            'placed': len(courses) - len(remaining)
+        }
+        return placements, remaining
+
+    def _place_course(self, course, exams):
+        """
+        按上学期的场次登记一门课程：一个时间多间教室为同时分场，多个时间为依次分场；
+        任一场次不可行时撤销已登记的场次并返回 None
+        """
+        engine = self.engine
+        teacher, class_name, course_id = course[11], course[8], course[0]
+        students_count = max(10, course[9])
+        duration = engine.course_duration(course)
+
+        cells = []
+        for (exam_date, exam_time), room_ids in exams.items():
+            day = self._map_day(exam_date)
+            located = engine.slot_grid.locate(exam_time)
+            if day is None or located is None or any(room_id not in engine.room_dict for room_id in room_ids):
+                return None
+            cells.append((day, located[0], room_ids))
+        cells.sort(key=lambda cell: (cell[0], cell[1]))
+
+        # 教室容量仍需容纳本学期的考试人数
+        def capacity(room_ids):
+            return sum(int(engine.room_dict[room_id][2]) for room_id in room_ids)
+
+        if len(cells) == 1:
+            if capacity(cells[0][2]) < students_count:
+                return None
+        else:
+            per_session = (students_count + len(cells) - 1) // len(cells)
+            if any(len(room_ids) != 1 or capacity(room_ids) < per_session for _, _, room_ids in cells):
+                return None
+
+        placed = []
+        for day, slot, room_ids in cells:
+            if not engine.is_feasible(teacher, class_name, room_ids, day, slot, self.check_class,
+                                      duration, course_id):
+                for placed_day, placed_slot, placed_rooms in placed:
+                    engine.release(teacher, class_name, placed_rooms, placed_day, placed_slot, duration, course_id)
+                return None
+            engine.place(teacher, class_name, room_ids, day, slot, duration, course_id)
+            placed.append((day, slot, room_ids))
+
+        placer = self.placer
+        day, slot, room_ids = cells[0]
+        if len(cells) == 1 and len(room_ids) == 1:
+            return [placer._make_placement(course, room_ids[0], day, slot, students_count)]
+        if len(cells) == 1:
+            placements = []
+            remaining = students_count
+            for session, room_id in enumerate(room_ids, 1):
+                session_students = min(int(engine.room_dict[room_id][2]), remaining)
+                remaining -= session_students
+                placements.append(placer._make_placement(
+                    course, room_id, day, slot, session_students, session, len(room_ids), concurrent=True
+                ))
+            return placements
+        sessions_needed = len(cells)
+        students_per_session = (students_count + sessions_needed - 1) // sessions_needed
+        return [
+            placer._make_placement(
+                course, room_ids[0], day, slot,
+                min(students_per_session, students_count - session * students_per_session),
+                session + 1, sessions_needed
+            )
+            for session, (day, slot, room_ids) in enumerate(cells)
+        ]